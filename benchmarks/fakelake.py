@@ -0,0 +1,291 @@
+'''
+Stand-in OmniLake Backend
+
+An in-memory replacement for the OmniLake client, answering the requests Omni sends with
+configurable latency, throttling and job durations. Install it with
+omni.utils.clientutil.set_client_factory to run any command without a deployment.
+'''
+import itertools
+import random
+import threading
+import time
+
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Optional
+
+from requests import Response
+from requests.exceptions import HTTPError
+
+@dataclass
+class FakeLakeConfig:
+    """
+    Behaviour of the stand-in backend
+    """
+    latency: float = 0.02
+    jitter: float = 0.5
+    job_duration: float = 1.0
+    archive_duration: float = 0.0
+    max_requests_per_second: Optional[float] = None
+    chain_steps: int = 3
+    answer_size: int = 2000
+    seed: Optional[int] = None
+
+class FakeResponse:
+    def __init__(self, response_body: dict):
+        self.response_body = response_body
+
+class _Job:
+    def __init__(self, job_id: str, job_type: str, duration: float):
+        self.job_id = job_id
+        self.job_type = job_type
+
+        self.created = time.time()
+        self.duration = duration
+
+    def progress(self) -> float:
+        if self.duration <= 0:
+            return 1.0
+
+        return min(1.0, (time.time() - self.created) / self.duration)
+
+    def describe(self) -> dict:
+        done = self.progress() >= 1.0
+
+        return {
+            'job_id': self.job_id,
+            'job_type': self.job_type,
+            'status': 'COMPLETED' if done else 'IN_PROGRESS',
+            'status_message': None,
+            'started': _timestamp(self.created),
+            'ended': _timestamp(self.created + self.duration) if done else None,
+        }
+
+def _timestamp(seconds: float) -> str:
+    return datetime.fromtimestamp(seconds, tz=timezone.utc).isoformat()
+
+class FakeOmniLake:
+    """
+    In-memory OmniLake client, safe to share across threads like the real one.
+
+    Every request waits for the configured latency, give or take the jitter, and fails with an
+    HTTP 429 error, raised by requests like the real client does, once the backend receives more than
+    max_requests_per_second. Jobs complete
+    job_duration seconds after they are submitted, and chain steps complete one after the other
+    within that time.
+    """
+    def __init__(self, app_name: Optional[str] = None, deployment_id: Optional[str] = None,
+                 config: Optional[FakeLakeConfig] = None):
+        self.app_name = app_name
+        self.deployment_id = deployment_id
+
+        self.config = config or FakeLakeConfig()
+
+        self.random = random.Random(self.config.seed)
+
+        self.archives = {}
+        self.source_types = {}
+        self.sources = {}
+        self.entries = {}
+        self.jobs = {}
+        self.lake_requests = {}
+        self.chain_requests = {}
+
+        self.requests = Counter()
+        self.throttled = Counter()
+        self.received_bytes = 0
+
+        self._ids = itertools.count(1)
+
+        self._lock = threading.Lock()
+
+        # Token bucket refilled at max_requests_per_second, holding up to one second of requests
+        self._tokens = self.config.max_requests_per_second or 0.0
+        self._refilled = time.monotonic()
+
+    def _next_id(self, prefix: str) -> str:
+        return f'{prefix}-{next(self._ids):08d}'
+
+    def _throttle(self, request_type: str):
+        rate = self.config.max_requests_per_second
+
+        if not rate:
+            return
+
+        with self._lock:
+            now = time.monotonic()
+
+            self._tokens = min(rate, self._tokens + (now - self._refilled) * rate)
+            self._refilled = now
+
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+
+            self.throttled[request_type] += 1
+
+        response = Response()
+
+        response.status_code = 429
+        response.reason = 'Too Many Requests'
+
+        raise HTTPError(f'429 Client Error: Too Many Requests for {request_type}', response=response)
+
+    def _wait(self):
+        latency = self.config.latency
+
+        if latency <= 0:
+            return
+
+        with self._lock:
+            spread = self.random.uniform(-self.config.jitter, self.config.jitter)
+
+        time.sleep(max(0.0, latency * (1 + spread)))
+
+    def _submit_job(self, job_type: str, duration: float) -> _Job:
+        job = _Job(self._next_id('job'), job_type, duration)
+
+        self.jobs[job.job_id] = job
+
+        return job
+
+    def _answer(self, lake_request_id: str) -> str:
+        words = ['lake', 'omni', 'entry', 'archive', 'answer', 'source', 'vector', 'summary']
+
+        answer = f'Answer for {lake_request_id}:'
+
+        while len(answer) < self.config.answer_size:
+            answer += ' ' + words[len(answer) % len(words)]
+
+        return answer
+
+    def request(self, request) -> FakeResponse:
+        """
+        Answer a request the way OmniLake does
+
+        Keyword arguments:
+        request -- the request definition, dispatched on its class name
+        """
+        request_type = type(request).__name__
+
+        handler = getattr(self, f'_handle_{request_type}', None)
+
+        if handler is None:
+            raise NotImplementedError(f'The fake backend does not implement {request_type}')
+
+        attributes = request.attributes
+
+        with self._lock:
+            self.requests[request_type] += 1
+
+            self.received_bytes += len(str(attributes))
+
+        self._throttle(request_type)
+
+        self._wait()
+
+        with self._lock:
+            return FakeResponse(handler(attributes))
+
+    def _handle_CreateArchive(self, attributes: dict) -> dict:
+        archive_id = attributes['archive_id']
+
+        if archive_id in self.archives:
+            raise ValueError(f'Archive already exists: {archive_id}')
+
+        job = self._submit_job('CREATE_ARCHIVE', self.config.archive_duration)
+
+        self.archives[archive_id] = attributes
+
+        return {'archive_id': archive_id, 'job_id': job.job_id, 'job_type': job.job_type}
+
+    def _handle_CreateSourceType(self, attributes: dict) -> dict:
+        name = attributes['name']
+
+        if name in self.source_types:
+            raise ValueError(f'Source type already exists: {name}')
+
+        self.source_types[name] = attributes
+
+        return {'name': name}
+
+    def _handle_AddSource(self, attributes: dict) -> dict:
+        resource_name = f'omnilake:source:{attributes["source_type"]}/{self._next_id("source")}'
+
+        self.sources[resource_name] = attributes
+
+        return {'resource_name': resource_name}
+
+    def _handle_AddEntry(self, attributes: dict) -> dict:
+        entry_id = self._next_id('entry')
+
+        self.entries[entry_id] = attributes['content']
+
+        return {'entry_id': entry_id}
+
+    def _handle_GetEntry(self, attributes: dict) -> dict:
+        return {'entry_id': attributes['entry_id'], 'content': self.entries[attributes['entry_id']]}
+
+    def _handle_DescribeJob(self, attributes: dict) -> dict:
+        return self.jobs[attributes['job_id']].describe()
+
+    def _handle_SubmitLakeRequest(self, attributes: dict) -> dict:
+        job = self._submit_job('LAKE_REQUEST', self.config.job_duration)
+
+        lake_request_id = self._next_id('lake-request')
+
+        self.lake_requests[lake_request_id] = {'job': job, 'response_entry_id': None}
+
+        return {'job_id': job.job_id, 'job_type': job.job_type, 'lake_request_id': lake_request_id}
+
+    def _handle_DescribeLakeRequest(self, attributes: dict) -> dict:
+        lake_request_id = attributes['lake_request_id']
+
+        lake_request = self.lake_requests[lake_request_id]
+
+        if lake_request['response_entry_id'] is None and lake_request['job'].progress() >= 1.0:
+            entry_id = self._next_id('entry')
+
+            self.entries[entry_id] = self._answer(lake_request_id)
+
+            lake_request['response_entry_id'] = entry_id
+
+        return {'lake_request_id': lake_request_id, 'response_entry_id': lake_request['response_entry_id']}
+
+    def _handle_SubmitChainRequest(self, attributes: dict) -> dict:
+        job = self._submit_job('CHAIN', self.config.job_duration)
+
+        chain_request_id = self._next_id('chain-request')
+
+        chain = attributes.get('chain') or []
+
+        names = [step.get('name') for step in chain if isinstance(step, dict) and step.get('name')]
+
+        names = names or [f'step_{index}' for index in range(self.config.chain_steps)]
+
+        steps = []
+
+        # Each step runs as its own lake request, completing in turn over the duration of the chain
+        for index, name in enumerate(names):
+            step_job = _Job(job.job_id, 'LAKE_REQUEST', self.config.job_duration * (index + 1) / len(names))
+
+            step_job.created = job.created
+
+            lake_request_id = self._next_id('lake-request')
+
+            self.lake_requests[lake_request_id] = {'job': step_job, 'response_entry_id': None}
+
+            steps.append((name, lake_request_id, step_job))
+
+        self.chain_requests[chain_request_id] = steps
+
+        return {'job_id': job.job_id, 'job_type': job.job_type, 'chain_request_id': chain_request_id}
+
+    def _handle_DescribeChainRequest(self, attributes: dict) -> dict:
+        chain_request_id = attributes['chain_request_id']
+
+        executed_requests = {name: lake_request_id for name, lake_request_id, step_job in self.chain_requests[chain_request_id]
+                             if step_job.progress() >= 1.0}
+
+        return {'chain_request_id': chain_request_id, 'executed_requests': executed_requests}
@@ -0,0 +1,102 @@
+'''
+Startup Benchmark
+
+Measures how long the CLI takes to start, so import-time regressions are visible.
+Each scenario runs in a fresh interpreter, and the slowest imports are reported with -X importtime.
+
+    poetry run python benchmarks/import_time.py --runs 10 --max-ms 300
+'''
+import statistics
+import subprocess
+import sys
+import time
+
+from argparse import ArgumentParser
+
+SCENARIOS = {
+    'import omni.shell': 'import omni.shell',
+    'omni --help': 'import sys; sys.argv = ["omni", "--help"]; from omni.shell import main; main()',
+    'omni index --help': 'import sys; sys.argv = ["omni", "index", "--help"]; from omni.shell import main; main()',
+}
+
+def time_scenario(code: str, runs: int) -> list[float]:
+    """
+    Run a snippet in fresh interpreters and return the wall time of each run, in milliseconds
+
+    Keyword arguments:
+    code -- the Python code to run
+    runs -- the number of runs
+    """
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+
+        subprocess.run([sys.executable, '-c', code], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return timings
+
+def slowest_imports(code: str, top: int) -> list[tuple[int, str]]:
+    """
+    Return the imports with the highest cumulative time, in microseconds
+
+    Keyword arguments:
+    code -- the Python code to run
+    top -- the number of imports to return
+    """
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, text=True, check=False)
+
+    imports = []
+
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+
+        _, cumulative, module = line[len('import time:'):].split('|')
+
+        imports.append((int(cumulative), module.strip()))
+
+    return sorted(imports, reverse=True)[:top]
+
+def main():
+    parser = ArgumentParser(description='Measure the CLI startup time')
+
+    parser.add_argument('--runs', help='The number of runs per scenario. Defaults to 10', default=10, type=int)
+    parser.add_argument('--top', help='The number of slowest imports to report. Defaults to 10', default=10, type=int)
+    parser.add_argument('--max-ms', help='Exit with an error if the median of any scenario is above this, in milliseconds', type=float)
+
+    args = parser.parse_args()
+
+    regressions = []
+
+    # Baseline for the interpreter itself, everything above it is Omni's cost
+    baseline = statistics.median(time_scenario('pass', args.runs))
+
+    print(f'{"scenario":<24} {"median ms":>10} {"min ms":>10} {"over python":>12}')
+    print(f'{"python -c pass":<24} {baseline:>10.1f}')
+
+    for name, code in SCENARIOS.items():
+        timings = time_scenario(code, args.runs)
+
+        median = statistics.median(timings)
+
+        print(f'{name:<24} {median:>10.1f} {min(timings):>10.1f} {median - baseline:>12.1f}')
+
+        if args.max_ms is not None and median > args.max_ms:
+            regressions.append(name)
+
+    print('\nSlowest imports for "omni --help" (cumulative):')
+
+    for cumulative, module in slowest_imports(SCENARIOS['omni --help'], args.top):
+        print(f'{cumulative / 1000:>10.1f} ms  {module}')
+
+    if regressions:
+        print(f'\nStartup time above {args.max_ms} ms: {", ".join(regressions)}')
+
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
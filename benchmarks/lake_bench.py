@@ -0,0 +1,323 @@
+'''
+Command Benchmark
+
+Measures the throughput and latency of the index, question and chain commands against the
+stand-in backend from fakelake.py, on a generated corpus. Nothing is sent to OmniLake, so it
+runs on any machine, and the results can be written to JSON to compare runs in CI.
+
+    poetry run python benchmarks/lake_bench.py --files 500 --latency 0.05 --job-duration 2 --json results.json
+'''
+import contextlib
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from argparse import ArgumentParser
+from functools import partial
+from pathlib import Path
+
+import omni.utils.clientutil as clientutil
+
+from fakelake import FakeLakeConfig, FakeOmniLake
+from omni.shell import Shell
+
+WORDS = ['lake', 'omni', 'entry', 'archive', 'vector', 'source', 'summary', 'request', 'chain', 'index',
+         'question', 'answer', 'lookup', 'response', 'deployment', 'throughput', 'latency', 'polling']
+
+def generate_corpus(directory: Path, files: int, file_size: int, seed: int = 0) -> int:
+    """
+    Write text files of random words in a few nested directories, returns the number of bytes written
+
+    Keyword arguments:
+    directory -- the directory to write the files to
+    files -- the number of files
+    file_size -- the approximate size of each file in bytes
+    seed -- the random seed, so every run indexes the same corpus (default 0)
+    """
+    generator = random.Random(seed)
+
+    total = 0
+
+    for index in range(files):
+        file_path = directory / f'section_{index % 10}' / f'part_{index % 3}' / f'document_{index}.md'
+
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+
+        lines = []
+
+        size = 0
+
+        while size < file_size:
+            line = ' '.join(generator.choice(WORDS) for _ in range(12))
+
+            lines.append(line)
+
+            size += len(line) + 1
+
+        contents = '\n'.join(lines) + '\n'
+
+        file_path.write_text(contents)
+
+        total += len(contents.encode('utf-8'))
+
+    return total
+
+class Benchmark:
+    """
+    Runs the commands in process against a fresh stand-in backend for every run
+    """
+    def __init__(self, config: FakeLakeConfig, work_dir: Path):
+        self.config = config
+
+        self.work_dir = work_dir
+
+    def run_command(self, argv: list[str], omni_home: Path) -> tuple[float, FakeOmniLake]:
+        """
+        Run a command with its output discarded, returns the wall time and the backend it used
+
+        Keyword arguments:
+        argv -- the command line arguments
+        omni_home -- the directory holding the local state of the run
+        """
+        os.environ['OMNI_HOME'] = str(omni_home)
+
+        start = time.perf_counter()
+
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            Shell().run(argv)
+
+        elapsed = time.perf_counter() - start
+
+        return elapsed, clientutil.get_client().client
+
+    def fresh_backend(self):
+        clientutil.set_client_factory(partial(FakeOmniLake, config=self.config))
+
+    def index(self, corpus: Path, corpus_files: int, corpus_bytes: int, workers: int, runs: int) -> dict:
+        """
+        Index the corpus into a fresh backend, then index it again with nothing changed
+        """
+        cold, warm, requests = [], [], 0
+
+        for run in range(runs):
+            omni_home = self.work_dir / f'index-{run}'
+
+            self.fresh_backend()
+
+            elapsed, backend = self.run_command(['index', '--archive', 'bench', '--directory', str(corpus),
+                                                 '--workers', str(workers)], omni_home)
+
+            cold.append(elapsed)
+
+            requests = sum(backend.requests.values())
+
+            # Same backend and manifest, every file is reported unchanged
+            elapsed, _ = self.run_command(['index', '--archive', 'bench', '--directory', str(corpus),
+                                           '--workers', str(workers)], omni_home)
+
+            warm.append(elapsed)
+
+        return {
+            'index cold': {'seconds': statistics.median(cold), 'files_per_second': corpus_files / statistics.median(cold),
+                           'bytes_per_second': corpus_bytes / statistics.median(cold), 'requests': requests},
+            'index unchanged': {'seconds': statistics.median(warm), 'files_per_second': corpus_files / statistics.median(warm)},
+        }
+
+    def bundled_index(self, corpus: Path, corpus_files: int, corpus_bytes: int, workers: int, bundle_size: int, runs: int) -> dict:
+        """
+        Index the corpus into a fresh backend with the files of each directory bundled
+        """
+        cold, requests = [], 0
+
+        for run in range(runs):
+            self.fresh_backend()
+
+            elapsed, backend = self.run_command(['index', '--archive', 'bench', '--directory', str(corpus), '--workers', str(workers),
+                                                 '--bundle', str(bundle_size)], self.work_dir / f'bundled-{run}')
+
+            cold.append(elapsed)
+
+            requests = sum(backend.requests.values())
+
+        return {
+            'index bundled': {'seconds': statistics.median(cold), 'files_per_second': corpus_files / statistics.median(cold),
+                              'bytes_per_second': corpus_bytes / statistics.median(cold), 'requests': requests},
+        }
+
+    def questions(self, count: int, workers: int, runs: int) -> dict:
+        """
+        Answer a batch of questions, reporting the wall time and the latency of every question
+        """
+        batch_path = self.work_dir / 'questions.jsonl'
+
+        with open(batch_path, 'w') as batch_file:
+            for index in range(count):
+                batch_file.write(json.dumps({'id': f'q{index}', 'question': f'What is item {index} about?'}) + '\n')
+
+        wall, latencies = [], []
+
+        for run in range(runs):
+            output_path = self.work_dir / f'answers-{run}.jsonl'
+
+            self.fresh_backend()
+
+            elapsed, _ = self.run_command(['question', '--archive', 'bench', '--batch', str(batch_path), '--no-cache',
+                                           '--workers', str(workers), '--output', str(output_path)],
+                                          self.work_dir / f'question-{run}')
+
+            wall.append(elapsed)
+
+            with open(output_path, 'r') as output_file:
+                latencies.extend(json.loads(line)['latency'] for line in output_file if line.strip())
+
+        return {
+            'question batch': {'seconds': statistics.median(wall), 'questions_per_second': count / statistics.median(wall),
+                               'latency_p50': _percentile(latencies, 50), 'latency_p95': _percentile(latencies, 95)},
+        }
+
+    def chain(self, steps: int, runs: int, stream: bool) -> dict:
+        """
+        Execute a chain, reporting the wall time and, when streaming, the time to the first result
+        """
+        chain_path = self.work_dir / 'chain.json'
+
+        with open(chain_path, 'w') as chain_file:
+            json.dump([{'name': f'step_{index}', 'conditional': False, 'lake_request': {}} for index in range(steps)], chain_file)
+
+        wall, first_results = [], []
+
+        for run in range(runs):
+            output_path = self.work_dir / f'chain-{run}.jsonl'
+
+            self.fresh_backend()
+
+            argv = ['chain', str(chain_path), '--output', str(output_path), '--format', 'jsonl']
+
+            if stream:
+                argv.append('--stream')
+
+            elapsed, _ = self.run_command(argv, self.work_dir / f'chain-{run}')
+
+            wall.append(elapsed)
+
+            if stream:
+                with open(output_path, 'r') as output_file:
+                    first_results.append(min(json.loads(line)['elapsed'] for line in output_file if line.strip()))
+
+        if stream:
+            return {'chain stream': {'seconds': statistics.median(wall), 'first_result': statistics.median(first_results)}}
+
+        return {'chain': {'seconds': statistics.median(wall)}}
+
+    def sweep(self, steps: int, count: int, workers: int, runs: int) -> dict:
+        """
+        Execute a chain once per parameter set, reporting the wall time of the whole sweep
+        """
+        chain_path = self.work_dir / 'sweep.json'
+
+        with open(chain_path, 'w') as chain_file:
+            json.dump([{'name': f'step_{index}', 'conditional': False, 'lake_request': {'goal': '${topic}'}}
+                       for index in range(steps)], chain_file)
+
+        params_path = self.work_dir / 'sweep-params.jsonl'
+
+        with open(params_path, 'w') as params_file:
+            for index in range(count):
+                params_file.write(json.dumps({'topic': f'topic {index}'}) + '\n')
+
+        wall = []
+
+        for run in range(runs):
+            self.fresh_backend()
+
+            elapsed, _ = self.run_command(['chain', str(chain_path), '--params', str(params_path), '--workers', str(workers),
+                                           '--output', str(self.work_dir / f'sweep-{run}.json')],
+                                          self.work_dir / f'sweep-{run}')
+
+            wall.append(elapsed)
+
+        return {'chain sweep': {'seconds': statistics.median(wall), 'chains_per_second': count / statistics.median(wall)}}
+
+def _percentile(values: list[float], percent: float) -> float:
+    ordered = sorted(values)
+
+    return ordered[min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))]
+
+def main():
+    parser = ArgumentParser(description='Measure the commands against a stand-in OmniLake backend')
+
+    parser.add_argument('--files', help='The number of files in the generated corpus. Defaults to 200', default=200, type=int)
+    parser.add_argument('--file-size', help='The size of each generated file in bytes. Defaults to 4096', default=4096, type=int)
+    parser.add_argument('--bundle-size', help='The bundle size of the bundled index scenario, in bytes. Defaults to 65536', default=65536, type=int)
+    parser.add_argument('--questions', help='The number of questions in the batch. Defaults to 50', default=50, type=int)
+    parser.add_argument('--chain-steps', help='The number of requests in the chain. Defaults to 5', default=5, type=int)
+    parser.add_argument('--sweep', help='The number of parameter sets the chain sweep runs. Defaults to 20', default=20, type=int)
+    parser.add_argument('--workers', help='The number of workers given to the commands. Defaults to 8', default=8, type=int)
+    parser.add_argument('--runs', help='The number of runs per scenario. Defaults to 3', default=3, type=int)
+    parser.add_argument('--latency', help='The latency of every request in seconds. Defaults to 0.02', default=0.02, type=float)
+    parser.add_argument('--jitter', help='The relative variation of the latency. Defaults to 0.5', default=0.5, type=float)
+    parser.add_argument('--job-duration', help='How long lake requests and chains take to complete, in seconds. Defaults to 1', default=1.0, type=float)
+    parser.add_argument('--throttle', help='Throttle the backend above this many requests per second', type=float)
+    parser.add_argument('--json', help='Write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    config = FakeLakeConfig(latency=args.latency, jitter=args.jitter, job_duration=args.job_duration,
+                            max_requests_per_second=args.throttle, seed=0)
+
+    results = {'config': vars(args), 'scenarios': {}}
+
+    with tempfile.TemporaryDirectory(prefix='omni-bench-') as work_dir:
+        work_dir = Path(work_dir)
+
+        corpus = work_dir / 'corpus'
+
+        corpus_bytes = generate_corpus(corpus, args.files, args.file_size)
+
+        benchmark = Benchmark(config, work_dir)
+
+        scenarios = {
+            'index': partial(benchmark.index, corpus, args.files, corpus_bytes, args.workers, args.runs),
+            'index bundled': partial(benchmark.bundled_index, corpus, args.files, corpus_bytes, args.workers, args.bundle_size, args.runs),
+            'question batch': partial(benchmark.questions, args.questions, args.workers, args.runs),
+            'chain': partial(benchmark.chain, args.chain_steps, args.runs, stream=False),
+            'chain stream': partial(benchmark.chain, args.chain_steps, args.runs, stream=True),
+            'chain sweep': partial(benchmark.sweep, args.chain_steps, args.sweep, args.workers, args.runs),
+        }
+
+        # A failing scenario, such as one the throttling breaks, is reported without stopping the others
+        for name, scenario in scenarios.items():
+            try:
+                results['scenarios'].update(scenario())
+            except Exception as e:
+                results['scenarios'][name] = {'error': f'{type(e).__name__}: {e}'}
+
+    clientutil.set_client_factory(None)
+
+    print(f'Corpus: {args.files} files, {corpus_bytes / 1024 / 1024:.1f} MiB. Backend latency {args.latency}s, '
+          f'job duration {args.job_duration}s, throttle {args.throttle or "none"}\n')
+
+    print(f'{"scenario":<18} {"median s":>9}  details')
+
+    for name, scenario in results['scenarios'].items():
+        if 'error' in scenario:
+            print(f'{name:<18} {"failed":>9}  {scenario["error"]}')
+            continue
+
+        details = ', '.join(f'{key} {value:,.3f}' if isinstance(value, float) else f'{key} {value}'
+                            for key, value in scenario.items() if key != 'seconds')
+
+        print(f'{name:<18} {scenario["seconds"]:>9.3f}  {details}')
+
+    if args.json:
+        with open(args.json, 'w') as json_file:
+            json.dump(results, json_file, indent=4)
+
+        print(f'\nResults written to {args.json}')
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,15 @@
 '''
 Omni Core Commands
+
+Commands are registered by name and description only, their modules are imported when they are used.
 '''
 
-from omni.commands.chain import ChainCommand
-from omni.commands.index import RefreshIndexCommand
-from omni.commands.question import QuestionCommand
+from omni.commands.base import LazyCommand
 
-__all__ = {k.command_name: k for k in [ChainCommand, RefreshIndexCommand, QuestionCommand]}
\ No newline at end of file
+__all__ = {k.command_name: k for k in [
+    LazyCommand('chain', 'Execute a chain against OmniLake', 'omni.commands.chain:ChainCommand'),
+    LazyCommand('daemon', 'Run commands sent by other omni calls in one warm process, listening on a Unix socket', 'omni.commands.daemon:DaemonCommand'),
+    LazyCommand('index', 'Create or update the index based on the files in the directory', 'omni.commands.index:RefreshIndexCommand'),
+    LazyCommand('question', 'Perform a summarization over an archive to answer a question or goal from the user', 'omni.commands.question:QuestionCommand'),
+    LazyCommand('repl', 'Run commands in an interactive session that keeps the OmniLake client warm', 'omni.commands.repl:ReplCommand'),
+]}
@@ -1,13 +1,63 @@
 from argparse import ArgumentParser
+from importlib import import_module
+from typing import Optional
 
 class Command:
     command_name = None
     description = None
 
+    # The shell running the command, set before run is called
+    shell = None
+
     @classmethod
     def configure_parser(cls, parser: ArgumentParser):
         # Override this to add arguments to the command
         return
 
+    @classmethod
+    def check_arguments(cls, parser: ArgumentParser, args):
+        # Override this to reject invalid arguments with parser.error, before the command runs
+        return
+
     def run(self, args):
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+class LazyCommand:
+    """
+    Registry entry for a command that is only imported when it is used.
+
+    Behaves like the command class: it exposes the command name and description, configures
+    the parser and instantiates the command, importing its module on first use.
+    """
+    def __init__(self, command_name: str, description: Optional[str], target: str):
+        """
+        Keyword arguments:
+        command_name -- the name of the command
+        description -- the description shown in the CLI help
+        target -- where the command class lives, as "package.module:ClassName"
+        """
+        self.command_name = command_name
+        self.description = description
+        self.target = target
+
+        self._command_class = None
+
+    def load(self) -> type[Command]:
+        """
+        Import and return the command class
+        """
+        if self._command_class is None:
+            module_name, _, class_name = self.target.partition(':')
+
+            self._command_class = getattr(import_module(module_name), class_name)
+
+        return self._command_class
+
+    def configure_parser(self, parser: ArgumentParser):
+        self.load().configure_parser(parser)
+
+    def check_arguments(self, parser: ArgumentParser, args):
+        self.load().check_arguments(parser, args)
+
+    def __call__(self, *args, **kwargs) -> Command:
+        return self.load()(*args, **kwargs)
@@ -1,9 +1,17 @@
 import json
+import threading
+import time
+import omni.utils.clientutil as clientutil
+import omni.utils.jobutil as jobutil
 import omni.utils.lakerequestutil as lakerequestutil
 
+from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from logging import getLogger
+from string import Template
 from typing import Optional
 
-from omnilake.client.client import OmniLake
 from omnilake.client.request_definitions import (
     DescribeChainRequest,
     SubmitChainRequest,
@@ -11,6 +19,8 @@ from omnilake.client.request_definitions import (
 
 from omni.commands.base import Command
 
+logger = getLogger(__name__)
+
 class ChainCommand(Command):
     command_name='chain'
 
@@ -18,7 +28,7 @@ class ChainCommand(Command):
 
     def __init__(self, omnilake_app_name: Optional[str] = None,
                  omnilake_deployment_id: Optional[str] = None):
-        self.omnilake = OmniLake(
+        self.omnilake = clientutil.SharedClient(
             app_name=omnilake_app_name,
             deployment_id=omnilake_deployment_id,
         )
@@ -26,6 +36,12 @@ class ChainCommand(Command):
     @classmethod
     def configure_parser(cls, parser):
         parser.add_argument('chain_definition', help='The chain definition file to execute')
+        parser.add_argument('--output', '-o', help='Write the result of every request to this file, keyed by request name')
+        parser.add_argument('--format', help='The format of the output file. Defaults to "json"', default='json', choices=['json', 'jsonl'])
+        parser.add_argument('--workers', '-w', help='The number of results retrieved concurrently. Defaults to 8', default=8, type=int)
+        parser.add_argument('--stream', help='Print the result of each request as soon as it completes, with its timing', action='store_true')
+        parser.add_argument('--timeout', help='The maximum number of seconds to wait for the chain to complete. Defaults to no limit', type=float)
+        parser.add_argument('--params', '-p', help='A JSONL file with one object of template variables per line, the chain is run once per line')
 
     def run(self, args):
         """
@@ -33,6 +49,13 @@ class ChainCommand(Command):
         """
         with open(args.chain_definition, 'r') as chain_file:
             loaded_chain_file = json.load(chain_file)
+
+        if args.params:
+            if args.stream:
+                raise ValueError('"--stream" can\'t be used with "--params"')
+
+            self._run_sweep(args, loaded_chain_file)
+            return
         
         print('Loaded Chain Definition:')
 
@@ -40,10 +63,15 @@ class ChainCommand(Command):
 
         print('Executing chain...')
 
+        if args.stream:
+            self._stream(args, loaded_chain_file)
+            return
+
         chain_id = lakerequestutil.execute_and_wait(
             omnilake=self.omnilake,
             request=SubmitChainRequest(chain=loaded_chain_file),
             return_id_property='chain_request_id',
+            timeout=args.timeout,
         )
 
         if not chain_id:
@@ -54,9 +82,349 @@ class ChainCommand(Command):
 
         executed_requests = chain_resp.response_body["executed_requests"]
 
-        for request_name in executed_requests:
-            lakerequestutil.describe_result(
+        results = lakerequestutil.get_results(
+            omnilake=self.omnilake,
+            lake_request_ids=executed_requests,
+            max_workers=args.workers,
+        )
+
+        for request_name, content in results.items():
+            print(f"Request \"{request_name}\" Response\n=================\n\n{content}")
+
+        if args.output:
+            self._write_results(args.output, args.format, chain_id, executed_requests, results)
+
+            print(f'Results written to {args.output}')
+
+    def _stream(self, args, chain_definition: list):
+        """
+        Execute the chain, polling it while it runs and emitting each request result as soon as
+        the request shows up as executed and has a response
+
+        Keyword arguments:
+        args -- the command arguments
+        chain_definition -- the loaded chain definition
+        """
+        submitted_at = time.monotonic()
+
+        job_id, job_type, chain_id = lakerequestutil.submit(
+            omnilake=self.omnilake,
+            request=SubmitChainRequest(chain=chain_definition),
+            return_id_property='chain_request_id',
+        )
+
+        executed_requests = {}
+
+        results = {}
+
+        timings = {}
+
+        jsonl_file = open(args.output, 'w') if args.output and args.format == 'jsonl' else None
+
+        def collect_results(ready_only: bool = True):
+            chain_resp = self.omnilake.request(DescribeChainRequest(chain_request_id=chain_id))
+
+            executed_requests.update(chain_resp.response_body.get('executed_requests') or {})
+
+            new_results = lakerequestutil.get_results(
+                omnilake=self.omnilake,
+                lake_request_ids={name: lake_request_id for name, lake_request_id in executed_requests.items() if name not in results},
+                max_workers=args.workers,
+                ready_only=ready_only,
+            )
+
+            for request_name, content in new_results.items():
+                elapsed = time.monotonic() - submitted_at
+
+                step_time = elapsed - max(timings.values(), default=0.0)
+
+                results[request_name] = content
+                timings[request_name] = elapsed
+
+                print(f"Request \"{request_name}\" Response after {timedelta(seconds=elapsed)} (+{timedelta(seconds=step_time)})\n=================\n\n{content}")
+
+                if jsonl_file:
+                    jsonl_file.write(json.dumps(self._result_record(chain_id, request_name, executed_requests, results, timings)) + '\n')
+                    jsonl_file.flush()
+
+        def poll_chain(_job_id: str, job_description: dict):
+            # Best effort while the chain runs, whatever is missed is collected once it completes
+            try:
+                collect_results()
+            except Exception as e:
+                logger.warning(f'Unable to collect chain results: {e}')
+
+        try:
+            job_result = jobutil.wait_for_completion(
                 omnilake=self.omnilake,
-                lake_request_id=executed_requests[request_name],
-                request_name=request_name
+                job_id=job_id,
+                job_type=job_type,
+                timeout=args.timeout,
+                on_status_change=jobutil.print_status_change,
+                # Polled quickly at first, so the results of short requests are emitted without waiting a second
+                policy=jobutil.PollingPolicy(initial_interval=0.2, max_interval=5.0),
+                on_poll=poll_chain,
             )
+
+            jobutil.print_result(job_result)
+
+            if job_result:
+                collect_results(ready_only=False)
+            else:
+                print('Request failed to complete, check logs for more information')
+        finally:
+            if jsonl_file:
+                jsonl_file.close()
+
+        if args.output and args.format == 'json':
+            self._write_results(args.output, args.format, chain_id, executed_requests, results, timings)
+
+        if args.output:
+            print(f'Results written to {args.output}')
+
+    def _load_params(self, args) -> list[Namespace]:
+        """
+        Load the parameter file, returns the line number, ID and variables of each run
+
+        Keyword arguments:
+        args -- the command arguments
+        """
+        runs = []
+
+        with open(args.params, 'r') as params_file:
+            for line_number, line in enumerate(params_file, start=1):
+                line = line.strip()
+
+                if not line:
+                    continue
+
+                loaded = json.loads(line)
+
+                if not isinstance(loaded, dict):
+                    raise ValueError(f'Expected an object of variables in {args.params} line {line_number}')
+
+                run_id = loaded.pop('id', None)
+
+                runs.append(Namespace(line=line_number, id=run_id, params=loaded))
+
+        return runs
+
+    def _render(self, value, params: dict, location: str):
+        """
+        Replace the $name and ${name} variables in the strings of a chain definition.
+        A string made of a single variable is replaced by its value as is, so it can be a list or a number.
+
+        Keyword arguments:
+        value -- the chain definition, or any part of it
+        params -- the variable values
+        location -- where the values come from, for error messages
+        """
+        if isinstance(value, dict):
+            return {key: self._render(item, params, location) for key, item in value.items()}
+
+        if isinstance(value, list):
+            return [self._render(item, params, location) for item in value]
+
+        if not isinstance(value, str) or '$' not in value:
+            return value
+
+        template = Template(value)
+
+        identifiers = template.get_identifiers()
+
+        missing = [name for name in identifiers if name not in params]
+
+        if missing:
+            raise ValueError(f'Missing variable(s) {", ".join(missing)} in {location}')
+
+        if len(identifiers) == 1 and value in (f'${identifiers[0]}', f'${{{identifiers[0]}}}'):
+            return params[identifiers[0]]
+
+        # Dollar signs that aren't variables, such as amounts, are left as they are
+        return template.safe_substitute({name: params[name] if isinstance(params[name], str) else json.dumps(params[name])
+                                         for name in identifiers})
+
+    def _run_sweep(self, args, chain_definition: list):
+        """
+        Run the chain once per line of the parameter file: submit the chains with bounded concurrency,
+        wait on all of them together and retrieve the results of each chain as soon as it completes
+
+        Keyword arguments:
+        args -- the command arguments
+        chain_definition -- the loaded chain definition, holding the template variables
+        """
+        runs = self._load_params(args)
+
+        for run in runs:
+            run.status = None
+            run.error = None
+            run.chain_request_id = None
+            run.executed_requests = {}
+            run.results = {}
+
+            try:
+                run.chain = self._render(chain_definition, run.params, f'{args.params} line {run.line}')
+            except ValueError as e:
+                run.status = 'ERROR'
+                run.error = str(e)
+
+        print(f'Executing the chain for {len(runs)} parameter set(s)...')
+
+        output_file = open(args.output, 'w') if args.output and args.format == 'jsonl' else None
+
+        output_lock = threading.Lock()
+
+        def finish(run: Namespace, status: str, error: Optional[str] = None):
+            run.status = status
+            run.error = error
+
+            with output_lock:
+                print(f'Chain for {args.params} line {run.line}{f" ({run.id})" if run.id else ""}: {status}'
+                      f'{f", {error}" if error else ""}')
+
+                for request_name, content in run.results.items():
+                    print(f"Request \"{request_name}\" Response\n=================\n\n{content}")
+
+                if output_file:
+                    output_file.write(json.dumps(self._run_record(run)) + '\n')
+                    output_file.flush()
+
+        def submit(run: Namespace):
+            try:
+                job_id, job_type, run.chain_request_id = lakerequestutil.submit(
+                    omnilake=self.omnilake,
+                    request=SubmitChainRequest(chain=run.chain),
+                    return_id_property='chain_request_id',
+                )
+            except Exception as e:
+                finish(run, 'ERROR', str(e))
+                return None
+
+            return job_id, job_type
+
+        def collect(run: Namespace):
+            try:
+                chain_resp = self.omnilake.request(DescribeChainRequest(chain_request_id=run.chain_request_id))
+
+                run.executed_requests = chain_resp.response_body['executed_requests']
+
+                run.results = lakerequestutil.get_results(
+                    omnilake=self.omnilake,
+                    lake_request_ids=run.executed_requests,
+                    max_workers=args.workers,
+                )
+            except Exception as e:
+                finish(run, 'ERROR', str(e))
+                return
+
+            finish(run, 'COMPLETED')
+
+        try:
+            for run in runs:
+                if run.status:
+                    finish(run, run.status, run.error)
+
+            with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='omni-chain') as executor:
+                pending = [run for run in runs if not run.status]
+
+                submitted = {}
+
+                for run, submission in zip(pending, executor.map(submit, pending)):
+                    if submission:
+                        submitted[submission[0]] = (run, submission[1])
+
+                print(f'Waiting for {len(submitted)} chain(s)...')
+
+                job_results = jobutil.as_completed(
+                    omnilake=self.omnilake,
+                    jobs=[(job_id, job_type) for job_id, (_, job_type) in submitted.items()],
+                    timeout=args.timeout,
+                    max_concurrency=args.workers,
+                )
+
+                for job_result in job_results:
+                    run, _ = submitted[job_result.job_id]
+
+                    if job_result:
+                        executor.submit(collect, run)
+                    else:
+                        finish(run, 'TIMED_OUT' if job_result.timed_out else job_result.status, job_result.status_message)
+        finally:
+            if output_file:
+                output_file.close()
+
+        if args.output and args.format == 'json':
+            with open(args.output, 'w') as json_file:
+                json.dump({'runs': [self._run_record(run) for run in runs]}, json_file, indent=4)
+
+        completed = sum(1 for run in runs if run.status == 'COMPLETED')
+
+        print(f'{completed} of {len(runs)} chain(s) completed')
+
+        if args.output:
+            print(f'Results written to {args.output}')
+
+    def _run_record(self, run: Namespace) -> dict:
+        """
+        Build the output record of a chain run of a sweep
+        """
+        return {
+            'line': run.line,
+            'id': run.id,
+            'params': run.params,
+            'status': run.status,
+            'error': run.error,
+            'chain_request_id': run.chain_request_id,
+            'results': {
+                request_name: {'lake_request_id': run.executed_requests[request_name], 'response': content}
+                for request_name, content in run.results.items()
+            },
+        }
+
+    def _result_record(self, chain_id: str, request_name: str, executed_requests: dict[str, str], results: dict[str, str],
+                       timings: Optional[dict[str, float]] = None) -> dict:
+        """
+        Build the output record of a single request
+        """
+        record = {
+            'chain_request_id': chain_id,
+            'name': request_name,
+            'lake_request_id': executed_requests[request_name],
+            'response': results[request_name],
+        }
+
+        if timings and request_name in timings:
+            record['elapsed'] = round(timings[request_name], 3)
+
+        return record
+
+    def _write_results(self, output: str, output_format: str, chain_id: str, executed_requests: dict[str, str],
+                       results: dict[str, str], timings: Optional[dict[str, float]] = None):
+        """
+        Write the chain results to a file
+
+        Keyword arguments:
+        output -- the path of the output file
+        output_format -- either "json" or "jsonl"
+        chain_id -- the ID of the chain request
+        executed_requests -- the lake request IDs keyed by request name
+        results -- the resulting content keyed by request name
+        timings -- the seconds from submission until each result was available, keyed by request name (default None)
+        """
+        with open(output, 'w') as output_file:
+            if output_format == 'jsonl':
+                for request_name in results:
+                    output_file.write(json.dumps(self._result_record(chain_id, request_name, executed_requests, results, timings)) + '\n')
+
+                return
+
+            records = {}
+
+            for request_name in results:
+                record = self._result_record(chain_id, request_name, executed_requests, results, timings)
+
+                del record['chain_request_id'], record['name']
+
+                records[request_name] = record
+
+            json.dump({'chain_request_id': chain_id, 'results': records}, output_file, indent=4)
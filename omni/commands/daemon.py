@@ -0,0 +1,45 @@
+import omni.utils.daemonutil as daemonutil
+
+from omni.commands.base import Command
+
+class DaemonCommand(Command):
+    command_name='daemon'
+    description='Run commands sent by other omni calls in one warm process, listening on a Unix socket'
+
+    @classmethod
+    def configure_parser(cls, parser):
+        parser.add_argument('action', help='Start the daemon in the foreground, stop it, or show whether it runs. Defaults to "start"', nargs='?', default='start', choices=['start', 'stop', 'status'])
+        parser.add_argument('--socket', help=f'The path of the socket. Defaults to {daemonutil.default_socket_path()}')
+
+    def run(self, args):
+        """
+        Execute the command
+        """
+        socket_path = args.socket or daemonutil.default_socket_path()
+
+        if args.action == 'stop':
+            if not daemonutil.stop(socket_path):
+                print(f'No daemon listening on {socket_path}')
+            else:
+                print('Daemon stopped')
+
+            return
+
+        if args.action == 'status':
+            if not daemonutil.status(socket_path):
+                print(f'No daemon listening on {socket_path}')
+
+            return
+
+        global_arguments = self.shell.global_arguments(args)
+
+        print(f'Listening on {socket_path}, run the omni commands of this user with:')
+
+        print(f'export {daemonutil.SOCKET_VARIABLE}={socket_path}')
+
+        try:
+            daemonutil.serve(lambda argv: self.shell.run(global_arguments + argv), socket_path=socket_path)
+        except KeyboardInterrupt:
+            pass
+
+        print('Daemon stopped')
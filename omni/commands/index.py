@@ -1,19 +1,31 @@
+import json
 import os
 import time
-import pypdf
 
+import omni.utils.clientutil as clientutil
 import omni.utils.archiveutil as archiveutil
+import omni.utils.chunkutil as chunkutil
+import omni.utils.manifestutil as manifestutil
+import omni.utils.pdfutil as pdfutil
+import omni.utils.provisionutil as provisionutil
 import omni.utils.sourcetypeutil as sourcetypeutil
+import omni.utils.traceutil as traceutil
+import omni.utils.uploadutil as uploadutil
+import omni.utils.watchutil as watchutil
 
+from argparse import Namespace
+from dataclasses import dataclass, field
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
 from pathlib import Path
 from logging import getLogger
-from typing import List, Optional
+from typing import Callable, Iterable, Iterator, Optional
 from argparse import ArgumentParser
 from datetime import timedelta
+from functools import partial
 
 from omni.commands.base import Command
-from omni.utils.fileutil import collect_files
-from omnilake.client.client import OmniLake
+from omni.utils.fileutil import is_binary, walk_files
 from omnilake.client.request_definitions import (
     AddEntry,
     AddSource,
@@ -23,6 +35,75 @@ from omnilake.client.request_definitions import (
 
 logger = getLogger(__name__)
 
+SKIPPED_EMPTY = 'empty file'
+SKIPPED_TOO_LARGE = 'too large'
+SKIPPED_BINARY = 'binary file'
+
+SKIP_REASONS = (SKIPPED_EMPTY, SKIPPED_TOO_LARGE, SKIPPED_BINARY)
+
+OUTCOMES = (manifestutil.ADDED, manifestutil.CHANGED, manifestutil.UNCHANGED, 'failed') + SKIP_REASONS
+
+# The seconds a request is expected to take when estimating a dry run
+DEFAULT_REQUEST_LATENCY = 0.2
+
+# The kinds of files a dry run counts the files and bytes of
+PLAN_KINDS = ('text', 'chunked', 'pdf')
+
+FILE_SOURCE_TYPE = 'local_file'
+
+BUNDLE_SOURCE_TYPE = 'local_file_bundle'
+
+# Source types by name, with their description and required fields
+SOURCE_TYPES = {
+    FILE_SOURCE_TYPE: ('A file uploaded from a local system', ['file_name', 'full_file_path', 'file_extension']),
+    BUNDLE_SOURCE_TYPE: ('Small files of a local directory uploaded together', ['directory', 'file_names', 'full_file_paths']),
+}
+
+@dataclass(eq=False)
+class _PlannedFile:
+    """
+    A file to upload, split in bodies: the whole file, each of its chunks or each of its pages
+    """
+    path: Path
+    relative_path: str
+    stat: os.stat_result
+    content_hash: str
+    status: str
+    options: dict = field(default_factory=dict)
+    chunked: bool = False
+    pdf: bool = False
+    page_futures: Optional[list[Future]] = None
+    bundled: bool = False
+    bodies: list[str] = field(default_factory=list)
+    sources: list[AddSource] = field(default_factory=list)
+    results: list[Optional[str]] = field(default_factory=list)
+    errors: list[Exception] = field(default_factory=list)
+    pending: int = 0
+
+    def add_body(self, bodies: dict[str, list[tuple['_PlannedFile', int]]], body_hash: str, source: AddSource):
+        """
+        Add a body to the file and register the file as one of its holders
+        """
+        bodies.setdefault(body_hash, []).append((self, len(self.bodies)))
+
+        self.bodies.append(body_hash)
+        self.sources.append(source)
+        self.results.append(None)
+
+        self.pending += 1
+
+    def owns_any(self, bodies: dict[str, list[tuple['_PlannedFile', int]]]) -> bool:
+        """
+        Whether the file is the first holder of any of its bodies, which it then uploads
+        """
+        return any(bodies[body_hash][0][0] is self for body_hash in self.bodies)
+
+    def take_bodies(self, bodies: dict[str, list[tuple['_PlannedFile', int]]]) -> dict[str, list[tuple['_PlannedFile', int]]]:
+        """
+        Remove the bodies of the file from a registry, returns them as a registry of their own
+        """
+        return {body_hash: bodies.pop(body_hash) for body_hash in dict.fromkeys(self.bodies) if body_hash in bodies}
+
 class RefreshIndexCommand(Command):
     command_name='index'
     description='Create or update the index based on the files in the directory'
@@ -32,7 +113,7 @@ class RefreshIndexCommand(Command):
     def __init__(self, omnilake_app_name: Optional[str] = None,
                  omnilake_deployment_id: Optional[str] = None):
         super().__init__()
-        self.omnilake = OmniLake(
+        self.omnilake = clientutil.SharedClient(
             app_name=omnilake_app_name,
             deployment_id=omnilake_deployment_id,
         )
@@ -43,90 +124,545 @@ class RefreshIndexCommand(Command):
         parser.add_argument('--directory', '-D', help='The directory to index files from. Defaults to the working directory', default=os.getcwd())
         parser.add_argument('--shallow', '-s', help='Only index files in the root directory', action='store_true')
         parser.add_argument('--ignore', '-i', help=f'Ignore files matching the pattern. Already ignores {cls.ignore_patterns}', action='append')
+        parser.add_argument('--no-gitignore', help='Do not honour .gitignore files found in the directory', action='store_true')
+        parser.add_argument('--workers', '-w', help=f'The number of files to upload concurrently. Defaults to {uploadutil.DEFAULT_WORKERS}', default=uploadutil.DEFAULT_WORKERS, type=int)
+        parser.add_argument('--pdf-workers', help='The number of processes extracting PDF text. Defaults to the number of CPUs', type=int)
+        parser.add_argument('--chunk-size', help=f'Split text files larger than this many bytes into several entries, 0 disables it. Defaults to {chunkutil.DEFAULT_CHUNK_SIZE}', default=chunkutil.DEFAULT_CHUNK_SIZE, type=int)
+        parser.add_argument('--chunk-lines', help='Split text files into entries of this many lines instead of by size', type=int)
+        parser.add_argument('--chunk-overlap', help='How many bytes, or lines with "--chunk-lines", each chunk repeats from the previous one. Defaults to 0', default=0, type=int)
+        parser.add_argument('--bundle', help='Pack text files of the same directory into entries of up to this many bytes, each file under a path header. Defaults to no bundling', type=int)
+        parser.add_argument('--dedup', help='Upload identical files, chunks and PDF pages of the run once, walking every file before the first upload', action='store_true')
+        parser.add_argument('--max-file-size', help='Skip files larger than this many bytes', type=int)
+        parser.add_argument('--watch', help='Keep running after indexing, and index the files changed in the directory as they change', action='store_true')
+        parser.add_argument('--debounce', help=f'With "--watch", the seconds without changes before changed files are indexed. Defaults to {watchutil.DEFAULT_DEBOUNCE}', default=watchutil.DEFAULT_DEBOUNCE, type=float)
+        parser.add_argument('--poll', help='With "--watch", scan the directory at an interval instead of listening to file system events', action='store_true')
+        parser.add_argument('--poll-interval', help=f'The seconds between scans when polling. Defaults to {watchutil.DEFAULT_POLL_INTERVAL}', default=watchutil.DEFAULT_POLL_INTERVAL, type=float)
+        parser.add_argument('--force', '-f', help='Upload every file, even the ones the local manifest reports as unchanged', action='store_true')
+        parser.add_argument('--reprovision', help='Create the archive and source type even if they are recorded locally as provisioned', action='store_true')
+        parser.add_argument('--config', '-c', help='A YAML or JSON file listing the directories to index, each with its archive, ignore patterns and shallow option')
+        parser.add_argument('--dry-run', help='Report the files, requests and bytes a run would send and how long it would take, without contacting OmniLake', action='store_true')
+        parser.add_argument('--request-latency', help=f'With "--dry-run", the seconds each request is expected to take. Defaults to {DEFAULT_REQUEST_LATENCY}', default=DEFAULT_REQUEST_LATENCY, type=float)
 
-    def _create_archive(self, directory: str, archive_id: str):
-        """
-        Create an archive if it doesn't exist
+    @classmethod
+    def check_arguments(cls, parser: ArgumentParser, args):
+        # Caught before anything is provisioned, rather than when the first file is uploaded or chunked
+        if args.workers < 1:
+            parser.error('"--workers" must be at least 1')
 
-        Keyword arguments:
-        directory -- the directory being indexed
-        archive_name -- the archive ID
+        if args.pdf_workers is not None and args.pdf_workers < 1:
+            parser.error('"--pdf-workers" must be at least 1')
+
+        try:
+            chunkutil.check_options(max_bytes=args.chunk_size, max_lines=args.chunk_lines, overlap=args.chunk_overlap)
+        except ValueError as e:
+            parser.error(str(e))
+
+    def _archive_definition(self, directory: str, archive_id: str) -> CreateArchive:
+        """
+        Build the request creating the archive of a directory
         """
-        archive = CreateArchive(
+        return CreateArchive(
             archive_id=archive_id,
             configuration=VectorArchiveConfiguration(),
             description=f'Archive for local file directory {directory} from someone\'s computer :shrug:',
         )
 
-        archiveutil.create_archive_and_wait(self.omnilake, archive)
-
-    def _process_file_list(self, archive_name, directory, file_list: List[Path]):
+    def _process_file_list(self, archive_name, directory, file_list: Iterable[Path],
+                           manifest: manifestutil.Manifest, force: bool = False,
+                           workers: int = uploadutil.DEFAULT_WORKERS,
+                           pdf_extractor: Optional[pdfutil.PdfExtractor] = None,
+                           chunk_size: Optional[int] = chunkutil.DEFAULT_CHUNK_SIZE, chunk_lines: Optional[int] = None,
+                           chunk_overlap: int = 0, max_file_size: Optional[int] = None, bundle_size: Optional[int] = None,
+                           dedup: bool = False, pipeline: Optional[uploadutil.UploadPipeline] = None) -> dict[str, int]:
         """
-        Process the list of files to index
+        Process the list of files to index, skipping the ones the manifest reports as unchanged.
+        Files are read on the calling thread and uploaded by a pool of workers as soon as they are found, while PDF
+        pages are extracted in worker processes and uploaded as each page finishes. Large text files are read through
+        a memory map and uploaded as one entry per chunk, identical chunks of a file being uploaded once.
+        Small text files of the same directory can be bundled, each bundle uploaded as a single source and entry once full.
+        With dedup, every file is walked and hashed before the first upload, so each distinct body of the run (a whole
+        file, a chunk or a PDF page) is uploaded as a single entry with a source for every file, chunk or page holding it.
+        Files that are empty, too large or binary are skipped from their size and first bytes.
+        Returns the number of files per outcome, skipped files are counted per reason, the bytes uploaded,
+        the bodies deduplicated and the files bundled.
 
         Keyword arguments:
         archive_name -- the archive ID
         directory -- the base directory that holds the files
-        file_list -- the list of files to index
+        file_list -- the files to index, consumed as they are discovered
+        manifest -- the manifest of files already indexed into the archive
+        force -- upload every file regardless of the manifest (default False)
+        workers -- the number of concurrent uploads (default 8)
+        pdf_extractor -- the extractor used for PDF files (default a new one)
+        chunk_size -- split text files larger than this many bytes, None or 0 disables it (default 1 MiB)
+        chunk_lines -- split text files in chunks of this many lines instead of by size (default None)
+        chunk_overlap -- the bytes, or lines, each chunk repeats from the previous one (default 0)
+        max_file_size -- skip files larger than this many bytes (default None, no limit)
+        bundle_size -- bundle the text files of a directory in entries of up to this many bytes (default None, no bundling)
+        dedup -- upload identical bodies of the whole run once, at the cost of walking every file first (default False)
+        pipeline -- a pipeline shared with other calls, whose counts are only final once it is joined (default a new one)
         """
+        pdf_extractor = pdf_extractor or pdfutil.PdfExtractor()
+
+        counts = {**{outcome: 0 for outcome in OUTCOMES}, 'bytes': 0, 'deduplicated': 0, 'bundled': 0, 'bundles': 0}
+
+        # The files and slots holding each distinct body, the first one uploads it
+        # Without dedup, the bodies of a file are taken out as soon as it is planned, so the registry stays small
+        text_bodies = {}
+
+        page_bodies = {}
+
+        def file_indexed(planned_file: '_PlannedFile'):
+            if planned_file.errors:
+                print(f'Failed {planned_file.relative_path}: {planned_file.errors[0]}')
+                counts['failed'] += 1
+                return
+
+            manifest.record(planned_file.relative_path, planned_file.stat, planned_file.content_hash, planned_file.results,
+                            planned_file.options)
+            counts[planned_file.status] += 1
+            counts['bytes'] += planned_file.stat.st_size
+
+            print(f'Added {planned_file.relative_path}')
+
+        def body_indexed(group: uploadutil.UploadGroup, holders: list[tuple['_PlannedFile', int]]):
+            source_rns = group.results[0] if not group.failed else [None] * len(holders)
+
+            for (planned_file, slot), source_rn in zip(holders, source_rns):
+                if group.failed:
+                    planned_file.errors.append(group.errors[0])
+
+                planned_file.results[slot] = source_rn
+                planned_file.pending -= 1
+
+                if planned_file.pending == 0:
+                    file_indexed(planned_file)
+
+        def upload_bodies(bodies: dict[str, list[tuple['_PlannedFile', int]]], planned_file: '_PlannedFile',
+                          load_contents: Callable[[], Iterable[str]]):
+            """
+            Upload the bodies first held by a file, its contents are only loaded when it holds any
+            """
+            if not planned_file.bodies:
+                file_indexed(planned_file)
+                return
+
+            if not planned_file.owns_any(bodies):
+                return
+
+            for slot, (body_hash, contents) in enumerate(zip(planned_file.bodies, load_contents())):
+                holders = bodies[body_hash]
+
+                if holders[0] != (planned_file, slot):
+                    continue
+
+                counts['deduplicated'] += len(holders) - 1
+
+                upload_group = pipeline.group(name=planned_file.relative_path, on_complete=partial(body_indexed, holders=holders))
+
+                pipeline.submit(
+                    upload_group,
+                    self._index_body,
+                    archive_name=archive_name,
+                    contents=contents,
+                    sources=[holder.sources[holder_slot] for holder, holder_slot in holders],
+                )
+
+                pipeline.close(upload_group)
+
+        def upload_text(bodies: dict[str, list[tuple['_PlannedFile', int]]], planned_file: '_PlannedFile'):
+            """
+            Upload the bodies of a text file, read again from the file
+            """
+            if planned_file.chunked:
+                # Chunks are produced one at a time, so large files are never held whole
+                load_contents = partial(chunkutil.iter_chunks, planned_file.path, max_bytes=chunk_size,
+                                        max_lines=chunk_lines, overlap=chunk_overlap)
+            else:
+                load_contents = lambda: [planned_file.path.read_bytes().decode(encoding='utf-8', errors='ignore')]
+
+            upload_bodies(bodies, planned_file, load_contents)
+
+        def upload_pages(planned_file: '_PlannedFile'):
+            """
+            Upload each page of a PDF as soon as it is extracted, the tasks are only started once their page is
+            """
+            for page_number, page_future in enumerate(planned_file.page_futures):
+                planned_file.add_body(page_bodies, self._page_key(planned_file.content_hash, page_number), self._source_definition(
+                    file_name=planned_file.path.name, file_path=planned_file.relative_path, page_number=page_number))
+
+            page_futures, planned_file.page_futures = planned_file.page_futures, None
+
+            if not page_futures:
+                file_indexed(planned_file)
+                return
+
+            for page_future, (body_hash, holders) in zip(page_futures, planned_file.take_bodies(page_bodies).items()):
+                upload_group = pipeline.group(name=planned_file.relative_path, on_complete=partial(body_indexed, holders=holders))
+
+                pipeline.submit_when_done(
+                    page_future,
+                    upload_group,
+                    self._index_page,
+                    archive_name=archive_name,
+                    sources=[holder.sources[holder_slot] for holder, holder_slot in holders],
+                )
+
+                pipeline.close(upload_group)
+
+        def bundle_indexed(group: uploadutil.UploadGroup, members: list['_PlannedFile']):
+            for planned_file in members:
+                if group.failed:
+                    planned_file.errors.append(group.errors[0])
+
+                planned_file.results[0] = group.results[0] if not group.failed else None
+                planned_file.pending -= 1
+
+                file_indexed(planned_file)
+
+        def upload_bundle(bundle_directory: str, members: list['_PlannedFile']):
+            counts['bundled'] += len(members)
+            counts['bundles'] += 1
+
+            upload_group = pipeline.group(name=bundle_directory, on_complete=partial(bundle_indexed, members=members))
+
+            pipeline.submit(
+                upload_group,
+                self._index_bundle,
+                archive_name=archive_name,
+                directory=bundle_directory,
+                members=[(planned_file.relative_path, planned_file.path) for planned_file in members],
+            )
+
+            pipeline.close(upload_group)
+
+        planned_files = self._plan_file_list(directory=directory, file_list=file_list, manifest=manifest, counts=counts,
+                                             text_bodies=text_bodies, force=force, pdf_extractor=pdf_extractor,
+                                             chunk_size=chunk_size, chunk_lines=chunk_lines, chunk_overlap=chunk_overlap,
+                                             max_file_size=max_file_size, bundle_size=bundle_size)
+
+        with nullcontext(pipeline) if pipeline else uploadutil.UploadPipeline(workers=workers) as pipeline:
+            if not dedup:
+                open_bundles = {}
+
+                def upload_closed_bundle(closed_bundle: Optional[tuple[str, list['_PlannedFile']]]):
+                    if closed_bundle is None:
+                        return
+
+                    bundle_directory, members = closed_bundle
+
+                    if len(members) > 1:
+                        upload_bundle(bundle_directory, members)
+                    else:
+                        upload_text({members[0].bodies[0]: [(members[0], 0)]}, members[0])
+
+                for planned_file in planned_files:
+                    if planned_file.pdf:
+                        upload_pages(planned_file)
+                    elif bundle_size and self._bundleable(planned_file, bundle_size):
+                        # A file left alone in its bundle is uploaded with its single body once the bundle closes
+                        planned_file.take_bodies(text_bodies)
+
+                        upload_closed_bundle(self._bundle_file(open_bundles, planned_file, bundle_size))
+                    else:
+                        upload_text(planned_file.take_bodies(text_bodies), planned_file)
+
+                for bundle_directory in list(open_bundles):
+                    upload_closed_bundle((bundle_directory, open_bundles.pop(bundle_directory)[1]))
+
+                return counts
+
+            planned_files = list(planned_files)
+
+            if bundle_size:
+                for bundle_directory, members in self._plan_bundles(planned_files, text_bodies, bundle_size):
+                    upload_bundle(bundle_directory, members)
+
+            for planned_file in planned_files:
+                if not planned_file.pdf and not planned_file.bundled:
+                    upload_text(text_bodies, planned_file)
+
+            # Every page has to be extracted before its duplicates are all known
+            # Pages are only compared with pages, so text bodies are uploaded meanwhile
+            pdf_files = [planned_file for planned_file in planned_files if planned_file.pdf]
+
+            for planned_file in pdf_files:
+                # The text is released once hashed, and read back from the extractor when uploaded
+                page_futures, planned_file.page_futures = planned_file.page_futures, None
+
+                try:
+                    page_hashes = [manifestutil.hash_contents(page_future.result()[1].encode('utf-8')) for page_future in page_futures]
+                except Exception as e:
+                    planned_file.errors.append(e)
+                    continue
+
+                for page_number, page_hash in enumerate(page_hashes):
+                    planned_file.add_body(page_bodies, page_hash, self._source_definition(
+                        file_name=planned_file.path.name, file_path=planned_file.relative_path, page_number=page_number))
+
+            for planned_file in pdf_files:
+                if planned_file.errors:
+                    file_indexed(planned_file)
+                    continue
+
+                upload_bodies(page_bodies, planned_file, partial(pdf_extractor.pages, planned_file.path, planned_file.content_hash))
+
+        return counts
+
+    def _plan_file_list(self, directory, file_list: Iterable[Path], manifest: manifestutil.Manifest,
+                        counts: dict[str, int], text_bodies: dict[str, list[tuple['_PlannedFile', int]]],
+                        force: bool = False, pdf_extractor: Optional[pdfutil.PdfExtractor] = None,
+                        chunk_size: Optional[int] = chunkutil.DEFAULT_CHUNK_SIZE, chunk_lines: Optional[int] = None,
+                        chunk_overlap: int = 0, max_file_size: Optional[int] = None, bundle_size: Optional[int] = None,
+                        extract_pdfs: bool = True) -> Iterator['_PlannedFile']:
+        """
+        Classify and hash the files to index as they are found, splitting text files in bodies, without uploading anything.
+        Unchanged and skipped files are counted, and PDF pages are submitted to the extractor. Text files uploaded
+        with other chunk or bundle options than the ones recorded in the manifest are changed.
+        Yields each file to upload, its text bodies registered in text_bodies.
+
+        Keyword arguments:
+        directory -- the base directory that holds the files
+        file_list -- the files to index, consumed as they are discovered
+        manifest -- the manifest of files already indexed into the archive
+        counts -- the counts of the run, updated with the unchanged, skipped and failed files
+        text_bodies -- the files and slots holding each text body, updated with the bodies of every file
+        force -- plan every file regardless of the manifest (default False)
+        pdf_extractor -- the extractor used for PDF files (default a new one)
+        chunk_size -- split text files larger than this many bytes, None or 0 disables it (default 1 MiB)
+        chunk_lines -- split text files in chunks of this many lines instead of by size (default None)
+        chunk_overlap -- the bytes, or lines, each chunk repeats from the previous one (default 0)
+        max_file_size -- skip files larger than this many bytes (default None, no limit)
+        bundle_size -- bundle the text files of a directory in entries of up to this many bytes (default None, no bundling)
+        extract_pdfs -- submit the pages of PDF files for extraction, otherwise they have no page futures (default True)
+        """
+        pdf_extractor = pdf_extractor or pdfutil.PdfExtractor()
+
+        # The options shaping the upload of text files, PDFs are uploaded page by page whatever they are
+        text_options = {'chunk_size': chunk_size or None, 'chunk_lines': chunk_lines, 'chunk_overlap': chunk_overlap,
+                        'bundle_size': bundle_size}
+
         for collected_file in file_list:
             relative_to_base = str(collected_file.relative_to(directory))
 
-            file_contents = collected_file.read_bytes()
+            is_pdf = collected_file.name.endswith('.pdf')
+
+            file_options = {} if is_pdf else text_options
+
+            # A file can vanish or become unreadable after being found, it fails alone
+            try:
+                file_stat = collected_file.stat()
+
+                if not force and manifest.is_unchanged(relative_to_base, file_stat, file_options):
+                    logger.debug(f'Skipped {relative_to_base} ... unchanged')
+                    counts[manifestutil.UNCHANGED] += 1
+                    continue
+
+                if file_stat.st_size == 0:
+                    skip_reason = SKIPPED_EMPTY
+                elif max_file_size and file_stat.st_size > max_file_size:
+                    skip_reason = SKIPPED_TOO_LARGE
+                elif not is_pdf and is_binary(collected_file):
+                    skip_reason = SKIPPED_BINARY
+                else:
+                    skip_reason = None
+
+                if skip_reason:
+                    print(f'Skipped {relative_to_base} ... {skip_reason}')
+                    counts[skip_reason] += 1
+                    continue
+
+                chunked = not is_pdf and (chunk_lines or (chunk_size and file_stat.st_size > chunk_size))
+
+                # Files that are extracted or chunked are never loaded whole, the others are read again when uploaded
+                with traceutil.span('hash', 'file', size=file_stat.st_size):
+                    if is_pdf or chunked:
+                        content_hash = manifestutil.hash_file(collected_file)
+                    else:
+                        content_hash = manifestutil.hash_contents(collected_file.read_bytes())
+            except (OSError, ValueError) as e:
+                print(f'Failed {relative_to_base}: {e}')
+                counts['failed'] += 1
+                continue
+
+            file_status = manifestutil.ADDED if force else manifest.classify(relative_to_base, content_hash, file_options)
 
-            if len(file_contents) == 0:
-                print(f'Skipped {relative_to_base} ... empty file')
+            if file_status == manifestutil.UNCHANGED:
+                logger.debug(f'Skipped {relative_to_base} ... contents unchanged')
+                manifest.touch(relative_to_base, file_stat)
+                counts[manifestutil.UNCHANGED] += 1
                 continue
 
-            if collected_file.name.endswith('.pdf'):
-                print('Detected PDF file, extracting text...')
+            planned_file = _PlannedFile(path=collected_file, relative_path=relative_to_base, stat=file_stat,
+                                        content_hash=content_hash, status=file_status, options=file_options,
+                                        chunked=bool(chunked), pdf=is_pdf)
+
+            if is_pdf and extract_pdfs:
+                print(f'Detected PDF file {relative_to_base}, extracting text...')
+
+                try:
+                    planned_file.page_futures = pdf_extractor.submit(collected_file, content_hash)
+                except Exception as e:
+                    print(f'Failed {relative_to_base}: {e}')
+                    counts['failed'] += 1
+                    continue
+            elif chunked:
+                try:
+                    chunk_hashes = [manifestutil.hash_contents(chunk.encode('utf-8')) for chunk in
+                                    chunkutil.iter_chunks(collected_file, max_bytes=chunk_size, max_lines=chunk_lines, overlap=chunk_overlap)]
+                except (OSError, ValueError) as e:
+                    print(f'Failed {relative_to_base}: {e}')
+                    counts['failed'] += 1
+                    continue
+
+                # Fits in a single chunk, indexed like any other file
+                single_chunk = len(chunk_hashes) == 1
+
+                for chunk_index, chunk_hash in enumerate(chunk_hashes):
+                    planned_file.add_body(text_bodies, chunk_hash, self._source_definition(
+                        file_name=collected_file.name, file_path=relative_to_base,
+                        chunk_index=None if single_chunk else chunk_index))
+            elif not is_pdf:
+                planned_file.add_body(text_bodies, content_hash, self._source_definition(
+                    file_name=collected_file.name, file_path=relative_to_base))
+
+            yield planned_file
+
+    def _dry_run_file_list(self, directory, file_list: Iterable[Path], manifest: manifestutil.Manifest,
+                           force: bool = False, pdf_extractor: Optional[pdfutil.PdfExtractor] = None,
+                           chunk_size: Optional[int] = chunkutil.DEFAULT_CHUNK_SIZE, chunk_lines: Optional[int] = None,
+                           chunk_overlap: int = 0, max_file_size: Optional[int] = None,
+                           bundle_size: Optional[int] = None, dedup: bool = False) -> dict[str, int]:
+        """
+        Plan the indexing of a list of files like _process_file_list does, without uploading anything nor updating the manifest.
+        PDF pages are taken from the extraction cache, or only counted when the PDF was never extracted, in which
+        case its pages are assumed distinct from the pages of other PDFs.
+        Returns the counts of _process_file_list, along with the files and bytes of each kind, the chunks and pages,
+        the AddSource and AddEntry requests and the upload tasks they are sent in.
+
+        Keyword arguments:
+        directory -- the base directory that holds the files
+        file_list -- the files to plan, consumed as they are discovered
+        manifest -- the manifest of files already indexed into the archive
+        force -- plan every file regardless of the manifest (default False)
+        pdf_extractor -- the extractor whose cache holds the text of PDF pages (default a new one)
+        chunk_size -- split text files larger than this many bytes, None or 0 disables it (default 1 MiB)
+        chunk_lines -- split text files in chunks of this many lines instead of by size (default None)
+        chunk_overlap -- the bytes, or lines, each chunk repeats from the previous one (default 0)
+        max_file_size -- skip files larger than this many bytes (default None, no limit)
+        bundle_size -- bundle the text files of a directory in entries of up to this many bytes (default None, no bundling)
+        dedup -- plan identical bodies of the whole run as uploaded once (default False)
+        """
+        pdf_extractor = pdf_extractor or pdfutil.PdfExtractor()
+
+        counts = {**{outcome: 0 for outcome in OUTCOMES}, 'bytes': 0, 'deduplicated': 0, 'bundled': 0, 'bundles': 0,
+                  **{f'{kind} files': 0 for kind in PLAN_KINDS}, **{f'{kind} bytes': 0 for kind in PLAN_KINDS},
+                  'chunks': 0, 'pages': 0, 'sources': 0, 'entries': 0, 'tasks': 0}
+
+        text_bodies = {}
+
+        page_bodies = {}
+
+        # Without dedup, only the bodies of a file are compared with each other, and never its pages
+        file_bodies = []
+
+        planned_files = []
+
+        for planned_file in self._plan_file_list(directory=directory, file_list=file_list, manifest=manifest, counts=counts,
+                                                 text_bodies=text_bodies, force=force, pdf_extractor=pdf_extractor,
+                                                 chunk_size=chunk_size, chunk_lines=chunk_lines, chunk_overlap=chunk_overlap,
+                                                 max_file_size=max_file_size, bundle_size=bundle_size, extract_pdfs=False):
+            planned_files.append(planned_file)
+
+            if planned_file.pdf:
+                pages = pdf_extractor.cached_pages(planned_file.content_hash)
+
+                try:
+                    # Pages of identical PDFs share their keys, so those are still deduplicated
+                    page_keys = ([manifestutil.hash_contents(page_text.encode('utf-8')) for page_text in pages] if pages is not None and dedup else
+                                 [self._page_key(planned_file.content_hash, page_number) for page_number in
+                                  range(len(pages) if pages is not None else pdfutil.count_pages(planned_file.path))])
+                except Exception as e:
+                    print(f'Failed {planned_file.relative_path}: {e}')
+                    planned_file.errors.append(e)
+                    counts['failed'] += 1
+                    continue
 
-                pdf_reader = pypdf.PdfReader(stream=collected_file)
+                for page_number, page_key in enumerate(page_keys):
+                    planned_file.add_body(page_bodies, page_key, self._source_definition(
+                        file_name=planned_file.path.name, file_path=planned_file.relative_path, page_number=page_number))
 
-                print('Splitting PDF into pages...')
+                if not dedup:
+                    file_bodies += [[holder] for holders in planned_file.take_bodies(page_bodies).values() for holder in holders]
+            elif not dedup and not (bundle_size and self._bundleable(planned_file, bundle_size)):
+                file_bodies += planned_file.take_bodies(text_bodies).values()
+            elif not dedup:
+                planned_file.take_bodies(text_bodies)
 
-                for page_number, page in enumerate(pdf_reader.pages):
-                    self._index_file(
-                        archive_name=archive_name,
-                        file_contents=page.extract_text(),
-                        file_name=collected_file.name,
-                        file_path=relative_to_base,
-                        page_number=page_number,
-                    )
+        if bundle_size:
+            for bundle_directory, members in self._plan_bundles(planned_files, text_bodies if dedup else None, bundle_size):
+                counts['bundled'] += len(members)
+                counts['bundles'] += 1
 
-                    print(f'Added {relative_to_base} page {page_number}')
+                counts['sources'] += 1
+                counts['entries'] += 1
+                counts['tasks'] += 1
+
+            if not dedup:
+                # Files left alone in their bundle are uploaded on their own
+                file_bodies += [[(planned_file, 0)] for planned_file in planned_files if
+                                not planned_file.bundled and self._bundleable(planned_file, bundle_size)]
+
+        for holders in file_bodies if not dedup else [*text_bodies.values(), *page_bodies.values()]:
+            if all(planned_file.bundled for planned_file, _ in holders):
                 continue
 
-            decoded_contents = file_contents.decode(encoding='utf-8', errors='ignore')
+            counts['deduplicated'] += len(holders) - 1
 
-            self._index_file(
-                archive_name=archive_name,
-                file_contents=decoded_contents,
-                file_name=collected_file.name,
-                file_path=relative_to_base,
-            )
+            counts['sources'] += len(holders)
+            counts['entries'] += 1
+            counts['tasks'] += 1
+
+        for planned_file in planned_files:
+            if planned_file.errors:
+                continue
+
+            kind = 'pdf' if planned_file.pdf else 'chunked' if planned_file.chunked else 'text'
+
+            counts[planned_file.status] += 1
+            counts['bytes'] += planned_file.stat.st_size
+
+            counts[f'{kind} files'] += 1
+            counts[f'{kind} bytes'] += planned_file.stat.st_size
+
+            if kind == 'pdf':
+                counts['pages'] += len(planned_file.bodies)
+            elif kind == 'chunked':
+                counts['chunks'] += len(planned_file.bodies)
 
-            print(f'Added {relative_to_base}')
+        return counts
 
-    def _index_file(self, archive_name: str, file_contents: str, file_name: str, file_path: str,
-                    page_number: Optional[int] = None):
+    def _source_definition(self, file_name: str, file_path: str, page_number: Optional[int] = None,
+                           chunk_index: Optional[int] = None) -> AddSource:
         """
-        Index a file
+        Build the source of a file, or of one of its pages or chunks
 
         Keyword arguments:
-        archive_name -- the name of the archive
-        file_contents -- the contents of the file
         file_name -- the name of the file
         file_path -- the path of the file
         page_number -- the page number of the file (default None)
+        chunk_index -- the index of the chunk of the file (default None)
         """
         full_file_name = file_name
 
         if page_number:
             full_file_name = f'{file_name}.{page_number}'
 
-        source = AddSource(
-            source_type='local_file',
+        if chunk_index is not None:
+            full_file_name = f'{file_name}.chunk{chunk_index}'
+
+        return AddSource(
+            source_type=FILE_SOURCE_TYPE,
             source_arguments={
                 'file_name': full_file_name,
                 'file_extension': file_name.split('.')[-1],
@@ -134,12 +670,167 @@ class RefreshIndexCommand(Command):
             },
         )
 
-        source_result = self.omnilake.request(source)
+    def _index_body(self, archive_name: str, contents: str, sources: list[AddSource]) -> list[str]:
+        """
+        Add the sources holding a body and a single entry for it, returns the resource names of the sources
 
-        source_rn = source_result.response_body['resource_name']
+        Keyword arguments:
+        archive_name -- the name of the archive
+        contents -- the contents of the body
+        sources -- the sources of every file, page or chunk holding the body, the first one is its original
+        """
+        source_rns = [self.omnilake.request(source).response_body['resource_name'] for source in sources]
 
         entry = AddEntry(
-            content=file_contents,
+            content=contents,
+            sources=source_rns,
+            destination_archive_id=archive_name,
+            original_of_source=source_rns[0],
+        )
+
+        self.omnilake.request(entry)
+
+        return source_rns
+
+    def _page_key(self, content_hash: str, page_number: int) -> str:
+        """
+        Return the key of a PDF page whose text isn't known, shared by the same page of identical PDFs
+        """
+        return f'{content_hash}.{page_number}'
+
+    def _index_page(self, page: tuple[int, str], archive_name: str, sources: list[AddSource]) -> list[str]:
+        """
+        Index an extracted PDF page, returns the resource names of its sources
+
+        Keyword arguments:
+        page -- the page number and text of the page
+        archive_name -- the name of the archive
+        sources -- the sources of the page
+        """
+        _, page_text = page
+
+        return self._index_body(archive_name=archive_name, contents=page_text, sources=sources)
+
+    def _bundleable(self, planned_file: '_PlannedFile', bundle_size: int,
+                    bodies: Optional[dict[str, list[tuple['_PlannedFile', int]]]] = None) -> bool:
+        """
+        Whether a file can be bundled: a text file in a single body fitting in a bundle with its header.
+        With the bodies of the run, files whose body is held by several paths are left to deduplication.
+
+        Keyword arguments:
+        planned_file -- the file to upload
+        bundle_size -- the maximum size of a bundle in bytes
+        bodies -- the files and slots holding each text body (default None, duplicates aren't known)
+        """
+        if planned_file.pdf or planned_file.chunked or len(planned_file.bodies) != 1:
+            return False
+
+        if bodies is not None and len(bodies[planned_file.bodies[0]]) > 1:
+            return False
+
+        return self._bundled_size(planned_file) <= bundle_size
+
+    def _bundled_size(self, planned_file: '_PlannedFile') -> int:
+        """
+        Return the bytes a file takes in a bundle, header included
+        """
+        return planned_file.stat.st_size + len(self._bundle_header(planned_file.relative_path).encode('utf-8'))
+
+    def _bundle_file(self, open_bundles: dict[str, tuple[int, list['_PlannedFile']]], planned_file: '_PlannedFile',
+                     bundle_size: int) -> Optional[tuple[str, list['_PlannedFile']]]:
+        """
+        Add a file to the open bundle of its directory, returns the directory and the files of the bundle
+        it closes when it doesn't fit in it anymore
+
+        Keyword arguments:
+        open_bundles -- the size and the files of the open bundle of each directory
+        planned_file -- the file to bundle, see _bundleable
+        bundle_size -- the maximum size of a bundle in bytes
+        """
+        bundle_directory = str(Path(planned_file.relative_path).parent)
+
+        size = self._bundled_size(planned_file)
+
+        closed_bundle = None
+
+        if bundle_directory in open_bundles and open_bundles[bundle_directory][0] + size > bundle_size:
+            closed_bundle = (bundle_directory, open_bundles.pop(bundle_directory)[1])
+
+        open_size, members = open_bundles.setdefault(bundle_directory, (0, []))
+
+        members.append(planned_file)
+
+        open_bundles[bundle_directory] = (open_size + size, members)
+
+        return closed_bundle
+
+    def _plan_bundles(self, planned_files: list['_PlannedFile'], bodies: Optional[dict[str, list[tuple['_PlannedFile', int]]]],
+                      bundle_size: int) -> list[tuple[str, list['_PlannedFile']]]:
+        """
+        Pack the small text files of each directory in bundles of up to bundle_size bytes, headers included,
+        the way a run bundles them as they are found. A file alone in its bundle is uploaded on its own.
+        Returns the directory and the files of every bundle, the bundled files are marked as such.
+
+        Keyword arguments:
+        planned_files -- the files to upload, in the order they were found
+        bodies -- the files and slots holding each text body, None when duplicates aren't known
+        bundle_size -- the maximum size of a bundle in bytes
+        """
+        open_bundles = {}
+
+        closed_bundles = []
+
+        for planned_file in planned_files:
+            if self._bundleable(planned_file, bundle_size, bodies):
+                closed_bundles.append(self._bundle_file(open_bundles, planned_file, bundle_size))
+
+        closed_bundles += [(bundle_directory, members) for bundle_directory, (_, members) in open_bundles.items()]
+
+        bundles = []
+
+        for closed_bundle in closed_bundles:
+            if closed_bundle is None or len(closed_bundle[1]) < 2:
+                continue
+
+            for planned_file in closed_bundle[1]:
+                planned_file.bundled = True
+
+            bundles.append(closed_bundle)
+
+        return bundles
+
+    def _bundle_header(self, file_path: str) -> str:
+        """
+        Return the header introducing a file in a bundle
+        """
+        return f'==> {file_path} <==\n'
+
+    def _index_bundle(self, archive_name: str, directory: str, members: list[tuple[str, Path]]) -> str:
+        """
+        Read small files and index them together, returns the resource name of the bundle source
+
+        Keyword arguments:
+        archive_name -- the name of the archive
+        directory -- the directory holding the files, relative to the indexed directory
+        members -- the path relative to the indexed directory and the full path of each file
+        """
+        contents = '\n'.join(self._bundle_header(file_path) + path.read_bytes().decode(encoding='utf-8', errors='ignore')
+                              for file_path, path in members)
+
+        # Lists are sent as JSON strings, like every other source argument
+        source = AddSource(
+            source_type=BUNDLE_SOURCE_TYPE,
+            source_arguments={
+                'directory': directory,
+                'file_names': json.dumps([path.name for _, path in members]),
+                'full_file_paths': json.dumps([file_path for file_path, _ in members]),
+            },
+        )
+
+        source_rn = self.omnilake.request(source).response_body['resource_name']
+
+        entry = AddEntry(
+            content=contents,
             sources=[source_rn],
             destination_archive_id=archive_name,
             original_of_source=source_rn,
@@ -147,44 +838,380 @@ class RefreshIndexCommand(Command):
 
         self.omnilake.request(entry)
 
+        return source_rn
+
+    # Options a target of the config file can set, the others are shared by every target
+    target_options = {
+        'directory': str,
+        'archive': str,
+        'ignore': list,
+        'shallow': bool,
+        'no_gitignore': bool,
+    }
+
+    def _load_targets(self, args) -> list[Namespace]:
+        """
+        Load the config file listing the directories to index, returns the arguments of each target.
+        The config holds a list of targets, or an object with a "targets" list, and each target is
+        either a directory or an object with any of the target options. Relative directories are
+        resolved from the config file location.
+
+        Keyword arguments:
+        args -- the command arguments, used as defaults for every target
+        """
+        config_path = Path(args.config)
+
+        with open(config_path, 'r') as config_file:
+            if config_path.suffix in ('.yaml', '.yml'):
+                try:
+                    import yaml
+                except ImportError:
+                    raise ValueError(f'Reading {args.config} requires PyYAML, install the yaml extra or use a JSON config')
+
+                loaded = yaml.safe_load(config_file)
+            else:
+                loaded = json.load(config_file)
+
+        if isinstance(loaded, dict):
+            loaded = loaded.get('targets')
+
+        if not isinstance(loaded, list) or not loaded:
+            raise ValueError(f'{args.config} must list the targets to index')
+
+        targets = []
+
+        for position, loaded_target in enumerate(loaded, start=1):
+            if isinstance(loaded_target, str):
+                loaded_target = {'directory': loaded_target}
+
+            if not isinstance(loaded_target, dict) or 'directory' not in loaded_target:
+                raise ValueError(f'Missing directory in target {position} of {args.config}')
+
+            target_args = Namespace(**vars(args))
+
+            for option, value in loaded_target.items():
+                if option not in self.target_options:
+                    raise ValueError(f'Unknown option "{option}" in target {position} of {args.config}')
+
+                option_type = self.target_options[option]
+
+                if option == 'directory':
+                    value = str(config_path.parent / Path(value).expanduser())
+                elif option == 'ignore':
+                    # Added to the patterns given on the command line
+                    value = (args.ignore or []) + (value if isinstance(value, list) else [value])
+                elif option_type is bool:
+                    # Converting would turn any non-empty string, "false" included, into True
+                    if not isinstance(value, bool):
+                        raise ValueError(f'Option "{option}" in target {position} of {args.config} must be true or false')
+                else:
+                    value = option_type(value)
+
+                setattr(target_args, option, value)
+
+            targets.append(target_args)
+
+        return targets
+
     def run(self, args):
-        directory_path = Path(args.directory).resolve(strict=True)
-        archive_id = args.archive or directory_path.name
+        if args.config and args.watch:
+            raise ValueError('"--watch" can\'t be used with "--config", watch each directory with its own command')
 
-        if not directory_path.is_dir():
-            raise ValueError(f'{args.directory} is not a directory')
+        if args.dry_run and args.watch:
+            raise ValueError('"--watch" can\'t be used with "--dry-run"')
+
+        targets = self._load_targets(args) if args.config else [args]
 
-        if not directory_path.exists():
-            raise ValueError(f'{args.directory} does not exist')
-            
-        directory_abspath = directory_path.absolute()
         start = time.time()
 
-        print(f'Index files in {directory_abspath} to archive {archive_id}')
+        for target_args in targets:
+            target_args.directory_path = Path(target_args.directory).resolve(strict=True)
+
+            if not target_args.directory_path.is_dir():
+                raise ValueError(f'{target_args.directory} is not a directory')
 
-        # Create the archive if it doesn't exist
-        # archive should enforce latest version
-        self._create_archive(directory=directory_abspath, archive_id=archive_id)
+            target_args.archive_id = target_args.archive or target_args.directory_path.name
 
-        # Create the source type if it doesn't exist
-        sourcetypeutil.create_source_type(
-            omnilake=self.omnilake, 
-            name='local_file', 
-            description='A file uploaded from a local system', 
-            required_fields=['file_name', 'full_file_path', 'file_extension']
+            target_args.ignore_patterns = self.ignore_patterns + (target_args.ignore or [])
+
+            print(f'Index files in {target_args.directory_path} to archive {target_args.archive_id}')
+
+        provision_record = provisionutil.ProvisionRecord.for_deployment(
+            app_name=os.getenv('OMNILAKE_APP_NAME', args.app_name),
+            deployment_id=os.getenv('OMNILAKE_DEPLOYMENT_ID', args.deployment_id),
         )
-        
-        if args.ignore:
-            self.ignore_patterns.extend(args.ignore)
-        
-        collected_files = collect_files(directory=directory_path, recursive=not args.shallow, ignore_patterns=self.ignore_patterns)
 
-        print(f'{len(collected_files)} file(s) found. Processing...')
+        archives = {}
+
+        for target_args in targets:
+            archives.setdefault(target_args.archive_id, target_args.directory_path)
+
+        for target_args in targets:
+            target_args.manifest = manifestutil.Manifest.for_archive(
+                app_name=os.getenv('OMNILAKE_APP_NAME', args.app_name),
+                deployment_id=os.getenv('OMNILAKE_DEPLOYMENT_ID', args.deployment_id),
+                archive_id=target_args.archive_id,
+                directory=target_args.directory_path,
+            )
+
+        source_types = [FILE_SOURCE_TYPE, BUNDLE_SOURCE_TYPE] if args.bundle else [FILE_SOURCE_TYPE]
+
+        if args.dry_run:
+            self._dry_run(args, targets, archives, source_types, provision_record, start)
+            return
+
+        # Provisioning runs in the background while files are walked, read and extracted, uploads wait for it
+        provisioner = ThreadPoolExecutor(max_workers=1, thread_name_prefix='omni-provision')
+
+        provisioning = provisioner.submit(self._provision, archives=archives, source_types=source_types,
+                                          provision_record=provision_record, reprovision=args.reprovision)
+
+        # Iterate over the files in the base directories and load them into the archives
+        # Every target shares the PDF extractor and the upload workers, so uploads of a target overlap the walk of the next
+        # The manifests are saved even if the run fails, so finished files aren't uploaded again
+        try:
+            with pdfutil.PdfExtractor(workers=args.pdf_workers) as pdf_extractor:
+                process_options = dict(force=args.force, workers=args.workers, pdf_extractor=pdf_extractor,
+                                       chunk_size=args.chunk_size, chunk_lines=args.chunk_lines,
+                                       chunk_overlap=args.chunk_overlap, max_file_size=args.max_file_size,
+                                       bundle_size=args.bundle, dedup=args.dedup)
+
+                with uploadutil.UploadPipeline(workers=args.workers, gate=provisioning) as pipeline:
+                    for target_args in targets:
+                        print(f'Processing files in {target_args.directory_path}...')
+
+                        # Files are discovered lazily, so indexing starts with the first file found
+                        collected_files = walk_files(directory=target_args.directory_path, recursive=not target_args.shallow,
+                                                     ignore_patterns=target_args.ignore_patterns,
+                                                     use_gitignore=not target_args.no_gitignore)
+
+                        target_args.counts = self._process_file_list(
+                            archive_name=target_args.archive_id, directory=target_args.directory_path,
+                            file_list=collected_files, manifest=target_args.manifest, pipeline=pipeline, **process_options)
+
+                # Raises the provisioning error even when no file had to be uploaded
+                provisioning.result()
+
+                for target_args in targets:
+                    target_args.manifest.save()
+
+                if len(targets) > 1:
+                    for target_args in targets:
+                        print(f'{target_args.directory_path} to archive {target_args.archive_id}:')
+
+                        self._print_counts(target_args.counts)
+
+                    print('All targets:')
+
+                self._print_summary(self._combine_counts([target_args.counts for target_args in targets]), time.time() - start)
+
+                print('Indexing complete')
+
+                if args.watch:
+                    target_args = targets[0]
+
+                    self._watch(args, target_args.directory_path, target_args.ignore_patterns, target_args.manifest,
+                                partial(self._process_file_list, archive_name=target_args.archive_id,
+                                        directory=target_args.directory_path, manifest=target_args.manifest,
+                                        **process_options))
+        finally:
+            provisioner.shutdown(wait=False, cancel_futures=True)
+
+            for target_args in targets:
+                if hasattr(target_args, 'manifest'):
+                    target_args.manifest.save()
+
+    def _dry_run(self, args, targets: list[Namespace], archives: dict[str, Path], source_types: list[str],
+                 provision_record: provisionutil.ProvisionRecord, start: float):
+        """
+        Print the plan of a run, what it would provision and upload and how long it would take, without contacting OmniLake
+
+        Keyword arguments:
+        args -- the command arguments
+        targets -- the arguments of every target, with their directory, archive and manifest
+        archives -- the directory indexed into each archive, by archive ID
+        source_types -- the names of the source types used, see SOURCE_TYPES
+        provision_record -- the local record of what is provisioned in the deployment
+        start -- when the run started
+        """
+        plan_options = dict(force=args.force, chunk_size=args.chunk_size, chunk_lines=args.chunk_lines,
+                            chunk_overlap=args.chunk_overlap, max_file_size=args.max_file_size, bundle_size=args.bundle,
+                            dedup=args.dedup)
+
+        with pdfutil.PdfExtractor(workers=args.pdf_workers) as pdf_extractor:
+            for target_args in targets:
+                print(f'Planning files in {target_args.directory_path}...')
+
+                collected_files = walk_files(directory=target_args.directory_path, recursive=not target_args.shallow,
+                                             ignore_patterns=target_args.ignore_patterns,
+                                             use_gitignore=not target_args.no_gitignore)
+
+                target_args.counts = self._dry_run_file_list(directory=target_args.directory_path, file_list=collected_files,
+                                                             manifest=target_args.manifest, pdf_extractor=pdf_extractor,
+                                                             **plan_options)
+
+        if len(targets) > 1:
+            for target_args in targets:
+                print(f'{target_args.directory_path} to archive {target_args.archive_id}:')
+
+                self._print_plan(target_args.counts, args.workers, args.request_latency)
+
+            print('All targets:')
+
+        missing_archives = [archive_id for archive_id in archives if args.reprovision or not provision_record.has_archive(archive_id)]
+
+        missing_source_types = [source_type for source_type in source_types
+                                if args.reprovision or not provision_record.has_source_type(source_type)]
+
+        if missing_archives:
+            print(f'Would provision archive(s): {", ".join(missing_archives)}')
+
+        if missing_source_types:
+            print(f'Would create source type(s): {", ".join(missing_source_types)}')
+
+        self._print_plan(self._combine_counts([target_args.counts for target_args in targets]), args.workers, args.request_latency)
+
+        print(f'Planned in {timedelta(seconds=time.time() - start)}, nothing was sent')
+
+    def _provision(self, archives: dict[str, Path], source_types: list[str], provision_record: provisionutil.ProvisionRecord,
+                   reprovision: bool = False):
+        """
+        Create the archives and the source types of a run, skipping the ones the local record reports as provisioned
+
+        Keyword arguments:
+        archives -- the directory indexed into each archive, by archive ID
+        source_types -- the names of the source types used, see SOURCE_TYPES
+        provision_record -- the local record of what is provisioned in the deployment
+        reprovision -- create everything even if recorded (default False)
+        """
+        with traceutil.span('provision', 'index', archives=len(archives)):
+            missing = [archive_id for archive_id in archives if reprovision or not provision_record.has_archive(archive_id)]
+
+            # archive should enforce latest version
+            if len(missing) == 1:
+                ready = missing if archiveutil.create_archive_and_wait(self.omnilake, self._archive_definition(
+                    directory=archives[missing[0]], archive_id=missing[0])) else []
+            elif missing:
+                ready = archiveutil.create_archives_and_wait(self.omnilake, [
+                    self._archive_definition(directory=archives[archive_id], archive_id=archive_id) for archive_id in missing
+                ])
+            else:
+                ready = []
+
+            for archive_id in ready:
+                provision_record.add_archive(archive_id)
+
+            provision_record.save()
+
+            failed = [archive_id for archive_id in missing if archive_id not in ready]
+
+            if failed:
+                raise ValueError(f'Unable to provision archive(s) {", ".join(failed)}')
+
+            for source_type in source_types:
+                if not reprovision and provision_record.has_source_type(source_type):
+                    continue
+
+                description, required_fields = SOURCE_TYPES[source_type]
+
+                sourcetypeutil.create_source_type(
+                    omnilake=self.omnilake, 
+                    name=source_type, 
+                    description=description, 
+                    required_fields=required_fields
+                )
+
+                provision_record.add_source_type(source_type)
+
+                provision_record.save()
+
+    def _combine_counts(self, counts_list: list[dict[str, int]]) -> dict[str, int]:
+        """
+        Add up the counts of several runs
+        """
+        return {key: sum(counts[key] for counts in counts_list) for key in counts_list[0]}
+
+    def _print_counts(self, counts: dict[str, int]):
+        """
+        Print the number of files per outcome
+        """
+        skipped = ', '.join(f'{reason}: {counts[reason]}' for reason in SKIP_REASONS if counts[reason])
+
+        print(f'Added: {counts[manifestutil.ADDED]}, changed: {counts[manifestutil.CHANGED]}, '
+              f'unchanged: {counts[manifestutil.UNCHANGED]}, skipped: {sum(counts[reason] for reason in SKIP_REASONS)}'
+              f'{f" ({skipped})" if skipped else ""}, failed: {counts["failed"]}')
+
+    def _print_summary(self, counts: dict[str, int], elapsed: float):
+        """
+        Print the number of files per outcome of a run, and its throughput
+        """
+        files = sum(counts[outcome] for outcome in OUTCOMES)
+
+        print(f'Processed {files} file(s) in {timedelta(seconds=elapsed)}, {files / max(elapsed, 0.001):.1f} files/s, '
+              f'uploaded {counts["bytes"] / 1024 / 1024:.2f} MiB at {counts["bytes"] / 1024 / 1024 / max(elapsed, 0.001):.2f} MiB/s')
+
+        self._print_counts(counts)
+
+        if counts['bundled']:
+            print(f'Bundled: {counts["bundled"]} file(s) in {counts["bundles"]} entries')
+
+        if counts['deduplicated']:
+            print(f'Deduplicated: {counts["deduplicated"]} file(s), chunk(s) or page(s) added as sources of an entry already uploaded')
+
+    def _print_plan(self, counts: dict[str, int], workers: int, request_latency: float):
+        """
+        Print the files, requests and bytes of a dry run, and an estimate of its duration
+        """
+        self._print_counts(counts)
+
+        print('Files: ' + ', '.join(f'{kind}: {counts[f"{kind} files"]} ({counts[f"{kind} bytes"] / 1024 / 1024:.2f} MiB)'
+                                    for kind in PLAN_KINDS)
+              + f', chunks: {counts["chunks"]}, pages: {counts["pages"]}')
+
+        if counts['bundled']:
+            print(f'Bundled: {counts["bundled"]} file(s) in {counts["bundles"]} entries')
+
+        if counts['deduplicated']:
+            print(f'Deduplicated: {counts["deduplicated"]} file(s), chunk(s) or page(s) added as sources of an entry already uploaded')
+
+        requests = counts['sources'] + counts['entries']
+
+        # Each task sends its requests one after the other, and the workers run tasks side by side
+        estimate = requests * request_latency / max(min(workers, counts['tasks']), 1)
+
+        print(f'Would send {counts["sources"]} AddSource and {counts["entries"]} AddEntry request(s), '
+              f'{counts["bytes"] / 1024 / 1024:.2f} MiB of files, '
+              f'in about {timedelta(seconds=round(estimate))} with {workers} worker(s) at {request_latency}s per request')
+
+    def _watch(self, args, directory_path: Path, ignore_patterns: list[str], manifest: manifestutil.Manifest,
+               process_file_list: Callable[..., dict[str, int]]):
+        """
+        Index the files changed in the directory until interrupted, one debounced batch at a time
+
+        Keyword arguments:
+        args -- the command arguments
+        directory_path -- the directory to watch
+        ignore_patterns -- the patterns of the files to ignore
+        manifest -- the manifest shared with the initial run
+        process_file_list -- indexes a list of files, with the options of the initial run
+        """
+        print(f'Watching {directory_path} for changes, press Ctrl+C to stop')
+
+        batches = watchutil.watch(directory_path, ignore_patterns=ignore_patterns, recursive=not args.shallow,
+                                  use_gitignore=not args.no_gitignore, debounce=args.debounce, poll=args.poll,
+                                  poll_interval=args.poll_interval)
+
+        try:
+            for batch in batches:
+                start = time.time()
+
+                print(f'Detected {len(batch)} changed file(s)')
+
+                counts = process_file_list(file_list=batch)
 
-        # Iterate over the files in the base directory and load them into the archive        
-        self._process_file_list(archive_name=archive_id, directory=directory_abspath, file_list=collected_files)
+                # Saved after every batch, so stopping never loses more than the batch in progress
+                manifest.save()
 
-        end = time.time()
-        
-        print(f'Processed {len(collected_files)} file(s) in', timedelta(seconds=end-start))
-        print('Indexing complete')
+                self._print_summary(counts, time.time() - start)
+        except KeyboardInterrupt:
+            print('Stopped watching')
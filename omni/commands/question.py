@@ -1,9 +1,18 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import omni.utils.cacheutil as cacheutil
+import omni.utils.clientutil as clientutil
+import omni.utils.jobutil as jobutil
 import omni.utils.lakerequestutil as lakerequestutil
 
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
+from concurrent.futures import ThreadPoolExecutor
 from typing import Optional
 
-from omnilake.client.client import OmniLake
 from omnilake.client.request_definitions import SubmitLakeRequest
 from omnilake.client.construct_request_definitions  import (
     DirectResponseConfig,
@@ -21,7 +30,7 @@ class QuestionCommand(Command):
     def __init__(self, omnilake_app_name: Optional[str] = None,
                  omnilake_deployment_id: Optional[str] = None):
         super().__init__()
-        self.omnilake = OmniLake(
+        self.omnilake = clientutil.SharedClient(
             app_name=omnilake_app_name,
             deployment_id=omnilake_deployment_id,
         )
@@ -29,18 +38,41 @@ class QuestionCommand(Command):
     @classmethod
     def configure_parser(cls, parser: ArgumentParser):
         lookup_group = parser.add_argument_group('lookup', 'Archive lookup instructions')
-        lookup_group.add_argument('--archive', '-a', help='An archive ID to query', action='append', required=True)
+        lookup_group.add_argument('--archive', '-a', help='An archive ID to query, required unless every batch question sets its own', action='append')
         lookup_group.add_argument('--max-entries', help='The maximum number of entries to return from the lookup. Defaults to 10', default=10, type=int)
         lookup_group.add_argument('--lookup-query', help='The query to send to the lookup. Defaults to the "question" argument')
         lookup_group.add_argument('--tag', help='Prioritized tags for the lookup', action='append')
                 
         processing_group = parser.add_argument_group('processing', 'Processing instructions')
-        processing_group.add_argument('question', help='The question to be answered')
+        processing_group.add_argument('question', help='The question to be answered, required unless "--batch" is used', nargs='?')
         processing_group.add_argument('--goal', help='Goal to be achieved. Defaults to "Answer the following question: <question>"')
 
         response_group = parser.add_argument_group('response', 'Response instructions')
         response_group.add_argument('--response-config', help='The response configuration to use. Defaults to "direct"', default='direct', choices=['direct', 'simple'])
         response_group.add_argument('--simple-response-prompt', help='When the "--response-config" option is set to "simple", specifies the prompt that will process the response. Defaults to "Answer the following question: <question>"')
+        response_group.add_argument('--timeout', help='The maximum number of seconds to wait for the response. Defaults to no limit', type=float)
+
+        cache_group = parser.add_argument_group('cache', 'Local answer cache instructions')
+        cache_group.add_argument('--no-cache', help='Neither read nor store answers in the local cache', action='store_true')
+        cache_group.add_argument('--refresh', help='Ask OmniLake even if the answer is cached, and cache the new answer', action='store_true')
+        cache_group.add_argument('--cache-ttl', help=f'How long a cached answer stays valid, in seconds. Defaults to {cacheutil.DEFAULT_TTL}', default=cacheutil.DEFAULT_TTL, type=float)
+
+        batch_group = parser.add_argument_group('batch', 'Batch instructions')
+        batch_group.add_argument('--batch', '-b', help='A JSONL file with one question per line, either a string or an object overriding any of the options above')
+        batch_group.add_argument('--output', '-o', help='The JSONL file to stream the batch answers to. Defaults to the standard output')
+        batch_group.add_argument('--workers', '-w', help='The number of questions submitted concurrently in batch mode. Defaults to 8', default=8, type=int)
+
+    @classmethod
+    def check_arguments(cls, parser: ArgumentParser, args):
+        # Batch questions are checked line by line as the batch file is read
+        if args.batch:
+            return
+
+        if not args.question:
+            parser.error('the question is required unless "--batch" is used')
+
+        if not args.archive:
+            parser.error('the following arguments are required: --archive/-a')
 
     def _build_request(self, args) -> SubmitLakeRequest:
         """
@@ -70,25 +102,227 @@ class QuestionCommand(Command):
 
         return request
 
+    def _get_cache(self, args) -> Optional[cacheutil.ResponseCache]:
+        """
+        Return the answer cache, None if disabled
+        """
+        if args.no_cache:
+            return None
+
+        return cacheutil.ResponseCache(ttl=args.cache_ttl)
+
+    def _cache_key(self, request: SubmitLakeRequest) -> str:
+        """
+        Return the cache key of a request, scoped to the OmniLake deployment
+        """
+        return cacheutil.request_key(
+            request,
+            app_name=os.getenv('OMNILAKE_APP_NAME'),
+            deployment_id=os.getenv('OMNILAKE_DEPLOYMENT_ID'),
+        )
+
+    # Options a batch question can override, with the type they are converted to
+    batch_options = {
+        'archive': list,
+        'max_entries': int,
+        'lookup_query': str,
+        'tag': list,
+        'question': str,
+        'goal': str,
+        'response_config': str,
+        'simple_response_prompt': str,
+    }
+
+    def _load_batch(self, args) -> list[Namespace]:
+        """
+        Load the batch file, returns the arguments of each question
+
+        Keyword arguments:
+        args -- the command arguments, used as defaults for every question
+        """
+        batch = []
+
+        with open(args.batch, 'r') as batch_file:
+            for line_number, line in enumerate(batch_file, start=1):
+                line = line.strip()
+
+                if not line:
+                    continue
+
+                loaded = json.loads(line)
+
+                if isinstance(loaded, str):
+                    loaded = {'question': loaded}
+
+                question_args = Namespace(**vars(args))
+
+                question_args.line = line_number
+                question_args.id = loaded.pop('id', None)
+
+                for option, value in loaded.items():
+                    if option not in self.batch_options:
+                        raise ValueError(f'Unknown option "{option}" in {args.batch} line {line_number}')
+
+                    option_type = self.batch_options[option]
+
+                    if option_type is list:
+                        value = value if isinstance(value, list) else [value]
+                    else:
+                        value = option_type(value)
+
+                    setattr(question_args, option, value)
+
+                if not question_args.question:
+                    raise ValueError(f'Missing question in {args.batch} line {line_number}')
+
+                if not question_args.archive:
+                    raise ValueError(f'Missing archive in {args.batch} line {line_number}')
+
+                batch.append(question_args)
+
+        return batch
+
+    def _run_batch(self, args):
+        """
+        Submit every question of the batch file with bounded concurrency, wait on all of them
+        together and stream the answers as JSONL as each one completes
+        """
+        batch = self._load_batch(args)
+
+        print(f'Submitting {len(batch)} question(s)...', file=sys.stderr)
+
+        output_file = open(args.output, 'w') if args.output else sys.stdout
+
+        output_lock = threading.Lock()
+
+        cache = self._get_cache(args)
+
+        def write_answer(question_args: Namespace, submitted_at: float, status: str, lake_request_id: Optional[str] = None,
+                         answer: Optional[str] = None, error: Optional[str] = None, cached: bool = False):
+            record = {
+                'line': question_args.line,
+                'id': question_args.id,
+                'question': question_args.question,
+                'status': status,
+                'lake_request_id': lake_request_id,
+                'answer': answer,
+                'error': error,
+                'cached': cached,
+                'latency': round(time.monotonic() - submitted_at, 3),
+            }
+
+            with output_lock:
+                output_file.write(json.dumps(record) + '\n')
+                output_file.flush()
+
+        def submit(question_args: Namespace):
+            submitted_at = time.monotonic()
+
+            try:
+                request = self._build_request(question_args)
+
+                cache_key = self._cache_key(request) if cache else None
+
+                if cache and not args.refresh:
+                    cached_answer = cache.get(cache_key)
+
+                    if cached_answer:
+                        write_answer(question_args, submitted_at, status='COMPLETED', cached=True, **cached_answer)
+
+                        return None
+
+                return question_args, submitted_at, cache_key, lakerequestutil.submit(
+                    omnilake=self.omnilake,
+                    request=request,
+                    return_id_property='lake_request_id',
+                )
+            except Exception as e:
+                write_answer(question_args, submitted_at, status='ERROR', error=str(e))
+
+                return None
+
+        def fetch_answer(question_args: Namespace, submitted_at: float, cache_key: Optional[str], lake_request_id: str):
+            try:
+                answer = lakerequestutil.get_result(self.omnilake, lake_request_id)
+            except Exception as e:
+                write_answer(question_args, submitted_at, status='ERROR', lake_request_id=lake_request_id, error=str(e))
+                return
+
+            if cache:
+                cache.put(cache_key, {'lake_request_id': lake_request_id, 'answer': answer})
+
+            write_answer(question_args, submitted_at, status='COMPLETED', lake_request_id=lake_request_id, answer=answer)
+
+        try:
+            with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix='omni-question') as executor:
+                submitted = {}
+
+                for submission in executor.map(submit, batch):
+                    if submission:
+                        question_args, submitted_at, cache_key, (job_id, job_type, lake_request_id) = submission
+
+                        submitted[job_id] = (question_args, submitted_at, cache_key, job_type, lake_request_id)
+
+                print(f'Waiting for {len(submitted)} question(s)...', file=sys.stderr)
+
+                job_results = jobutil.as_completed(
+                    omnilake=self.omnilake,
+                    jobs=[(job_id, job_type) for job_id, (_, _, _, job_type, _) in submitted.items()],
+                    timeout=args.timeout,
+                    max_concurrency=args.workers,
+                )
+
+                for job_result in job_results:
+                    question_args, submitted_at, cache_key, _, lake_request_id = submitted[job_result.job_id]
+
+                    if job_result:
+                        executor.submit(fetch_answer, question_args, submitted_at, cache_key, lake_request_id)
+                    else:
+                        write_answer(question_args, submitted_at, status='TIMED_OUT' if job_result.timed_out else job_result.status,
+                                     lake_request_id=lake_request_id, error=job_result.status_message)
+        finally:
+            if args.output:
+                output_file.close()
+
+        print(f'Answered {len(batch)} question(s)', file=sys.stderr)
+
     def run(self, args):
         """
         Execute the command
         """
-        print(f'Requesting information against the archive(s): {args.archive}')
+        if args.batch:
+            self._run_batch(args)
+            return
 
         request = self._build_request(args)
 
+        cache = self._get_cache(args)
+
+        cache_key = self._cache_key(request) if cache else None
+
+        if cache and not args.refresh:
+            cached_answer = cache.get(cache_key)
+
+            if cached_answer:
+                print(f"Response from cache\n=================\n\n{cached_answer['answer']}")
+                return
+
+        print(f'Requesting information against the archive(s): {args.archive}')
+
         request_id = lakerequestutil.execute_and_wait(
             omnilake=self.omnilake,
             request=request,
             return_id_property='lake_request_id',
+            timeout=args.timeout,
         )
 
         if not request_id:
             print('Request failed to complete, check logs for more information')
             return
 
-        lakerequestutil.describe_result(
-            omnilake=self.omnilake,
-            lake_request_id=request_id
-            )
\ No newline at end of file
+        answer = lakerequestutil.get_result(self.omnilake, request_id)
+
+        print(f"Response from server\n=================\n\n{answer}")
+
+        if cache:
+            cache.put(cache_key, {'lake_request_id': request_id, 'answer': answer})
@@ -0,0 +1,110 @@
+import shlex
+
+import omni.utils.fileutil as fileutil
+
+from logging import getLogger
+
+from omni.commands.base import Command
+from omni.shell import SESSION_COMMANDS
+
+logger = getLogger(__name__)
+
+EXIT_COMMANDS = ('exit', 'quit')
+
+class ReplCommand(Command):
+    command_name='repl'
+    description='Run commands in an interactive session that keeps the OmniLake client warm'
+
+    @classmethod
+    def configure_parser(cls, parser):
+        parser.add_argument('--no-history', help='Do not read nor save the history of the session', action='store_true')
+
+    def _enable_history(self):
+        """
+        Enable line editing and the history kept across sessions, when readline is available
+        """
+        try:
+            import readline
+        except ImportError:
+            return None
+
+        history_path = fileutil.omni_home() / 'repl_history'
+
+        try:
+            readline.read_history_file(history_path)
+        except OSError:
+            pass
+
+        readline.set_history_length(1000)
+
+        return history_path
+
+    def run(self, args):
+        """
+        Read commands until "exit" or end of input, running each one through the shell
+        """
+        history_path = None if args.no_history else self._enable_history()
+
+        # Every command runs with the global options the session started with, unless it sets its own
+        global_arguments = self.shell.global_arguments(args)
+
+        print('Omni session, enter a command such as "question --archive docs What is Omni?", "help" or "exit"')
+
+        try:
+            while True:
+                try:
+                    line = input('omni> ')
+                except EOFError:
+                    print()
+                    break
+                except KeyboardInterrupt:
+                    print()
+                    continue
+
+                try:
+                    argv = shlex.split(line)
+                except ValueError as e:
+                    print(f'Invalid command: {e}')
+                    continue
+
+                if not argv:
+                    continue
+
+                if argv[0] in EXIT_COMMANDS:
+                    break
+
+                if argv[0] == 'help':
+                    argv = ['--help'] + argv[1:]
+
+                if self.shell._selected_command(argv) in SESSION_COMMANDS:
+                    print('Sessions can\'t be started from a session')
+                    continue
+
+                self._run_line(argv, global_arguments)
+        finally:
+            if history_path:
+                import readline
+
+                history_path.parent.mkdir(parents=True, exist_ok=True)
+
+                readline.write_history_file(history_path)
+
+    def _run_line(self, argv: list[str], global_arguments: list[str]):
+        """
+        Run a command of the session, reporting its errors without ending the session
+
+        Keyword arguments:
+        argv -- the arguments of the command
+        global_arguments -- the global options of the session
+        """
+        try:
+            self.shell.run(global_arguments + argv)
+        except SystemExit:
+            # Raised by the parser after printing the help or a usage error
+            pass
+        except KeyboardInterrupt:
+            print('Interrupted')
+        except Exception as e:
+            logger.debug('Command failed', exc_info=True)
+
+            print(f'Error: {e}')
@@ -3,37 +3,152 @@ CLI Shell and Entry Point
 '''
 import logging
 import os
+import sys
 
 from argparse import ArgumentParser
+from typing import Optional
 from dotenv import load_dotenv
-from omni.commands.base import Command
+from omni.commands.base import Command, LazyCommand
 from omni.commands import __all__ as core_commands
 
+# Installed packages can register extra commands under this entry point group, as "name = package.module:CommandClass"
+COMMANDS_ENTRY_POINT_GROUP = 'omni.commands'
+
+# Commands that run many others, always run locally instead of in a daemon
+SESSION_COMMANDS = ('daemon', 'repl')
+
+# Options that keep a command running until it is interrupted, which would hold a daemon, those commands run locally
+LONG_RUNNING_OPTIONS = ('--watch',)
+
+# Global options that apply to a whole session rather than to each of its commands
+SESSION_OPTIONS = ('profile', 'profile_output')
+
+def discover_commands() -> dict[str, LazyCommand]:
+    """
+    Discover the commands registered by installed packages through entry points, without importing them
+    """
+    # Scanning the installed packages is slow to import and run, so it only happens when needed
+    from importlib.metadata import entry_points
+
+    discovered = {}
+
+    for entry_point in entry_points(group=COMMANDS_ENTRY_POINT_GROUP):
+        provider = entry_point.dist.name if entry_point.dist else entry_point.value
+
+        discovered[entry_point.name] = LazyCommand(entry_point.name, f'Provided by {provider}', entry_point.value)
+
+    return discovered
+
 class Shell:
     def __init__(self, more_commands: dict[str, Command] = {}):
-        self.available_commands = {**core_commands, **more_commands}        
+        self.available_commands = {**core_commands, **more_commands}
 
-    def _prepare_arguments(self) -> ArgumentParser:
+        self._plugins_discovered = False
+
+    def _discover_plugins(self) -> None:
         """
-        Prepare the base arguments for the CLI
+        Add the commands registered through entry points, the core and explicitly provided commands take precedence
         """
-        parser = ArgumentParser(description='Omni, the OmniLake CLI')
+        if self._plugins_discovered:
+            return
+
+        self.available_commands = {**discover_commands(), **self.available_commands}
+
+        self._plugins_discovered = True
+
+    def _base_parser(self, add_help: bool = True) -> ArgumentParser:
+        """
+        Prepare the parser with the global arguments of the CLI
+        """
+        parser = ArgumentParser(description='Omni, the OmniLake CLI', add_help=add_help)
 
         parser.add_argument('--env', '-e', help='Optional .env file')
 
         parser.add_argument('--app-name', '--app', help='The name of the OmniLake app. Defaults to "omnilake"', default="omnilake")
         parser.add_argument('--deployment-id', '--dep-id', help='The OmniLake deployment ID. Defaults to "dev"', default="dev")
-        
+
         parser.add_argument('--verbosity', '-v', help='Set the verbosity level', default=0, action='count')
 
+        parser.add_argument('--max-in-flight', help='The maximum number of OmniLake requests sent at once, lowered while throttled, and of connections kept alive. Defaults to 50', type=int)
+        parser.add_argument('--connect-timeout', help='The seconds to wait for a connection to OmniLake. Defaults to 10', type=float)
+        parser.add_argument('--read-timeout', help='The seconds to wait for the response of OmniLake between two reads. Defaults to 300', type=float)
+        parser.add_argument('--max-attempts', help='How many times a request is sent when it is throttled or fails temporarily. Defaults to 5', type=int)
+
+        parser.add_argument('--profile', help='Trace every request and local stage, and print their latency when the command ends', action='store_true')
+        parser.add_argument('--profile-output', help='Also write the trace to this file, in the Chrome trace format')
+
+        return parser
+
+    def global_arguments(self, args) -> list[str]:
+        """
+        Rebuild the global options set in parsed arguments, so the commands of a session run with
+        the options it was started with. The profiling options are left out, they cover the whole session.
+
+        Keyword arguments:
+        args -- the parsed arguments
+        """
+        argv = []
+
+        for action in self._base_parser()._actions:
+            if not action.option_strings or action.dest in SESSION_OPTIONS:
+                continue
+
+            value = getattr(args, action.dest, None)
+
+            if value is None or value is False or value == action.default:
+                continue
+
+            if action.nargs == 0:
+                # Flags, and counted flags such as the verbosity
+                argv.extend([action.option_strings[0]] * int(value))
+            else:
+                argv.extend([action.option_strings[0], str(value)])
+
+        return argv
+
+    def _selected_command(self, argv: Optional[list[str]] = None) -> Optional[str]:
+        """
+        Find the command requested by the user without parsing its arguments
+        """
+        parser = self._base_parser(add_help=False)
+
+        parser.add_argument('command', nargs='?')
+
+        args, _ = parser.parse_known_args(argv)
+
+        if args.command not in self.available_commands:
+            self._discover_plugins()
+
+        return args.command if args.command in self.available_commands else None
+
+    def _prepare_arguments(self, argv: Optional[list[str]] = None):
+        """
+        Prepare the base arguments for the CLI.
+        Only the selected command is loaded to configure its arguments, the others are listed by name.
+        """
+        parser = self._base_parser()
+
+        selected_command = self._selected_command(argv)
+
         subparsers_action = parser.add_subparsers(title='Command', dest='command', help='The command to execute', required=True)
 
-        for _, command_class in self.available_commands.items():
+        selected_parser = None
+
+        for command_name, command_class in self.available_commands.items():
             subparser = subparsers_action.add_parser(command_class.command_name, help=command_class.description)
-            command_class.configure_parser(subparser)
 
-        return parser.parse_args()
-    
+            if command_name == selected_command:
+                command_class.configure_parser(subparser)
+
+                selected_parser = subparser
+
+        args = parser.parse_args(argv)
+
+        if selected_parser is not None:
+            self.available_commands[selected_command].check_arguments(selected_parser, args)
+
+        return args
+
     def _prepare_environment(self, args) -> None:
         """
         Read the environment variables from the .env file provided.
@@ -42,12 +157,18 @@ class Shell:
         """
         if args.env:
             load_dotenv(dotenv_path=args.env)
-        
+
         os.environ['DA_VINCI_APP_NAME'] = os.getenv('APP_NAME', args.app_name)
         os.environ['DA_VINCI_DEPLOYMENT_ID'] = os.getenv('DEPLOYMENT_ID', args.deployment_id)
         os.environ['OMNILAKE_APP_NAME'] = os.getenv('APP_NAME', args.app_name)
         os.environ['OMNILAKE_DEPLOYMENT_ID'] = os.getenv('DEPLOYMENT_ID', args.deployment_id)
 
+        # Read by omni.utils.clientutil when the shared client is created
+        for variable, value in (('OMNI_MAX_IN_FLIGHT', args.max_in_flight), ('OMNI_CONNECT_TIMEOUT', args.connect_timeout),
+                                ('OMNI_READ_TIMEOUT', args.read_timeout), ('OMNI_MAX_ATTEMPTS', args.max_attempts)):
+            if value is not None:
+                os.environ[variable] = str(value)
+
         if(args.verbosity  >= 2):
             loglevel = logging.DEBUG
         elif(args.verbosity  >= 1):
@@ -57,6 +178,9 @@ class Shell:
 
         logging.basicConfig(level=loglevel)
 
+        # basicConfig only applies once, sessions run many commands in the same process
+        logging.getLogger().setLevel(loglevel)
+
     def _execute_command(self, args) -> None:
         """
         Execute the command requested by the user.
@@ -69,21 +193,72 @@ class Shell:
 
         if command_name not in self.available_commands:
             raise ValueError(f'Command {command_name} not found')
-        
+
         command = self.available_commands[command_name]()
 
+        command.shell = self
+
         command.run(args)
 
-    def run(self) -> None:
+    def _print_connections(self) -> None:
+        """
+        Print how many connections the OmniLake requests opened, when a client was created
+        """
+        # Not imported when the command never loaded it, it would create nothing to report
+        clientutil = sys.modules.get('omni.utils.clientutil')
+
+        stats = clientutil.connection_stats() if clientutil else None
+
+        if stats:
+            print(f'\nOmniLake connections: {stats["connections"]} opened for {stats["requests"]} requests')
+
+    def run(self, argv: Optional[list[str]] = None) -> None:
         """
         Run the CLI
+
+        Keyword arguments:
+        argv -- the arguments to parse (default the command line arguments)
         """
-        args = self._prepare_arguments()
+        args = self._prepare_arguments(argv)
 
         self._prepare_environment(args)
 
-        self._execute_command(args)
+        if not (args.profile or args.profile_output):
+            self._execute_command(args)
+            return
+
+        # Only imported when profiling, to keep the startup of every other run fast
+        import omni.utils.traceutil as traceutil
+
+        tracer = traceutil.enable()
+
+        try:
+            self._execute_command(args)
+        finally:
+            traceutil.disable()
+
+            tracer.print_report()
+
+            self._print_connections()
+
+            if args.profile_output:
+                tracer.write_chrome_trace(args.profile_output)
+
+                print(f'Trace written to {args.profile_output}')
 
 def main():
-    Shell().run()
-    
\ No newline at end of file
+    shell = Shell()
+
+    socket_path = os.getenv('OMNI_DAEMON_SOCKET')
+
+    # Hand the command over to a warm daemon when one is configured, running it here if none answers
+    if (socket_path and shell._selected_command() not in SESSION_COMMANDS
+            and not any(argument in LONG_RUNNING_OPTIONS for argument in sys.argv[1:])):
+        import omni.utils.daemonutil as daemonutil
+
+        exit_code = daemonutil.forward(sys.argv[1:], socket_path)
+
+        if exit_code is not None:
+            sys.exit(exit_code)
+
+    shell.run()
@@ -6,9 +6,9 @@ from omnilake.client.request_definitions import CreateArchive
 
 logger = getLogger(__name__)
 
-def create_archive_and_wait(omnilake: OmniLake, archive: CreateArchive):
+def create_archive_and_wait(omnilake: OmniLake, archive: CreateArchive) -> bool:
     """
-    Create an archive and wait for it to finish provisioning
+    Create an archive and wait for it to finish provisioning, returns whether the archive is ready
 
     Keyword arguments:
     omnilake -- the OmniLake client
@@ -24,11 +24,61 @@ def create_archive_and_wait(omnilake: OmniLake, archive: CreateArchive):
 
         print('Provisioning archive...')
 
-        job_completed = jobutil.wait_for_completion(omnilake, job_id, job_type)
-        if(job_completed):
+        job_result = jobutil.wait_for_completion(omnilake, job_id, job_type,
+                                                 on_status_change=jobutil.print_status_change)
+
+        jobutil.print_result(job_result)
+
+        if(job_result):
             print(f'Archive "{archive_id}" ready')
+
+        return bool(job_result)
     except Exception as e:
         if "Archive already exists" in str(e):
             logger.info(f'Archive "{archive_id}"already exists')
+
+            return True
+
+        raise
+
+def create_archives_and_wait(omnilake: OmniLake, archives: list[CreateArchive]) -> list[str]:
+    """
+    Create many archives and wait for all of them to finish provisioning in a single polling loop.
+    Archives that already exist are left as they are. Returns the IDs of the archives ready, existing ones included.
+
+    Keyword arguments:
+    omnilake -- the OmniLake client
+    archives -- the archives to create
+    """
+    jobs = {}
+
+    ready = []
+
+    for archive in archives:
+        archive_id = archive.attributes['archive_id']
+
+        try:
+            response = omnilake.request(archive)
+        except Exception as e:
+            if "Archive already exists" in str(e):
+                logger.info(f'Archive "{archive_id}" already exists')
+                ready.append(archive_id)
+                continue
+
+            raise
+
+        jobs[archive_id] = (response.response_body['job_id'], response.response_body['job_type'])
+
+    if not jobs:
+        return ready
+
+    print(f'Provisioning {len(jobs)} archive(s)...')
+
+    for archive_id, job_result in zip(jobs, jobutil.wait_for_all(omnilake, jobs.values())):
+        if job_result:
+            print(f'Archive "{archive_id}" ready')
+            ready.append(archive_id)
         else:
-            raise
\ No newline at end of file
+            print(f'Archive "{archive_id}" failed to provision: {job_result.status_message or job_result.status}')
+
+    return ready
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from logging import getLogger
+from pathlib import Path
+from typing import Optional, Union
+
+from omni.utils.fileutil import omni_home
+
+logger = getLogger(__name__)
+
+DEFAULT_TTL = 24 * 60 * 60
+
+DEFAULT_MAX_ENTRIES = 1000
+
+def request_key(request, **scope) -> str:
+    """
+    Return a canonical hash of a request definition
+
+    Keyword arguments:
+    request -- the request, anything exposing to_dict()
+    scope -- extra values the key depends on, such as the app name and deployment ID
+    """
+    canonical = json.dumps({'request': request.to_dict(), 'scope': scope}, sort_keys=True, default=str)
+
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    On-disk cache of lake request responses, one JSON file per key.
+
+    Entries expire after a TTL, and the least recently used entries are evicted once the cache
+    holds more than the maximum number of entries. Reading an entry refreshes its modification
+    time, which is what the eviction is based on.
+    """
+    def __init__(self, directory: Optional[Union[str, Path]] = None, ttl: float = DEFAULT_TTL,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.directory = Path(directory) if directory else omni_home() / 'cache' / 'answers'
+
+        self.ttl = ttl
+
+        self.max_entries = max_entries
+
+        self._lock = threading.Lock()
+
+    def _entry_path(self, key: str) -> Path:
+        return self.directory / f'{key}.json'
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Return the cached value for a key, None if missing or expired
+
+        Keyword arguments:
+        key -- the cache key
+        """
+        entry_path = self._entry_path(key)
+
+        try:
+            with open(entry_path, 'r') as entry_file:
+                entry = json.load(entry_file)
+
+            expired = time.time() - entry['created'] > self.ttl
+
+            value = entry['value']
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Not JSON, or JSON that isn't an entry
+            logger.warning(f'Ignoring unreadable cache entry {entry_path}: {e!r}')
+            return None
+
+        if expired:
+            logger.debug(f'Cache entry {key} expired')
+
+            entry_path.unlink(missing_ok=True)
+
+            return None
+
+        os.utime(entry_path)
+
+        return value
+
+    def put(self, key: str, value: dict):
+        """
+        Store a value and evict the least recently used entries over the limit
+
+        Keyword arguments:
+        key -- the cache key
+        value -- the JSON serializable value to store
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        entry_path = self._entry_path(key)
+
+        temporary_path = entry_path.with_suffix(f'.{threading.get_ident()}.tmp')
+
+        with open(temporary_path, 'w') as entry_file:
+            json.dump({'created': time.time(), 'value': value}, entry_file)
+
+        os.replace(temporary_path, entry_path)
+
+        self._evict()
+
+    def _evict(self):
+        """
+        Remove the least recently used entries until the cache is within its limit
+        """
+        with self._lock:
+            entries = []
+
+            for entry_path in self.directory.glob('*.json'):
+                try:
+                    entries.append((entry_path.stat().st_mtime, entry_path))
+                except FileNotFoundError:
+                    continue
+
+            if len(entries) <= self.max_entries:
+                return
+
+            entries.sort()
+
+            for _, entry_path in entries[:len(entries) - self.max_entries]:
+                entry_path.unlink(missing_ok=True)
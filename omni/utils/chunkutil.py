@@ -0,0 +1,158 @@
+import mmap
+
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+def _decode(contents: bytes) -> str:
+    return contents.decode(encoding='utf-8', errors='ignore')
+
+def _is_continuation(byte: int) -> bool:
+    return (byte & 0xC0) == 0x80
+
+def _character_end(mapped: mmap.mmap, position: int, limit: int) -> int:
+    """
+    Return the first offset from position that doesn't fall in the middle of a UTF-8 character, up to limit
+    """
+    while position < limit and _is_continuation(mapped[position]):
+        position += 1
+
+    return position
+
+def _size_chunks(mapped: mmap.mmap, max_bytes: int, overlap: int) -> Iterator[str]:
+    """
+    Split the contents in chunks of at most max_bytes, cutting at the last line break when possible
+    and never in the middle of a UTF-8 character
+    """
+    size = len(mapped)
+
+    start = 0
+
+    while start < size:
+        end = min(start + max_bytes, size)
+
+        if end < size:
+            line_break = mapped.rfind(b'\n', start, end)
+
+            if line_break > start:
+                end = line_break + 1
+            else:
+                # No line break, back off continuation bytes so the next chunk starts on a character
+                while end > start and _is_continuation(mapped[end]):
+                    end -= 1
+
+                # A character larger than max_bytes is kept whole
+                if end == start:
+                    end = _character_end(mapped, start + 1, size)
+
+        yield _decode(mapped[start:end])
+
+        if end >= size:
+            return
+
+        next_start = end
+
+        if overlap:
+            next_start = max(end - overlap, start + 1)
+
+            # Start the overlap at a line boundary when there is one
+            line_break = mapped.find(b'\n', next_start, end)
+
+            if line_break != -1 and line_break + 1 < end:
+                next_start = line_break + 1
+            else:
+                next_start = _character_end(mapped, next_start, end)
+
+        start = next_start
+
+def _line_chunks(mapped: mmap.mmap, max_lines: int, overlap: int) -> Iterator[str]:
+    """
+    Split the contents in chunks of max_lines lines, repeating the last overlap lines of a chunk
+    at the start of the next one
+    """
+    size = len(mapped)
+
+    chunk_start = 0
+
+    # End offsets of the lines in the current chunk
+    line_ends = []
+
+    new_lines = 0
+
+    position = 0
+
+    while position < size:
+        line_break = mapped.find(b'\n', position)
+
+        position = size if line_break == -1 else line_break + 1
+
+        line_ends.append(position)
+
+        new_lines += 1
+
+        if len(line_ends) == max_lines:
+            yield _decode(mapped[chunk_start:position])
+
+            if overlap:
+                chunk_start = line_ends[-overlap - 1]
+
+                line_ends = line_ends[-overlap:]
+            else:
+                chunk_start = position
+
+                line_ends = []
+
+            new_lines = 0
+
+    if new_lines:
+        yield _decode(mapped[chunk_start:size])
+
+def check_options(max_bytes: Optional[int] = DEFAULT_CHUNK_SIZE, max_lines: Optional[int] = None, overlap: int = 0):
+    """
+    Raise a ValueError if the chunking options are invalid. A max_bytes of 0 or None disables chunking by size.
+
+    Keyword arguments:
+    max_bytes -- the maximum size of a chunk in bytes (default 1 MiB)
+    max_lines -- the number of lines per chunk, takes precedence over max_bytes (default None)
+    overlap -- how many bytes, or lines when splitting by lines, the next chunk repeats from the previous one (default 0)
+    """
+    if max_lines is not None and max_lines < 1:
+        raise ValueError('The number of lines per chunk must be at least 1')
+
+    if max_bytes is not None and max_bytes < 0:
+        raise ValueError('The chunk size must be 0 or more')
+
+    if overlap < 0:
+        raise ValueError('The chunk overlap must be 0 or more')
+
+    limit = max_lines or max_bytes
+
+    if overlap and not limit:
+        raise ValueError('The chunk overlap requires a chunk size or a number of lines per chunk')
+
+    if limit and overlap >= limit:
+        raise ValueError('The chunk overlap must be smaller than the chunk size, or the number of lines per chunk')
+
+def iter_chunks(path: Union[str, Path], max_bytes: Optional[int] = DEFAULT_CHUNK_SIZE, max_lines: Optional[int] = None,
+                overlap: int = 0) -> Iterator[str]:
+    """
+    Lazily split a text file in chunks, reading it through a memory map so only the chunk being
+    decoded is held in memory. Chunks are split by lines when max_lines is set, by size otherwise.
+
+    Keyword arguments:
+    path -- the path of the file, which must not be empty
+    max_bytes -- the maximum size of a chunk in bytes (default 1 MiB)
+    max_lines -- the number of lines per chunk, takes precedence over max_bytes (default None)
+    overlap -- how many bytes, or lines when splitting by lines, the next chunk repeats from the previous one (default 0)
+    """
+    if not (max_lines or max_bytes):
+        raise ValueError('The chunk size must be at least 1')
+
+    check_options(max_bytes=max_bytes, max_lines=max_lines, overlap=overlap)
+
+    with open(path, 'rb') as chunked_file, mmap.mmap(chunked_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        if max_lines:
+            yield from _line_chunks(mapped, max_lines, overlap)
+        else:
+            yield from _size_chunks(mapped, max_bytes, overlap)
@@ -0,0 +1,187 @@
+import contextvars
+import os
+import threading
+
+from logging import getLogger
+from typing import Callable, Optional
+
+import requests
+import requests.adapters
+
+from omnilake.client.client import OmniLake
+
+import omni.utils.retryutil as retryutil
+import omni.utils.traceutil as traceutil
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_IN_FLIGHT = 50
+DEFAULT_CONNECT_TIMEOUT = 10
+DEFAULT_READ_TIMEOUT = 300
+
+_clients = {}
+
+_client_factory: Optional[Callable[..., OmniLake]] = None
+
+_session: Optional['PooledSession'] = None
+
+_lock = threading.Lock()
+
+# The session of the OmniLake request running in the current thread, if any
+_active_session: contextvars.ContextVar[Optional['PooledSession']] = contextvars.ContextVar('omni_active_session', default=None)
+
+_send_request = requests.api.request
+
+class PooledSession(requests.Session):
+    """
+    A requests session whose connections are kept alive and shared by every thread, with default timeouts
+    """
+    def __init__(self, pool_size: int = DEFAULT_MAX_IN_FLIGHT, connect_timeout: float = DEFAULT_CONNECT_TIMEOUT,
+                 read_timeout: float = DEFAULT_READ_TIMEOUT):
+        """
+        Keyword arguments:
+        pool_size -- the connections kept alive per host, one for each request in flight (default 50)
+        connect_timeout -- the seconds to wait for a connection (default 10)
+        read_timeout -- the seconds to wait between bytes of the response (default 300)
+        """
+        super().__init__()
+
+        # Retries are handled by omni.utils.retryutil, which also adapts the concurrency on throttling
+        self.adapter = requests.adapters.HTTPAdapter(pool_maxsize=pool_size, max_retries=0)
+
+        self.mount('https://', self.adapter)
+        self.mount('http://', self.adapter)
+
+        self.timeout = (connect_timeout, read_timeout)
+
+    def request(self, method, url, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = self.timeout
+
+        return super().request(method, url, **kwargs)
+
+    def connection_stats(self) -> dict[str, int]:
+        """
+        Return the requests sent and the connections opened through the pools still open
+        """
+        pools = [self.adapter.poolmanager.pools[key] for key in self.adapter.poolmanager.pools.keys()]
+
+        return {
+            'requests': sum(pool.num_requests for pool in pools),
+            'connections': sum(pool.num_connections for pool in pools),
+        }
+
+def _request(method, url, **kwargs):
+    """
+    Send the calls to the functions of the requests module through the session of the running OmniLake request
+    """
+    session = _active_session.get()
+
+    if session is None:
+        return _send_request(method, url, **kwargs)
+
+    return session.request(method=method, url=url, **kwargs)
+
+class PooledClient:
+    """
+    Wrapper sending the requests of an OmniLake client through a pooled session.
+    The client sends its requests with the functions of the requests module, which open a new connection
+    for every call, so these calls are routed to the session while one of its requests runs.
+    """
+    def __init__(self, client, session: PooledSession):
+        self.client = client
+        self.session = session
+
+    def request(self, request):
+        token = _active_session.set(self.session)
+
+        try:
+            return self.client.request(request)
+        finally:
+            _active_session.reset(token)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+def _get_session() -> PooledSession:
+    """
+    Return the session shared by every client, created from the environment prepared by the shell, call with the lock held
+    """
+    global _session
+
+    if _session is None:
+        _session = PooledSession(
+            pool_size=int(os.getenv('OMNI_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT)),
+            connect_timeout=float(os.getenv('OMNI_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+            read_timeout=float(os.getenv('OMNI_READ_TIMEOUT', DEFAULT_READ_TIMEOUT)),
+        )
+
+        # requests.post and the other functions all send through requests.api.request
+        requests.api.request = _request
+
+    return _session
+
+def connection_stats() -> Optional[dict[str, int]]:
+    """
+    Return the requests sent and the connections opened by the shared session, None when no client was created
+    """
+    with _lock:
+        return _session.connection_stats() if _session else None
+
+def get_client(app_name: Optional[str] = None, deployment_id: Optional[str] = None) -> OmniLake:
+    """
+    Return the process-wide OmniLake client for an app and deployment, creating it on first use.
+    The client is safe to share across threads, so commands and worker pools share it along with its limits, and
+    its requests go through a session keeping a connection alive for each request in flight.
+    Retryable failures are retried with backoff under an adaptive limit on the requests in flight, read from the
+    environment prepared by the shell, and every attempt is traced when tracing is enabled.
+
+    Keyword arguments:
+    app_name -- the OmniLake app name (default the OMNILAKE_APP_NAME environment variable)
+    deployment_id -- the OmniLake deployment ID (default the OMNILAKE_DEPLOYMENT_ID environment variable)
+    """
+    app_name = app_name or os.getenv('OMNILAKE_APP_NAME')
+    deployment_id = deployment_id or os.getenv('OMNILAKE_DEPLOYMENT_ID')
+
+    # A daemon runs commands with the environment of each of its clients, which can hold other credentials
+    key = (app_name, deployment_id, tuple(sorted((name, value) for name, value in os.environ.items() if name.startswith('AWS_'))))
+
+    with _lock:
+        if key not in _clients:
+            logger.debug(f'Creating OmniLake client for app {app_name} and deployment {deployment_id}')
+
+            factory = _client_factory or OmniLake
+
+            _clients[key] = retryutil.RetryingClient(
+                traceutil.TracingClient(PooledClient(factory(app_name=app_name, deployment_id=deployment_id), _get_session())),
+                policy=retryutil.RetryPolicy(max_attempts=int(os.getenv('OMNI_MAX_ATTEMPTS', retryutil.DEFAULT_MAX_ATTEMPTS))),
+                limiter=retryutil.AdaptiveLimiter(max_limit=int(os.getenv('OMNI_MAX_IN_FLIGHT', DEFAULT_MAX_IN_FLIGHT))),
+            )
+
+        return _clients[key]
+
+class SharedClient:
+    """
+    Handle on the process-wide OmniLake client, resolved on first use.
+    Commands that never reach OmniLake, such as answers served from the local cache, never create a client.
+    """
+    def __init__(self, app_name: Optional[str] = None, deployment_id: Optional[str] = None):
+        self.app_name = app_name
+        self.deployment_id = deployment_id
+
+    def __getattr__(self, name):
+        return getattr(get_client(app_name=self.app_name, deployment_id=self.deployment_id), name)
+
+def set_client_factory(factory: Optional[Callable[..., OmniLake]] = None):
+    """
+    Replace how clients are created, such as with a stand-in backend for benchmarks, and drop the cached clients
+
+    Keyword arguments:
+    factory -- called with the app_name and deployment_id keyword arguments, None restores OmniLake (default None)
+    """
+    global _client_factory
+
+    with _lock:
+        _client_factory = factory
+
+        _clients.clear()
@@ -0,0 +1,274 @@
+import json
+import os
+import socket
+import sys
+import traceback
+
+from contextlib import redirect_stderr, redirect_stdout
+from logging import getLogger
+from pathlib import Path
+from typing import Callable, Optional, Union
+
+from omni.utils.fileutil import omni_home
+
+logger = getLogger(__name__)
+
+# Set to the socket of a running daemon so the omni command hands its work over
+SOCKET_VARIABLE = 'OMNI_DAEMON_SOCKET'
+
+STOP = 'stop'
+
+STATUS = 'status'
+
+def default_socket_path() -> Path:
+    """
+    Return where the daemon listens unless told otherwise
+    """
+    return omni_home() / 'daemon.sock'
+
+class _SocketStream:
+    """
+    Text stream sending everything written to it to the client, as messages of the given stream name.
+    Once the client is gone the output is dropped, so the command still runs to completion.
+    """
+    def __init__(self, writer, name: str):
+        self.writer = writer
+        self.name = name
+
+        self.disconnected = False
+
+    def write(self, text: str) -> int:
+        if text and not self.disconnected:
+            try:
+                self.writer.write(json.dumps({self.name: text}) + '\n')
+                self.writer.flush()
+            except OSError:
+                logger.info('The client disconnected, dropping the rest of the output')
+
+                self.disconnected = True
+
+        return len(text)
+
+    def flush(self):
+        pass
+
+    def isatty(self) -> bool:
+        return False
+
+def _send(writer, message: dict):
+    writer.write(json.dumps(message) + '\n')
+    writer.flush()
+
+def _connect(socket_path: Union[str, Path], timeout: Optional[float] = None) -> socket.socket:
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    connection.settimeout(timeout)
+
+    try:
+        connection.connect(str(socket_path))
+    except OSError:
+        connection.close()
+        raise
+
+    connection.settimeout(None)
+
+    return connection
+
+def is_running(socket_path: Union[str, Path]) -> bool:
+    """
+    Whether a daemon answers on the socket
+
+    Keyword arguments:
+    socket_path -- the path of the daemon socket
+    """
+    try:
+        _connect(socket_path, timeout=1.0).close()
+    except OSError:
+        return False
+
+    return True
+
+def _exit_code(exit: SystemExit) -> int:
+    if exit.code is None:
+        return 0
+
+    if isinstance(exit.code, int):
+        return exit.code
+
+    # sys.exit('message') prints the message and exits with 1
+    print(exit.code, file=sys.stderr)
+
+    return 1
+
+def _replace_environment(environment: dict[str, str]):
+    os.environ.clear()
+    os.environ.update(environment)
+
+def _handle(connection: socket.socket, run: Callable[[list[str]], None]) -> bool:
+    """
+    Run the command of a client with its output sent back, returns False when the client asks the daemon to stop
+    """
+    reader = connection.makefile('r', encoding='utf-8')
+    writer = connection.makefile('w', encoding='utf-8')
+
+    line = reader.readline()
+
+    # A client checking whether the daemon runs, see is_running
+    if not line:
+        return True
+
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        logger.warning(f'Ignoring an invalid request: {e}')
+        return True
+
+    if request.get('action') == STOP:
+        _send(writer, {'exit': 0})
+        return False
+
+    if request.get('action') == STATUS:
+        _send(writer, {'pid': os.getpid(), 'exit': 0})
+        return True
+
+    argv = request.get('argv') or []
+
+    logger.info(f'Running {argv}')
+
+    exit_code = 0
+
+    working_directory = os.getcwd()
+
+    environment = dict(os.environ)
+
+    with redirect_stdout(_SocketStream(writer, 'stdout')), redirect_stderr(_SocketStream(writer, 'stderr')):
+        try:
+            # Relative paths and the defaults based on the working directory are the client's
+            os.chdir(request.get('cwd') or working_directory)
+
+            # So are the deployment, the credentials and the home directory, and anything a .env file sets is undone after
+            if request.get('env') is not None:
+                _replace_environment(request['env'])
+
+            run(argv)
+        except SystemExit as e:
+            exit_code = _exit_code(e)
+        except Exception:
+            traceback.print_exc()
+
+            exit_code = 1
+        finally:
+            os.chdir(working_directory)
+
+            _replace_environment(environment)
+
+    try:
+        _send(writer, {'exit': exit_code})
+    except OSError:
+        pass
+
+    return True
+
+def serve(run: Callable[[list[str]], None], socket_path: Optional[Union[str, Path]] = None):
+    """
+    Answer the commands sent to a Unix socket until stopped, running them one at a time in this process
+    so they share its imports and clients. The output of each command is streamed back to its client.
+
+    Keyword arguments:
+    run -- runs a command from its arguments, such as Shell.run
+    socket_path -- the path of the socket, only accessible to the current user (default ~/.omni/daemon.sock)
+    """
+    socket_path = Path(socket_path or default_socket_path())
+
+    if is_running(socket_path):
+        raise ValueError(f'A daemon is already listening on {socket_path}')
+
+    socket_path.parent.mkdir(parents=True, exist_ok=True)
+
+    # Left behind by a daemon that didn't stop cleanly
+    socket_path.unlink(missing_ok=True)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+    try:
+        previous_umask = os.umask(0o177)
+
+        try:
+            server.bind(str(socket_path))
+        finally:
+            os.umask(previous_umask)
+
+        server.listen()
+
+        serving = True
+
+        while serving:
+            connection, _ = server.accept()
+
+            with connection:
+                serving = _handle(connection, run)
+    finally:
+        server.close()
+
+        socket_path.unlink(missing_ok=True)
+
+def _request(socket_path: Union[str, Path], request: dict) -> Optional[int]:
+    """
+    Send a request and print the output streamed back, returns the exit code or None if no daemon answers
+    """
+    try:
+        connection = _connect(socket_path, timeout=1.0)
+    except OSError as e:
+        logger.debug(f'No daemon on {socket_path}: {e}')
+        return None
+
+    with connection:
+        connection.sendall((json.dumps(request) + '\n').encode('utf-8'))
+
+        for line in connection.makefile('r', encoding='utf-8'):
+            message = json.loads(line)
+
+            if 'stdout' in message:
+                sys.stdout.write(message['stdout'])
+                sys.stdout.flush()
+            elif 'stderr' in message:
+                sys.stderr.write(message['stderr'])
+                sys.stderr.flush()
+
+            if 'pid' in message:
+                print(f'Daemon {message["pid"]} listening on {socket_path}')
+
+            if 'exit' in message:
+                return message['exit']
+
+    # The daemon stopped before the command finished
+    return 1
+
+def forward(argv: list[str], socket_path: Union[str, Path]) -> Optional[int]:
+    """
+    Run a command in the daemon, in the working directory and with the environment of this process,
+    and print its output, returns the exit code or None if no daemon answers
+
+    Keyword arguments:
+    argv -- the command line arguments
+    socket_path -- the path of the daemon socket
+    """
+    return _request(socket_path, {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ)})
+
+def stop(socket_path: Union[str, Path]) -> bool:
+    """
+    Ask the daemon to stop once the command it is running finishes, returns False if no daemon answers
+
+    Keyword arguments:
+    socket_path -- the path of the daemon socket
+    """
+    return _request(socket_path, {'action': STOP}) is not None
+
+def status(socket_path: Union[str, Path]) -> bool:
+    """
+    Print the process ID of the daemon, returns False if no daemon answers
+
+    Keyword arguments:
+    socket_path -- the path of the daemon socket
+    """
+    return _request(socket_path, {'action': STATUS}) is not None
@@ -1,27 +1,364 @@
 import fnmatch
+import os
+import re
 
+from logging import getLogger
 from pathlib import Path
-from typing import List, Union
+from typing import Iterator, List, Optional, Union
 
-def collect_files(directory: Union[str, Path], ignore_patterns: List[str] = [], recursive: bool = True) -> List[Path]:
+import omni.utils.traceutil as traceutil
+
+logger = getLogger(__name__)
+
+def omni_home() -> Path:
+    """
+    Return the directory where Omni keeps its local state, honouring the OMNI_HOME variable
+    """
+    return Path(os.getenv('OMNI_HOME', Path.home() / '.omni'))
+
+class IgnoreMatcher:
+    """
+    Ignore patterns compiled once into a single regular expression.
+
+    Patterns follow fnmatch rules against the path relative to the walked directory. A directory is
+    pruned when its own path matches a pattern, or when a pattern ending in "*" matches everything
+    below it (e.g. ".git*" or "cdk.out*").
+    """
+    def __init__(self, patterns: List[str]):
+        flags = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+
+        self._file_regex = self._compile(patterns, flags)
+
+        self._tree_regex = self._compile([pattern for pattern in patterns if pattern.endswith('*')], flags)
+
+    @staticmethod
+    def _compile(patterns: List[str], flags: int) -> Optional[re.Pattern]:
+        if not patterns:
+            return None
+
+        return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns), flags)
+
+    def ignores_file(self, relative_path: str) -> bool:
+        """
+        Whether a file is ignored
+
+        Keyword arguments:
+        relative_path -- the posix path of the file relative to the walked directory
+        """
+        return bool(self._file_regex and self._file_regex.match(relative_path))
+
+    def ignores_directory(self, relative_path: str) -> bool:
+        """
+        Whether a directory and everything under it is ignored
+
+        Keyword arguments:
+        relative_path -- the posix path of the directory relative to the walked directory
+        """
+        if self.ignores_file(relative_path):
+            return True
+
+        return bool(self._tree_regex and self._tree_regex.match(f'{relative_path}/'))
+
+def _translate_gitignore_glob(pattern: str) -> str:
+    """
+    Translate a gitignore glob into a regular expression, where "*" and "?" don't cross directories
+    and "**" does
+    """
+    translated = ''
+
+    index = 0
+
+    while index < len(pattern):
+        char = pattern[index]
+
+        if pattern.startswith('**/', index):
+            translated += '(?:.*/)?'
+            index += 3
+            continue
+
+        if pattern.startswith('**', index):
+            translated += '.*'
+            index += 2
+            continue
+
+        if char == '*':
+            translated += '[^/]*'
+        elif char == '?':
+            translated += '[^/]'
+        elif char == '[':
+            closing = pattern.find(']', index + 2)
+
+            if closing == -1:
+                translated += re.escape(char)
+            else:
+                char_class = pattern[index + 1:closing].replace('\\', '\\\\')
+
+                if char_class.startswith('!'):
+                    char_class = '^' + char_class[1:]
+
+                translated += f'[{char_class}]'
+                index = closing
+        elif char == '\\' and index + 1 < len(pattern):
+            index += 1
+            translated += re.escape(pattern[index])
+        else:
+            translated += re.escape(char)
+
+        index += 1
+
+    return translated
+
+class GitIgnoreRules:
+    """
+    The rules of a single .gitignore file, compiled once.
+
+    Supports comments, negation with "!", directory-only patterns with a trailing "/", patterns
+    anchored to the .gitignore directory when they contain a "/", and "**" wildcards.
+    """
+    def __init__(self, lines: List[str], base: str = ''):
+        self.rules = []
+
+        prefix = re.escape(f'{base}/') if base else ''
+
+        for line in lines:
+            line = line.rstrip('\n').rstrip(' ')
+
+            if not line or line.startswith('#'):
+                continue
+
+            negate = line.startswith('!')
+
+            if negate:
+                line = line[1:]
+
+            directory_only = line.endswith('/')
+
+            line = line.rstrip('/')
+
+            if not line:
+                continue
+
+            body = _translate_gitignore_glob(line.lstrip('/'))
+
+            if '/' in line:
+                regex = f'{prefix}{body}'
+            else:
+                regex = f'{prefix}(?:.*/)?{body}'
+
+            self.rules.append((re.compile(f'{regex}\\Z', re.DOTALL), negate, directory_only))
+
+    @classmethod
+    def from_file(cls, path: Union[str, Path], base: str = '') -> 'GitIgnoreRules':
+        """
+        Load the rules of a .gitignore file
+
+        Keyword arguments:
+        path -- the path of the .gitignore file
+        base -- the directory holding the file, relative to the walked directory (default '')
+        """
+        with open(path, 'r', encoding='utf-8', errors='ignore') as gitignore_file:
+            return cls(gitignore_file.readlines(), base=base)
+
+    def match(self, relative_path: str, is_directory: bool) -> Optional[bool]:
+        """
+        Return True if the path is ignored, False if it is explicitly re-included and None
+        if no rule matches
+
+        Keyword arguments:
+        relative_path -- the posix path relative to the walked directory
+        is_directory -- whether the path is a directory
+        """
+        for regex, negate, directory_only in reversed(self.rules):
+            if directory_only and not is_directory:
+                continue
+
+            if regex.match(relative_path):
+                return not negate
+
+        return None
+
+def _is_gitignored(rules: tuple, relative_path: str, is_directory: bool) -> bool:
+    """
+    Apply the .gitignore files from the root down, the deepest file with a matching rule wins
     """
-    Collect all files in a directory, respecting ignore patterns.
-    
-    Args:
-    directory -- the directory to collect files from
-    ignore_patterns -- a list of patterns to ignore (gitignore-style)
-    recursive -- whether to search recursively or not
-    """    
-    path = Path(directory)
+    for gitignore in reversed(rules):
+        matched = gitignore.match(relative_path, is_directory)
+
+        if matched is not None:
+            return matched
+
+    return False
+
+def walk_files(directory: Union[str, Path], ignore_patterns: List[str] = [], recursive: bool = True,
+               use_gitignore: bool = True) -> Iterator[Path]:
+    """
+    Lazily walk the files in a directory, respecting ignore patterns and .gitignore files.
+    Ignored directories are pruned without being listed.
+
+    Keyword arguments:
+    directory -- the directory to walk
+    ignore_patterns -- a list of patterns to ignore (fnmatch-style, against the relative path)
+    recursive -- whether to walk into subdirectories or not
+    use_gitignore -- whether to honour .gitignore files found in the tree
+    """
+    root = Path(directory)
+
+    matcher = IgnoreMatcher(ignore_patterns)
+
+    pending = [(root, '', ())]
+
+    while pending:
+        current, relative, gitignores = pending.pop()
+
+        gitignore_path = current / '.gitignore'
+
+        if use_gitignore and gitignore_path.is_file():
+            gitignores = gitignores + (GitIgnoreRules.from_file(gitignore_path, base=relative),)
+
+        try:
+            with traceutil.span('scandir', 'walk'), os.scandir(current) as scanned:
+                entries = sorted(scanned, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.warning(f'Unable to list {current}: {e}')
+            continue
+
+        subdirectories = []
+
+        for entry in entries:
+            entry_relative = f'{relative}/{entry.name}' if relative else entry.name
+
+            if entry.is_dir(follow_symlinks=False):
+                if not recursive:
+                    continue
+
+                if matcher.ignores_directory(entry_relative) or _is_gitignored(gitignores, entry_relative, True):
+                    logger.debug(f'Pruned directory {entry_relative}')
+                    continue
+
+                subdirectories.append((Path(entry.path), entry_relative, gitignores))
+                continue
+
+            if not entry.is_file():
+                continue
+
+            if matcher.ignores_file(entry_relative) or _is_gitignored(gitignores, entry_relative, False):
+                continue
+
+            yield Path(entry.path)
+
+        # Reversed so the subdirectories are walked in name order
+        pending.extend(reversed(subdirectories))
+
+class PathFilter:
+    """
+    The ignore patterns and .gitignore rules of walk_files, applied to single paths.
+    Used to filter paths found some other way, such as from file system events.
+    """
+    def __init__(self, directory: Union[str, Path], ignore_patterns: List[str] = [], recursive: bool = True,
+                 use_gitignore: bool = True):
+        self.root = Path(directory)
+
+        self.recursive = recursive
+
+        self.use_gitignore = use_gitignore
+
+        self.matcher = IgnoreMatcher(ignore_patterns)
+
+        self._gitignores = {}
+
+    def _rules(self, relative_directory: str) -> tuple:
+        """
+        Return the .gitignore rules applying to the files of a directory, from the root down
+        """
+        if not self.use_gitignore:
+            return ()
+
+        if relative_directory not in self._gitignores:
+            parent_rules = self._rules(relative_directory.rpartition('/')[0]) if relative_directory else ()
+
+            gitignore_path = self.root / relative_directory / '.gitignore'
+
+            if gitignore_path.is_file():
+                parent_rules = parent_rules + (GitIgnoreRules.from_file(gitignore_path, base=relative_directory),)
+
+            self._gitignores[relative_directory] = parent_rules
+
+        return self._gitignores[relative_directory]
+
+    def forget(self, relative_directory: str):
+        """
+        Drop the cached .gitignore rules of a directory and the ones below it, after a .gitignore changed
+        """
+        for cached in list(self._gitignores):
+            if cached == relative_directory or cached.startswith(f'{relative_directory}/') or not relative_directory:
+                del self._gitignores[cached]
+
+    def includes(self, path: Union[str, Path], is_directory: bool = False) -> bool:
+        """
+        Whether walk_files would yield a file, or walk into a directory
+
+        Keyword arguments:
+        path -- the path, under the root directory
+        is_directory -- whether the path is a directory (default False)
+        """
+        try:
+            relative = Path(path).relative_to(self.root).as_posix()
+        except ValueError:
+            return False
+
+        if relative == '.':
+            return is_directory
+
+        parts = relative.split('/')
+
+        if not self.recursive and (len(parts) > 1 or is_directory):
+            return False
+
+        # Every parent directory has to be walked into
+        for depth in range(1, len(parts)):
+            directory = '/'.join(parts[:depth])
+
+            if self.matcher.ignores_directory(directory) or _is_gitignored(self._rules('/'.join(parts[:depth - 1])), directory, True):
+                return False
+
+        parent = '/'.join(parts[:-1])
+
+        if is_directory:
+            return not (self.matcher.ignores_directory(relative) or _is_gitignored(self._rules(parent), relative, True))
+
+        return not (self.matcher.ignores_file(relative) or _is_gitignored(self._rules(parent), relative, False))
+
+BINARY_SAMPLE_SIZE = 8192
+
+# Bytes expected in text: printable ASCII, whitespace, backspace, escape and everything above 0x7f
+_TEXT_BYTES = bytes({7, 8, 9, 10, 11, 12, 13, 27} | set(range(0x20, 0x7f)) | set(range(0x80, 0x100)))
+
+def is_binary(path: Union[str, Path], sample_size: int = BINARY_SAMPLE_SIZE) -> bool:
+    """
+    Guess whether a file is binary from its first bytes, without reading the rest of it.
+    A NUL byte means binary, otherwise the share of control characters decides, with a lower
+    tolerance when the sample isn't valid UTF-8.
+
+    Keyword arguments:
+    path -- the path of the file
+    sample_size -- how many bytes to read from the start of the file (default 8 KiB)
+    """
+    with open(path, 'rb') as sniffed_file:
+        sample = sniffed_file.read(sample_size)
+
+    if not sample:
+        return False
 
-    files = []
+    if b'\x00' in sample:
+        return True
 
-    for file in path.rglob('*') if recursive else path.glob('*'):
+    control_ratio = len(sample.translate(None, _TEXT_BYTES)) / len(sample)
 
-        if file.is_file():
-            relative_path = file.relative_to(path)
+    try:
+        sample.decode('utf-8')
+        is_utf8 = True
+    except UnicodeDecodeError as e:
+        # The sample can end in the middle of a character
+        is_utf8 = e.reason == 'unexpected end of data' and e.start >= len(sample) - 3
 
-            if not any(fnmatch.fnmatch(str(relative_path), pattern) for pattern in ignore_patterns):
-                files.append(file)
-    
-    return files
\ No newline at end of file
+    return control_ratio > (0.3 if is_utf8 else 0.05)
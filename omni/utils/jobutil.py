@@ -1,53 +1,322 @@
+import random
 import time
 
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from logging import getLogger
+from typing import Callable, Iterable, Iterator, Optional
 
 from omnilake.client.client import OmniLake
 from omnilake.client.request_definitions import DescribeJob
 
-def wait_for_completion(omnilake: OmniLake, job_id: str, job_type: str):
+import omni.utils.traceutil as traceutil
+
+logger = getLogger(__name__)
+
+FINAL_STATUSES = ('COMPLETED', 'FAILED')
+
+DEFAULT_POLL_CONCURRENCY = 8
+
+# Consecutive DescribeJob errors tolerated for a job tracked by as_completed before giving up on it
+MAX_DESCRIBE_ERRORS = 3
+
+@dataclass
+class PollingPolicy:
+    """
+    How often to poll a job: fast first polls, then exponential backoff with jitter up to a cap
+    """
+    initial_interval: float = 1.0
+    multiplier: float = 1.5
+    max_interval: float = 30.0
+    jitter: float = 0.2
+
+    def interval(self, poll_count: int) -> float:
+        """
+        Return how long to wait before the next poll
+
+        Keyword arguments:
+        poll_count -- the number of polls already made
+        """
+        interval = min(self.max_interval, self.initial_interval * self.multiplier ** max(poll_count - 1, 0))
+
+        return interval * (1 - self.jitter * random.random())
+
+@dataclass
+class JobResult:
+    """
+    The outcome of waiting for a job, truthy when the job completed successfully
+    """
+    job_id: str
+    job_type: str
+    status: str
+    status_message: Optional[str] = None
+    poll_count: int = 0
+    waited: float = 0.0
+    started: Optional[datetime] = None
+    ended: Optional[datetime] = None
+    timed_out: bool = False
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == 'COMPLETED'
+
+    @property
+    def run_time(self) -> Optional[timedelta]:
+        if self.started and self.ended:
+            return self.ended - self.started
+
+        return None
+
+    def __bool__(self) -> bool:
+        return self.succeeded
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+def _build_result(job_id: str, job_type: str, job_status: Optional[str], job_description: Optional[dict],
+                  poll_count: int, waited: float, timed_out: bool = False) -> JobResult:
+    job_description = job_description or {}
+
+    return JobResult(
+        job_id=job_id,
+        job_type=job_type,
+        status=job_status,
+        status_message=job_description.get('status_message'),
+        poll_count=poll_count,
+        waited=waited,
+        started=_parse_time(job_description.get('started')),
+        ended=_parse_time(job_description.get('ended')),
+        timed_out=timed_out,
+    )
+
+def wait_for_completion(omnilake: OmniLake, job_id: str, job_type: str, timeout: Optional[float] = None,
+                        on_status_change: Optional[Callable[[str, str, dict], None]] = None,
+                        policy: Optional[PollingPolicy] = None,
+                        on_poll: Optional[Callable[[str, dict], None]] = None) -> JobResult:
     """
-    Wait for a job to complete and return if it was successful
+    Wait for a job to complete and return the result
 
     Keyword arguments:
     omnilake -- the OmniLake client
     job_id -- the ID of the job
     job_type -- the type of the job
+    timeout -- the maximum number of seconds to wait, None waits forever (default None)
+    on_status_change -- called with the job ID, the new status and the job description when the status changes (default None)
+    policy -- the polling policy (default PollingPolicy())
+    on_poll -- called with the job ID and the job description after every poll (default None)
     """
+    policy = policy or PollingPolicy()
+
     job_describe = DescribeJob(
         job_id=job_id,
         job_type=job_type,
     )
 
-    job_resp = omnilake.request(job_describe)
+    start = time.monotonic()
 
-    job_status = job_resp.response_body['status']
+    job_status = None
 
-    job_failed = job_status == 'FAILED'
+    poll_count = 0
 
-    while job_status != 'COMPLETED':
-        time.sleep(10)
+    timed_out = False
 
+    while True:
         job_resp = omnilake.request(job_describe)
 
+        poll_count += 1
+
         if job_resp.response_body['status'] != job_status:
             job_status = job_resp.response_body['status']
 
-            if job_status == 'FAILED':
-                print(f'Job failed: {job_resp.response_body["status_message"]}')
+            if on_status_change:
+                on_status_change(job_id, job_status, job_resp.response_body)
+
+        if on_poll:
+            on_poll(job_id, job_resp.response_body)
+
+        if job_status in FINAL_STATUSES:
+            break
 
-                job_failed = True
+        interval = policy.interval(poll_count)
+
+        if timeout is not None:
+            remaining = timeout - (time.monotonic() - start)
+
+            if remaining <= 0:
+                timed_out = True
                 break
 
-            print(f'Job status updated: {job_status}')
+            interval = min(interval, remaining)
+
+        with traceutil.span('sleep', 'poll'):
+            time.sleep(interval)
+
+    return _build_result(job_id, job_type, job_status, job_resp.response_body, poll_count,
+                         waited=time.monotonic() - start, timed_out=timed_out)
+
+class _TrackedJob:
+    """
+    Polling state of a job tracked by as_completed
+    """
+    def __init__(self, job_id: str, job_type: str):
+        self.job_id = job_id
+        self.job_type = job_type
+
+        self.status = None
+        self.description = None
+
+        self.poll_count = 0
+        self.errors = 0
+
+        self.next_poll = 0.0
+
+def as_completed(omnilake: OmniLake, jobs: Iterable[tuple[str, str]], timeout: Optional[float] = None,
+                 on_status_change: Optional[Callable[[str, str, dict], None]] = None,
+                 policy: Optional[PollingPolicy] = None,
+                 max_concurrency: int = DEFAULT_POLL_CONCURRENCY) -> Iterator[JobResult]:
+    """
+    Track many jobs in a single polling loop, yielding each result as soon as the job completes or fails.
+    Every job keeps its own backoff, and the jobs due in a round are described concurrently.
+    Jobs still running when the timeout expires are yielded with timed_out set.
+
+    Keyword arguments:
+    omnilake -- the OmniLake client
+    jobs -- the (job_id, job_type) pairs to wait for
+    timeout -- the maximum number of seconds to wait for all the jobs, None waits forever (default None)
+    on_status_change -- called with the job ID, the new status and the job description when a status changes (default None)
+    policy -- the polling policy applied to each job (default PollingPolicy())
+    max_concurrency -- the maximum number of concurrent DescribeJob calls (default 8)
+    """
+    policy = policy or PollingPolicy()
 
-    print(f'Final job status: {job_status}')
+    start = time.monotonic()
 
-    started = datetime.fromisoformat(job_resp.response_body['started'])
-    ended = datetime.fromisoformat(job_resp.response_body['ended'])
+    pending = [_TrackedJob(job_id, job_type) for job_id, job_type in jobs]
 
-    total_run_time = ended - started
+    if not pending:
+        return
+
+    def describe(job: _TrackedJob):
+        try:
+            return omnilake.request(DescribeJob(job_id=job.job_id, job_type=job.job_type)).response_body, None
+        except Exception as e:
+            return None, e
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending)), thread_name_prefix='omni-poll') as executor:
+        while pending:
+            now = time.monotonic()
+
+            due = [job for job in pending if job.next_poll <= now]
+
+            for job, (job_description, error) in zip(due, executor.map(describe, due)):
+                job.poll_count += 1
+
+                if error:
+                    job.errors += 1
+
+                    logger.warning(f'Unable to describe job {job.job_id}: {error}')
+
+                    if job.errors >= MAX_DESCRIBE_ERRORS:
+                        pending.remove(job)
+
+                        result = _build_result(job.job_id, job.job_type, 'FAILED', job.description, job.poll_count,
+                                               waited=time.monotonic() - start)
+
+                        result.status_message = f'Unable to describe job: {error}'
+
+                        yield result
+                        continue
+                else:
+                    job.errors = 0
+
+                    job.description = job_description
+
+                    if job_description['status'] != job.status:
+                        job.status = job_description['status']
+
+                        if on_status_change:
+                            on_status_change(job.job_id, job.status, job_description)
+
+                    if job.status in FINAL_STATUSES:
+                        pending.remove(job)
+
+                        yield _build_result(job.job_id, job.job_type, job.status, job_description, job.poll_count,
+                                            waited=time.monotonic() - start)
+                        continue
+
+                job.next_poll = time.monotonic() + policy.interval(job.poll_count)
+
+            if not pending:
+                break
+
+            wake_up = min(job.next_poll for job in pending)
+
+            if timeout is not None:
+                deadline = start + timeout
+
+                if time.monotonic() >= deadline:
+                    for job in pending:
+                        yield _build_result(job.job_id, job.job_type, job.status, job.description, job.poll_count,
+                                            waited=time.monotonic() - start, timed_out=True)
+                    return
+
+                wake_up = min(wake_up, deadline)
+
+            with traceutil.span('sleep', 'poll'):
+                time.sleep(max(0.0, wake_up - time.monotonic()))
+
+def wait_for_all(omnilake: OmniLake, jobs: Iterable[tuple[str, str]], timeout: Optional[float] = None,
+                 on_status_change: Optional[Callable[[str, str, dict], None]] = None,
+                 policy: Optional[PollingPolicy] = None,
+                 max_concurrency: int = DEFAULT_POLL_CONCURRENCY) -> list[JobResult]:
+    """
+    Wait for many jobs in a single polling loop and return their results in the order given
+
+    Keyword arguments:
+    omnilake -- the OmniLake client
+    jobs -- the (job_id, job_type) pairs to wait for
+    timeout -- the maximum number of seconds to wait for all the jobs, None waits forever (default None)
+    on_status_change -- called with the job ID, the new status and the job description when a status changes (default None)
+    policy -- the polling policy applied to each job (default PollingPolicy())
+    max_concurrency -- the maximum number of concurrent DescribeJob calls (default 8)
+    """
+    jobs = list(jobs)
+
+    results = {}
+
+    for result in as_completed(omnilake, jobs, timeout=timeout, on_status_change=on_status_change,
+                               policy=policy, max_concurrency=max_concurrency):
+        results[result.job_id] = result
+
+    return [results[job_id] for job_id, _ in jobs]
+
+def print_status_change(job_id: str, job_status: str, job_description: dict):
+    """
+    Status change callback printing the job progress to the console
+
+    Keyword arguments:
+    job_id -- the ID of the job
+    job_status -- the new status of the job
+    job_description -- the response body of the job description
+    """
+    if job_status == 'FAILED':
+        print(f'Job failed: {job_description.get("status_message")}')
+    else:
+        print(f'Job status updated: {job_status}')
+
+def print_result(result: JobResult):
+    """
+    Print the outcome of a job to the console
+
+    Keyword arguments:
+    result -- the result of waiting for the job
+    """
+    if result.timed_out:
+        print(f'Timed out after {timedelta(seconds=result.waited)} waiting for job {result.job_id}, last status: {result.status}')
+        return
 
-    print(f'Total job run time: {total_run_time}')
+    print(f'Final job status: {result.status}')
 
-    return not job_failed
+    if result.run_time is not None:
+        print(f'Total job run time: {result.run_time}')
@@ -1,5 +1,8 @@
 import omni.utils.jobutil as jobutil
 
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
 from omnilake.client.client import OmniLake
 from omnilake.client.request_definitions import (
     LakeRequest, 
@@ -7,41 +10,75 @@ from omnilake.client.request_definitions import (
     GetEntry
 )
 
-def execute_and_wait(omnilake: OmniLake, request: LakeRequest, return_id_property: str) -> str:
+def submit(omnilake: OmniLake, request: LakeRequest, return_id_property: str) -> tuple[str, str, str]:
     """
-    Execute a lake request and wait for it to complete
+    Submit a lake request without waiting, returns the job ID, the job type and the requested ID
 
     Keyword arguments:
     omnilake -- the OmniLake client
     request -- the request to execute
+    return_id_property -- the property of the response holding the ID to return
     """
     resp = omnilake.request(request)
 
-    job_id = resp.response_body['job_id']
-    job_type = resp.response_body['job_type']
-    return_id = resp.response_body[return_id_property]
+    return resp.response_body['job_id'], resp.response_body['job_type'], resp.response_body[return_id_property]
+
+def execute_and_wait(omnilake: OmniLake, request: LakeRequest, return_id_property: str,
+                     timeout: Optional[float] = None) -> str:
+    """
+    Execute a lake request and wait for it to complete
+
+    Keyword arguments:
+    omnilake -- the OmniLake client
+    request -- the request to execute
+    return_id_property -- the property of the response holding the ID to return
+    timeout -- the maximum number of seconds to wait for the job, None waits forever (default None)
+    """
+    job_id, job_type, return_id = submit(omnilake, request, return_id_property)
 
-    job_completed = jobutil.wait_for_completion(omnilake, job_id, job_type)
+    job_result = jobutil.wait_for_completion(omnilake, job_id, job_type, timeout=timeout,
+                                             on_status_change=jobutil.print_status_change)
 
-    return return_id if job_completed else None
+    jobutil.print_result(job_result)
 
-def describe_result(omnilake: OmniLake, lake_request_id: str, request_name: str = None):
+    return return_id if job_result else None
+
+def get_result(omnilake: OmniLake, lake_request_id: str, ready_only: bool = False) -> Optional[str]:
     """
-    Describe the resulting content of a lake request
+    Return the resulting content of a lake request
 
     Keyword arguments:
     omnilake -- the OmniLake client
     lake_request_id -- the ID of the lake request
+    ready_only -- return None instead of failing when the request has no response yet (default False)
     """
     response = omnilake.request(DescribeLakeRequest(lake_request_id=lake_request_id))
 
-    entry_id = response.response_body['response_entry_id']
+    entry_id = response.response_body.get('response_entry_id') if ready_only else response.response_body['response_entry_id']
+
+    if ready_only and not entry_id:
+        return None
 
     content_resp = omnilake.request(GetEntry(entry_id=entry_id))
 
-    entry_content = content_resp.response_body['content']
+    return content_resp.response_body['content']
+
+def get_results(omnilake: OmniLake, lake_request_ids: dict[str, str], max_workers: int = 8,
+                ready_only: bool = False) -> dict[str, str]:
+    """
+    Return the resulting content of many lake requests, retrieved concurrently
+
+    Keyword arguments:
+    omnilake -- the OmniLake client
+    lake_request_ids -- the lake request IDs keyed by name
+    max_workers -- the maximum number of concurrent retrievals (default 8)
+    ready_only -- leave out the requests that have no response yet instead of failing (default False)
+    """
+    if not lake_request_ids:
+        return {}
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(lake_request_ids)), thread_name_prefix='omni-result') as executor:
+        contents = executor.map(lambda lake_request_id: get_result(omnilake, lake_request_id, ready_only=ready_only),
+                                lake_request_ids.values())
 
-    if request_name:
-        print(f"Request \"{request_name}\" Response\n=================\n\n{entry_content}")
-    else:
-        print(f"Response from server\n=================\n\n{entry_content}")
+        return {name: content for name, content in zip(lake_request_ids.keys(), contents) if content is not None}
@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+
+from logging import getLogger
+from pathlib import Path
+from typing import Optional, Union
+
+from omni.utils.fileutil import omni_home
+
+logger = getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+ADDED = 'added'
+CHANGED = 'changed'
+UNCHANGED = 'unchanged'
+
+def hash_contents(contents: bytes) -> str:
+    """
+    Return the content hash used by the manifest
+
+    Keyword arguments:
+    contents -- the raw contents of the file
+    """
+    return hashlib.sha256(contents).hexdigest()
+
+def hash_file(path: Union[str, Path]) -> str:
+    """
+    Return the content hash of a file, reading it in blocks so large files aren't loaded in memory
+
+    Keyword arguments:
+    path -- the path of the file
+    """
+    with open(path, 'rb') as hashed_file:
+        return hashlib.file_digest(hashed_file, 'sha256').hexdigest()
+
+class Manifest:
+    """
+    Local record of the files already indexed into an archive.
+
+    Each entry is keyed by the path relative to the indexed directory and holds the
+    size, modification time, content hash, the options that shaped its upload (such as
+    its chunking) and the source resource names created for it.
+    """
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+        self.entries = {}
+
+        if self.path.exists():
+            self._load()
+
+    @classmethod
+    def for_archive(cls, app_name: str, deployment_id: str, archive_id: str, directory: Union[str, Path]) -> 'Manifest':
+        """
+        Open the manifest for an archive and directory pair
+
+        Keyword arguments:
+        app_name -- the OmniLake app name
+        deployment_id -- the OmniLake deployment ID
+        archive_id -- the archive the directory is indexed into
+        directory -- the directory being indexed
+        """
+        directory_hash = hashlib.sha1(str(Path(directory).absolute()).encode('utf-8')).hexdigest()[:12]
+
+        return cls(omni_home() / 'manifests' / app_name / deployment_id / f'{archive_id}-{directory_hash}.json')
+
+    def _load(self):
+        """
+        Load the manifest from disk, starting over if it can't be read
+        """
+        try:
+            with open(self.path, 'r') as manifest_file:
+                loaded = json.load(manifest_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Unable to read manifest {self.path}, starting a new one: {e}')
+            return
+
+        if loaded.get('version') != MANIFEST_VERSION:
+            logger.info(f'Manifest {self.path} has an unsupported version, starting a new one')
+            return
+
+        self.entries = loaded.get('files', {})
+
+    def is_unchanged(self, relative_path: str, stat_result: os.stat_result, options: Optional[dict] = None) -> bool:
+        """
+        Cheap check of whether a file matches its manifest entry by size, modification time and options
+
+        Keyword arguments:
+        relative_path -- the path relative to the indexed directory
+        stat_result -- the result of stat() on the file
+        options -- the options the file would be uploaded with (default None, no options)
+        """
+        entry = self.entries.get(relative_path)
+
+        if not entry:
+            return False
+
+        return (entry['size'] == stat_result.st_size and entry['mtime_ns'] == stat_result.st_mtime_ns
+                and entry.get('options', {}) == (options or {}))
+
+    def classify(self, relative_path: str, content_hash: str, options: Optional[dict] = None) -> str:
+        """
+        Classify a file that failed the stat check as added, changed or unchanged. A file uploaded
+        with other options, such as another chunk size, is changed even if its contents are not.
+
+        Keyword arguments:
+        relative_path -- the path relative to the indexed directory
+        content_hash -- the hash of the file contents
+        options -- the options the file would be uploaded with (default None, no options)
+        """
+        entry = self.entries.get(relative_path)
+
+        if not entry:
+            return ADDED
+
+        if entry['content_hash'] == content_hash and entry.get('options', {}) == (options or {}):
+            return UNCHANGED
+
+        return CHANGED
+
+    def touch(self, relative_path: str, stat_result: os.stat_result):
+        """
+        Refresh the size and modification time of an entry whose contents did not change
+
+        Keyword arguments:
+        relative_path -- the path relative to the indexed directory
+        stat_result -- the result of stat() on the file
+        """
+        entry = self.entries[relative_path]
+
+        entry['size'] = stat_result.st_size
+        entry['mtime_ns'] = stat_result.st_mtime_ns
+
+    def record(self, relative_path: str, stat_result: os.stat_result, content_hash: str,
+               source_resource_names: list[str], options: Optional[dict] = None):
+        """
+        Record a file that was successfully indexed
+
+        Keyword arguments:
+        relative_path -- the path relative to the indexed directory
+        stat_result -- the result of stat() on the file
+        content_hash -- the hash of the file contents
+        source_resource_names -- the resource names of the sources created for the file
+        options -- the options the file was uploaded with (default None, no options)
+        """
+        self.entries[relative_path] = {
+            'size': stat_result.st_size,
+            'mtime_ns': stat_result.st_mtime_ns,
+            'content_hash': content_hash,
+            'options': options or {},
+            'source_resource_names': source_resource_names,
+        }
+
+    def save(self):
+        """
+        Write the manifest to disk atomically
+        """
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        temporary_path = self.path.with_suffix('.tmp')
+
+        with open(temporary_path, 'w') as manifest_file:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.entries}, manifest_file)
+
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,243 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from logging import getLogger
+from pathlib import Path
+from typing import Iterator, List, Optional, Union
+
+import pypdf
+
+import omni.utils.traceutil as traceutil
+
+from omni.utils.fileutil import omni_home
+
+logger = getLogger(__name__)
+
+# The reader of the last PDF opened by a worker process, so consecutive pages don't parse the file again
+_open_reader = None
+
+def _extract_page(path: str, page_number: int) -> tuple[int, str]:
+    """
+    Extract the text of a single page, runs in a worker process
+    """
+    global _open_reader
+
+    if _open_reader is None or _open_reader[0] != path:
+        _open_reader = (path, pypdf.PdfReader(path))
+
+    return page_number, _open_reader[1].pages[page_number].extract_text()
+
+def count_pages(path: Union[str, Path]) -> int:
+    """
+    Return the number of pages in a PDF
+
+    Keyword arguments:
+    path -- the path of the PDF file
+    """
+    return len(pypdf.PdfReader(path).pages)
+
+class PdfExtractor:
+    """
+    Extracts PDF text in a pool of worker processes, one task per page.
+
+    Extracted pages are cached on disk by the hash of the file contents, so unchanged
+    PDFs are never parsed twice. A PDF being extracted is tracked until its pages are cached,
+    so identical PDFs submitted meanwhile share its extraction. The pool is only started when a PDF needs parsing.
+    """
+    def __init__(self, workers: Optional[int] = None, cache_dir: Optional[Union[str, Path]] = None):
+        self.workers = workers or os.cpu_count()
+
+        self.cache_dir = Path(cache_dir) if cache_dir else omni_home() / 'cache' / 'pdf'
+
+        self._executor = None
+
+        # The page futures of the PDFs being extracted, by content hash, until their pages are cached
+        self._in_flight = {}
+
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> 'PdfExtractor':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned rather than forked, the parent is running upload threads
+                self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+
+            return self._executor
+
+    def _cache_path(self, content_hash: str) -> Path:
+        return self.cache_dir / f'{content_hash}.json'
+
+    def cached_pages(self, content_hash: str) -> Optional[List[str]]:
+        """
+        Return the cached text of every page of a PDF, if available
+
+        Keyword arguments:
+        content_hash -- the hash of the PDF contents
+        """
+        cache_path = self._cache_path(content_hash)
+
+        if not cache_path.exists():
+            return None
+
+        try:
+            with open(cache_path, 'r') as cache_file:
+                return json.load(cache_file)['pages']
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f'Ignoring unreadable PDF cache {cache_path}: {e}')
+
+            return None
+
+    def _store_pages(self, content_hash: str, pages: List[str]):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+        cache_path = self._cache_path(content_hash)
+
+        temporary_path = cache_path.with_suffix(f'.{threading.get_ident()}.tmp')
+
+        with open(temporary_path, 'w') as cache_file:
+            json.dump({'pages': pages}, cache_file)
+
+        os.replace(temporary_path, cache_path)
+
+    def submit(self, path: Union[str, Path], content_hash: str) -> List[Future]:
+        """
+        Start extracting every page of a PDF, returns one future per page resolving to (page_number, text).
+        Cached PDFs return futures that are already resolved.
+
+        Keyword arguments:
+        path -- the path of the PDF file
+        content_hash -- the hash of the PDF contents
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(content_hash)
+
+        if in_flight is not None:
+            logger.debug(f'Sharing the extraction of {path}')
+
+            return in_flight
+
+        cached = self.cached_pages(content_hash)
+
+        if cached is not None:
+            logger.debug(f'Using cached text for {path}')
+
+            futures = []
+
+            for page_number, text in enumerate(cached):
+                future = Future()
+
+                future.set_result((page_number, text))
+
+                futures.append(future)
+
+            return futures
+
+        start = time.perf_counter()
+
+        with traceutil.span('count_pages', 'pdf'):
+            page_count = count_pages(path)
+
+        executor = self._get_executor()
+
+        futures = [executor.submit(_extract_page, str(path), page_number) for page_number in range(page_count)]
+
+        if not futures:
+            return futures
+
+        pages = [None] * page_count
+
+        remaining = [page_count]
+
+        pages_lock = threading.Lock()
+
+        def page_done(future: Future):
+            failed = future.cancelled() or future.exception() is not None
+
+            with pages_lock:
+                if not failed:
+                    page_number, text = future.result()
+
+                    pages[page_number] = text
+
+                remaining[0] -= 1
+
+                completed = remaining[0] == 0
+
+            if not completed:
+                return
+
+            if None not in pages:
+                traceutil.record('extract', 'pdf', start, time.perf_counter(), file=str(path), pages=page_count)
+
+                try:
+                    self._store_pages(content_hash, pages)
+                except OSError as e:
+                    logger.warning(f'Unable to cache the text of {path}: {e}')
+
+            # Only once cached, so the pages can always be read from one or the other
+            with self._lock:
+                self._in_flight.pop(content_hash, None)
+
+        with self._lock:
+            self._in_flight[content_hash] = futures
+
+        for future in futures:
+            future.add_done_callback(page_done)
+
+        return futures
+
+    def pages(self, path: Union[str, Path], content_hash: str) -> List[str]:
+        """
+        Return the text of every page of a PDF, from its extraction if it is running, from the cache,
+        or by extracting it again when it isn't cached
+
+        Keyword arguments:
+        path -- the path of the PDF file
+        content_hash -- the hash of the PDF contents
+        """
+        with self._lock:
+            in_flight = self._in_flight.get(content_hash)
+
+        if in_flight is not None:
+            return [future.result()[1] for future in in_flight]
+
+        cached = self.cached_pages(content_hash)
+
+        if cached is not None:
+            return cached
+
+        logger.debug(f'No cached text for {path}, extracting it again')
+
+        return [text for _, text in sorted(self.extract(path, content_hash))]
+
+    def extract(self, path: Union[str, Path], content_hash: str) -> Iterator[tuple[int, str]]:
+        """
+        Extract every page of a PDF, yielding (page_number, text) as each page finishes
+
+        Keyword arguments:
+        path -- the path of the PDF file
+        content_hash -- the hash of the PDF contents
+        """
+        for future in as_completed(self.submit(path, content_hash)):
+            yield future.result()
+
+    def shutdown(self):
+        """
+        Stop the worker processes
+        """
+        with self._lock:
+            if self._executor:
+                self._executor.shutdown(wait=True, cancel_futures=True)
+
+                self._executor = None
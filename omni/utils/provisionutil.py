@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+
+from logging import getLogger
+from pathlib import Path
+from typing import Union
+
+from omni.utils.fileutil import omni_home
+
+logger = getLogger(__name__)
+
+RECORD_VERSION = 1
+
+class ProvisionRecord:
+    """
+    Local record of the archives and source types already provisioned in a deployment.
+
+    Runs check it before creating them, so a repeat run sends no provisioning request at all.
+    An archive deleted from the deployment stays recorded until the record is ignored or removed.
+    """
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+        self.archives = set()
+
+        self.source_types = set()
+
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            self._load()
+
+    @classmethod
+    def for_deployment(cls, app_name: str, deployment_id: str) -> 'ProvisionRecord':
+        """
+        Open the record of a deployment
+
+        Keyword arguments:
+        app_name -- the OmniLake app name
+        deployment_id -- the OmniLake deployment ID
+        """
+        return cls(omni_home() / 'provisioned' / app_name / f'{deployment_id}.json')
+
+    def _load(self):
+        """
+        Load the record from disk, starting over if it can't be read
+        """
+        try:
+            with open(self.path, 'r') as record_file:
+                loaded = json.load(record_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f'Unable to read provisioning record {self.path}, starting a new one: {e}')
+            return
+
+        if loaded.get('version') != RECORD_VERSION:
+            logger.info(f'Provisioning record {self.path} has an unsupported version, starting a new one')
+            return
+
+        self.archives = set(loaded.get('archives', []))
+
+        self.source_types = set(loaded.get('source_types', []))
+
+    def has_archive(self, archive_id: str) -> bool:
+        with self._lock:
+            return archive_id in self.archives
+
+    def add_archive(self, archive_id: str):
+        with self._lock:
+            self.archives.add(archive_id)
+
+    def has_source_type(self, name: str) -> bool:
+        with self._lock:
+            return name in self.source_types
+
+    def add_source_type(self, name: str):
+        with self._lock:
+            self.source_types.add(name)
+
+    def save(self):
+        """
+        Write the record to disk atomically
+        """
+        with self._lock:
+            record = {'version': RECORD_VERSION, 'archives': sorted(self.archives), 'source_types': sorted(self.source_types)}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        temporary_path = self.path.with_suffix('.tmp')
+
+        with open(temporary_path, 'w') as record_file:
+            json.dump(record, record_file)
+
+        os.replace(temporary_path, self.path)
@@ -0,0 +1,304 @@
+import math
+import random
+import threading
+import time
+
+from collections import deque
+from dataclasses import dataclass
+from logging import getLogger
+from typing import Optional
+
+import omni.utils.traceutil as traceutil
+
+logger = getLogger(__name__)
+
+DEFAULT_MAX_ATTEMPTS = 5
+
+THROTTLING_CODES = {
+    'Throttling',
+    'ThrottlingException',
+    'ThrottledException',
+    'TooManyRequestsException',
+    'RequestLimitExceeded',
+    'RequestThrottled',
+    'RequestThrottledException',
+    'ProvisionedThroughputExceededException',
+    'TransactionInProgressException',
+    'SlowDown',
+}
+
+# The service turned the request away without processing it
+UNAVAILABLE_CODES = {
+    'ServiceUnavailable',
+    'ServiceUnavailableException',
+}
+
+# The service failed while processing the request, which may have been applied
+TRANSIENT_CODES = {
+    'InternalError',
+    'InternalFailure',
+    'InternalServerError',
+    'ServiceException',
+    'RequestTimeout',
+    'RequestTimeoutException',
+}
+
+THROTTLING_MESSAGES = ('rate exceeded', 'throttl', 'too many requests', 'slow down')
+
+# The request never reached the service, so sending it again can't apply it twice
+_CONNECTION_ERRORS = {'EndpointConnectionError', 'ConnectTimeoutError', 'ConnectionRefusedError'}
+
+# The request may have been applied before the connection dropped
+_INTERRUPTED_ERRORS = {'ReadTimeoutError', 'ConnectionClosedError', 'ResponseStreamingError', 'ConnectionResetError',
+                       'TimeoutError'}
+
+# The OmniLake client sends its requests with requests, whose errors are matched by module to tell them from the builtins
+_REQUESTS_CONNECTION_ERRORS = {'requests.exceptions.ConnectionError', 'requests.exceptions.ConnectTimeout'}
+
+_REQUESTS_INTERRUPTED_ERRORS = {'requests.exceptions.ReadTimeout', 'requests.exceptions.ChunkedEncodingError'}
+
+# The urllib3 error requests wraps in a ConnectionError when the connection drops after the request was sent
+_PROTOCOL_ERROR = 'urllib3.exceptions.ProtocolError'
+
+_IDEMPOTENT_PREFIXES = ('Describe', 'Get', 'List')
+
+@dataclass
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter between the attempts of a request
+    """
+    max_attempts: int = DEFAULT_MAX_ATTEMPTS
+    base_delay: float = 0.5
+    multiplier: float = 2.0
+    max_delay: float = 20.0
+
+    def delay(self, attempt: int) -> float:
+        """
+        Return how long to wait before the next attempt
+
+        Keyword arguments:
+        attempt -- the number of attempts already made, starting at 1
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * self.multiplier ** (attempt - 1)))
+
+def _error_code(error: Exception) -> Optional[str]:
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, dict):
+        return response.get('Error', {}).get('Code')
+
+    return None
+
+def _status_code(error: Exception) -> Optional[int]:
+    response = getattr(error, 'response', None)
+
+    if isinstance(response, dict):
+        return response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+
+    # The response of a requests HTTPError, which is falsy for error statuses
+    if response is not None:
+        return getattr(response, 'status_code', None)
+
+    return None
+
+def _qualified_names(error_type: type) -> set[str]:
+    return {f'{cls.__module__}.{cls.__name__}' for cls in error_type.__mro__}
+
+def is_throttling(error: Exception) -> bool:
+    """
+    Whether the service rejected a request because too many are being sent
+
+    Keyword arguments:
+    error -- the error raised by the request
+    """
+    if _error_code(error) in THROTTLING_CODES or _status_code(error) == 429:
+        return True
+
+    message = str(error).lower()
+
+    return any(throttling_message in message for throttling_message in THROTTLING_MESSAGES)
+
+def is_retryable(error: Exception, request_type: Optional[str] = None) -> bool:
+    """
+    Whether a failed request can be sent again. Throttling, unavailable services (503) and connection failures
+    are retryable, while other server errors and interrupted reads are only retryable for requests that don't
+    change anything, such as Describe requests, as the failed request may have been applied.
+    Errors of botocore and of requests, which the OmniLake client sends its requests with, are both recognized.
+    Anything else, like invalid requests or resources that already exist, is fatal.
+
+    Keyword arguments:
+    error -- the error raised by the request
+    request_type -- the class name of the request (default None, considered not idempotent)
+    """
+    if is_throttling(error):
+        return True
+
+    status_code = _status_code(error)
+
+    if _error_code(error) in UNAVAILABLE_CODES or status_code == 503:
+        return True
+
+    is_idempotent = bool(request_type) and request_type.startswith(_IDEMPOTENT_PREFIXES)
+
+    if _error_code(error) in TRANSIENT_CODES or (status_code is not None and status_code >= 500):
+        return is_idempotent
+
+    qualified_names = _qualified_names(type(error))
+
+    if qualified_names & _REQUESTS_INTERRUPTED_ERRORS:
+        return is_idempotent
+
+    if qualified_names & _REQUESTS_CONNECTION_ERRORS:
+        # Connection failures wrap the urllib3 error, a dropped connection may have applied the request
+        if any(_PROTOCOL_ERROR in _qualified_names(type(arg)) for arg in error.args):
+            return is_idempotent
+
+        return True
+
+    error_names = {cls.__name__ for cls in type(error).__mro__}
+
+    if error_names & _CONNECTION_ERRORS:
+        return True
+
+    if error_names & _INTERRUPTED_ERRORS:
+        return is_idempotent
+
+    return False
+
+class AdaptiveLimiter:
+    """
+    AIMD limits on the requests in flight and on the request rate, shared by every thread using the client.
+
+    Throttling halves both limits, at most once per cooldown so a burst of throttled requests counts once.
+    The rate is only limited after the first throttling, starting from half the rate observed then.
+    Every success raises the concurrency by one per limit's worth of requests, and the rate by about
+    5% per second, so long runs settle around the highest rate the deployment accepts.
+    """
+    def __init__(self, max_limit: int, min_limit: int = 1, cooldown: float = 1.0, min_rate: float = 1.0):
+        self.max_limit = max(1, max_limit)
+        self.min_limit = max(1, min(min_limit, self.max_limit))
+
+        self.cooldown = cooldown
+
+        self.min_rate = min_rate
+
+        self.limit = float(self.max_limit)
+
+        # Requests per second, None until a request is throttled
+        self.rate: Optional[float] = None
+
+        self.in_flight = 0
+
+        self._sent = deque()
+
+        self._next_send = 0.0
+
+        self._last_decrease = 0.0
+
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Wait until a request can be sent
+        """
+        with self._condition:
+            while self.in_flight >= math.floor(self.limit):
+                self._condition.wait()
+
+            self.in_flight += 1
+
+            now = time.monotonic()
+
+            send_at = now
+
+            if self.rate:
+                send_at = max(now, self._next_send)
+
+                self._next_send = send_at + 1 / self.rate
+
+            # Sends of the last second, to know the rate when the first throttling happens
+            self._sent.append(send_at)
+
+            while self._sent[0] < now - 1:
+                self._sent.popleft()
+
+        if send_at > now:
+            time.sleep(send_at - now)
+
+    def release(self, throttled: bool = False, succeeded: bool = False):
+        """
+        Free the slot of a finished request and adjust the limits
+
+        Keyword arguments:
+        throttled -- the request was throttled (default False)
+        succeeded -- the request succeeded (default False)
+        """
+        with self._condition:
+            self.in_flight -= 1
+
+            if throttled:
+                now = time.monotonic()
+
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit / 2)
+
+                    self.rate = max(self.min_rate, (self.rate or len(self._sent)) / 2)
+
+                    self._last_decrease = now
+
+                    logger.info(f'Throttled, lowered the limits to {math.floor(self.limit)} requests in flight '
+                                f'and {self.rate:.1f} requests per second')
+            elif succeeded:
+                if self.limit < self.max_limit:
+                    self.limit = min(float(self.max_limit), self.limit + 1 / self.limit)
+
+                if self.rate:
+                    self.rate += max(1.0, self.rate * 0.05) / self.rate
+
+            self._condition.notify_all()
+
+class RetryingClient:
+    """
+    Wrapper retrying the retryable failures of an OmniLake client with backoff, under an adaptive concurrency limit
+    """
+    def __init__(self, client, policy: Optional[RetryPolicy] = None, limiter: Optional[AdaptiveLimiter] = None):
+        self.client = client
+
+        self.policy = policy or RetryPolicy()
+
+        self.limiter = limiter
+
+    def request(self, request):
+        request_type = type(request).__name__
+
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if self.limiter:
+                self.limiter.acquire()
+
+            try:
+                response = self.client.request(request)
+            except Exception as e:
+                if self.limiter:
+                    self.limiter.release(throttled=is_throttling(e))
+
+                if attempt >= self.policy.max_attempts or not is_retryable(e, request_type):
+                    raise
+
+                delay = self.policy.delay(attempt)
+
+                logger.info(f'{request_type} failed on attempt {attempt}, retrying in {delay:.2f}s: {e}')
+            else:
+                if self.limiter:
+                    self.limiter.release(succeeded=True)
+
+                return response
+
+            with traceutil.span('backoff', 'retry', request=request_type, attempt=attempt):
+                time.sleep(delay)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,248 @@
+import json
+import math
+import os
+import threading
+import time
+
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging import getLogger
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+logger = getLogger(__name__)
+
+REQUEST_CATEGORY = 'request'
+
+@dataclass
+class Span:
+    """
+    A timed operation, either a request to OmniLake or a local stage
+    """
+    name: str
+    category: str
+    start: float
+    duration: float
+    thread_id: int
+    outcome: str = 'ok'
+    attributes: dict = field(default_factory=dict)
+
+class Tracer:
+    """
+    Thread safe collector of spans
+    """
+    def __init__(self):
+        self.spans = []
+
+        # Spans are timed with perf_counter, the origin converts them to wall time in the trace file
+        self.origin = time.perf_counter()
+
+        self.wall_origin = time.time()
+
+        self._lock = threading.Lock()
+
+    def add(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self) -> dict[tuple[str, str], dict]:
+        """
+        Return the count, errors, latency percentiles and payload bytes of the spans, per category and name
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        grouped = {}
+
+        for span in spans:
+            grouped.setdefault((span.category, span.name), []).append(span)
+
+        summary = {}
+
+        for key, group in sorted(grouped.items()):
+            durations = sorted(span.duration for span in group)
+
+            summary[key] = {
+                'count': len(group),
+                'errors': sum(1 for span in group if span.outcome != 'ok'),
+                'total': sum(durations),
+                'p50': _percentile(durations, 50),
+                'p95': _percentile(durations, 95),
+                'max': durations[-1],
+                'sent_bytes': sum(span.attributes.get('sent_bytes', 0) for span in group),
+                'received_bytes': sum(span.attributes.get('received_bytes', 0) for span in group),
+            }
+
+        return summary
+
+    def print_report(self):
+        """
+        Print the latency of every request type and local stage to the console
+        """
+        summary = self.summary()
+
+        if not summary:
+            print('No operations traced')
+            return
+
+        print(f'\n{"category":<10} {"operation":<28} {"count":>6} {"errors":>6} {"p50 ms":>9} {"p95 ms":>9} '
+              f'{"max ms":>9} {"total s":>9} {"sent KB":>9} {"recv KB":>9}')
+
+        for (category, name), stats in summary.items():
+            print(f'{category:<10} {name:<28} {stats["count"]:>6} {stats["errors"]:>6} {stats["p50"] * 1000:>9.1f} '
+                  f'{stats["p95"] * 1000:>9.1f} {stats["max"] * 1000:>9.1f} {stats["total"]:>9.2f} '
+                  f'{stats["sent_bytes"] / 1024:>9.1f} {stats["received_bytes"] / 1024:>9.1f}')
+
+    def write_chrome_trace(self, path: Union[str, Path]):
+        """
+        Write the spans in the Chrome trace event format, which chrome://tracing and Perfetto load
+
+        Keyword arguments:
+        path -- the path of the JSON file to write
+        """
+        with self._lock:
+            spans = list(self.spans)
+
+        process_id = os.getpid()
+
+        events = []
+
+        for span in spans:
+            events.append({
+                'name': span.name,
+                'cat': span.category,
+                'ph': 'X',
+                'ts': (self.wall_origin + span.start - self.origin) * 1_000_000,
+                'dur': span.duration * 1_000_000,
+                'pid': process_id,
+                'tid': span.thread_id,
+                'args': {'outcome': span.outcome, **span.attributes},
+            })
+
+        with open(path, 'w') as trace_file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, trace_file, default=str)
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    """
+    Nearest-rank percentile of values already sorted
+    """
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+
+    return sorted_values[rank - 1]
+
+_tracer: Optional[Tracer] = None
+
+def enable() -> Tracer:
+    """
+    Start collecting spans, returns the tracer they are collected into
+    """
+    global _tracer
+
+    if _tracer is None:
+        _tracer = Tracer()
+
+    return _tracer
+
+def disable():
+    """
+    Stop collecting spans and drop the ones collected
+    """
+    global _tracer
+
+    _tracer = None
+
+def get_tracer() -> Optional[Tracer]:
+    """
+    Return the active tracer, None when tracing is disabled
+    """
+    return _tracer
+
+def record(name: str, category: str, start: float, end: float, outcome: str = 'ok', **attributes):
+    """
+    Record an operation timed by the caller, for work that doesn't fit in a block such as futures
+
+    Keyword arguments:
+    name -- the name of the operation
+    category -- the category of the operation, such as "request" or "walk"
+    start -- the perf_counter value when the operation started
+    end -- the perf_counter value when the operation ended
+    outcome -- "ok" or the name of the error raised (default "ok")
+    attributes -- extra values stored with the span
+    """
+    tracer = _tracer
+
+    if tracer is None:
+        return
+
+    tracer.add(Span(name=name, category=category, start=start, duration=end - start,
+                    thread_id=threading.get_ident(), outcome=outcome, attributes=attributes))
+
+@contextmanager
+def span(name: str, category: str, **attributes) -> Iterator[dict]:
+    """
+    Time the enclosed block, doing nothing when tracing is disabled.
+    Yields the attributes of the span so the block can add to them, an exception is recorded as the outcome.
+
+    Keyword arguments:
+    name -- the name of the operation
+    category -- the category of the operation, such as "request" or "walk"
+    attributes -- extra values stored with the span
+    """
+    if _tracer is None:
+        yield attributes
+        return
+
+    outcome = 'ok'
+
+    start = time.perf_counter()
+
+    try:
+        yield attributes
+    except BaseException as e:
+        outcome = type(e).__name__
+        raise
+    finally:
+        record(name, category, start, time.perf_counter(), outcome=outcome, **attributes)
+
+def _payload_size(value) -> int:
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+class TracingClient:
+    """
+    Wrapper recording a span for every request sent through an OmniLake client, named after the request type.
+    The payload sizes are those of the request attributes and response body serialized as JSON.
+    """
+    def __init__(self, client):
+        self.client = client
+
+    def request(self, request):
+        if _tracer is None:
+            return self.client.request(request)
+
+        # Sized outside of the span so serializing large payloads doesn't skew the latency
+        sent_bytes = _payload_size(getattr(request, 'attributes', None))
+
+        outcome = 'ok'
+
+        start = time.perf_counter()
+
+        try:
+            response = self.client.request(request)
+        except BaseException as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            end = time.perf_counter()
+
+            received_bytes = _payload_size(getattr(response, 'response_body', None)) if outcome == 'ok' else 0
+
+            record(type(request).__name__, REQUEST_CATEGORY, start, end, outcome=outcome,
+                   sent_bytes=sent_bytes, received_bytes=received_bytes)
+
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
@@ -0,0 +1,245 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, CancelledError, Future, ThreadPoolExecutor, wait
+from logging import getLogger
+from typing import Callable, Iterable, Optional
+
+logger = getLogger(__name__)
+
+DEFAULT_WORKERS = 8
+
+class UploadGroup:
+    """
+    A set of upload tasks belonging to the same unit of work, usually a file.
+
+    The results are kept in submission order and the completion callback is called
+    once the group is closed and all of its tasks finished, successfully or not.
+    """
+    def __init__(self, name: str, on_complete: Optional[Callable[['UploadGroup'], None]] = None):
+        self.name = name
+        self.on_complete = on_complete
+
+        self.results = []
+        self.errors = []
+
+        self.pending = 0
+        self.closed = False
+        self.finished = False
+
+    @property
+    def failed(self) -> bool:
+        return len(self.errors) > 0
+
+class UploadPipeline:
+    """
+    Bounded-concurrency upload stage.
+
+    Tasks run on a thread pool while the caller keeps reading and preparing the next ones.
+    Submitting blocks once too many tasks are in flight, which keeps memory flat, and group
+    callbacks are always called from the thread that submits or joins.
+
+    Tasks can be held until a gate future resolves, such as the provisioning of the archive they
+    upload to. The caller keeps preparing tasks meanwhile, up to max_held of them, and if the gate
+    fails its error is raised by the held tasks and by the next submit.
+
+    Tasks can also wait for a future of their own, such as the extraction of the text they upload,
+    and are only handed to a worker once it resolves, so waiting never takes a worker.
+    """
+    def __init__(self, workers: int = DEFAULT_WORKERS, max_in_flight: Optional[int] = None,
+                 gate: Optional[Future] = None, max_held: Optional[int] = None):
+        if workers < 1:
+            raise ValueError('The number of workers must be at least 1')
+
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='omni-upload')
+
+        self.max_in_flight = max_in_flight or workers * 2
+
+        self.gate = gate
+
+        self.max_held = max(max_held or self.max_in_flight * 4, self.max_in_flight)
+
+        self._in_flight = {}
+
+        # The tasks waiting for each future, the futures resolved since, and the tasks ready to start
+        self._waiting = {}
+
+        self._resolved = deque()
+
+        self._ready = deque()
+
+    def __enter__(self) -> 'UploadPipeline':
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.join()
+
+        self.executor.shutdown(wait=True, cancel_futures=exc_type is not None)
+
+    def group(self, name: str, on_complete: Optional[Callable[[UploadGroup], None]] = None) -> UploadGroup:
+        """
+        Create a new group of tasks
+
+        Keyword arguments:
+        name -- the name of the group, used for reporting
+        on_complete -- called with the group once all of its tasks are done (default None)
+        """
+        return UploadGroup(name=name, on_complete=on_complete)
+
+    def submit(self, group: UploadGroup, fn: Callable, *args, **kwargs):
+        """
+        Submit a task to the pipeline, waiting for room if too many tasks are in flight
+
+        Keyword arguments:
+        group -- the group the task belongs to
+        fn -- the callable to execute
+        """
+        if group.closed:
+            raise ValueError(f'Group {group.name} is already closed')
+
+        if self.gate is not None and self.gate.done() and self.gate.exception() is not None:
+            raise self.gate.exception()
+
+        self._start_resolved()
+
+        while len(self._in_flight) >= self._limit():
+            self._collect(return_when=FIRST_COMPLETED)
+
+        self._start(group, self._add_result(group), fn, args, kwargs)
+
+    def submit_when_done(self, dependency: Future, group: UploadGroup, fn: Callable, *args, **kwargs):
+        """
+        Submit a task once a future resolves, without taking a worker meanwhile. The task is called with the
+        result of the future as its first argument, and fails with the error of the future if it failed.
+
+        Keyword arguments:
+        dependency -- the future the task needs the result of
+        group -- the group the task belongs to
+        fn -- the callable to execute
+        """
+        if group.closed:
+            raise ValueError(f'Group {group.name} is already closed')
+
+        if self.gate is not None and self.gate.done() and self.gate.exception() is not None:
+            raise self.gate.exception()
+
+        self._waiting.setdefault(dependency, []).append((group, self._add_result(group), fn, args, kwargs))
+
+        # Called from the thread resolving the future, the tasks are started from the thread submitting
+        dependency.add_done_callback(self._resolved.append)
+
+    def _add_result(self, group: UploadGroup) -> int:
+        """
+        Reserve the result of a new task of a group, returns its index
+        """
+        group.results.append(None)
+        group.pending += 1
+
+        return len(group.results) - 1
+
+    def _start(self, group: UploadGroup, result_index: int, fn: Callable, args: tuple, kwargs: dict):
+        future = self.executor.submit(self._run, fn, args, kwargs)
+
+        self._in_flight[future] = (group, result_index)
+
+    def _start_resolved(self, done: Iterable[Future] = ()):
+        """
+        Start the tasks whose future resolved while there is room, or fail them with its error
+
+        Keyword arguments:
+        done -- futures known to be resolved, whose callback may not have run yet (default none)
+        """
+        resolved = list(done)
+
+        while self._resolved:
+            resolved.append(self._resolved.popleft())
+
+        for dependency in resolved:
+            for group, result_index, fn, args, kwargs in self._waiting.pop(dependency, []):
+                error = CancelledError() if dependency.cancelled() else dependency.exception()
+
+                if error is None:
+                    self._ready.append((group, result_index, fn, (dependency.result(), *args), kwargs))
+                    continue
+
+                group.errors.append(error)
+                group.pending -= 1
+
+                self._finish_if_done(group)
+
+        while self._ready and len(self._in_flight) < self._limit():
+            self._start(*self._ready.popleft())
+
+    def _limit(self) -> int:
+        """
+        Return how many tasks can be in flight, more while they are held by the gate
+        """
+        if self.gate is not None and not self.gate.done():
+            return self.max_held
+
+        return self.max_in_flight
+
+    def _run(self, fn: Callable, args: tuple, kwargs: dict):
+        """
+        Run a task on a worker once the gate, if any, is open
+        """
+        if self.gate is not None:
+            self.gate.result()
+
+        return fn(*args, **kwargs)
+
+    def close(self, group: UploadGroup):
+        """
+        Mark a group as complete, no more tasks can be submitted to it
+
+        Keyword arguments:
+        group -- the group to close
+        """
+        group.closed = True
+
+        self._finish_if_done(group)
+
+    def join(self):
+        """
+        Wait for every task in flight, and every task waiting for its future, to finish
+        """
+        while self._in_flight or self._waiting or self._ready:
+            self._collect(return_when=FIRST_COMPLETED)
+
+    def _collect(self, return_when: str):
+        """
+        Wait for tasks to finish and record their results on their groups, starting the tasks whose future resolved
+        """
+        self._start_resolved()
+
+        done, _ = wait([*self._in_flight, *self._waiting], return_when=return_when)
+
+        for future in done:
+            if future not in self._in_flight:
+                continue
+
+            group, result_index = self._in_flight.pop(future)
+
+            try:
+                group.results[result_index] = future.result()
+            except Exception as e:
+                logger.debug(f'Task in group {group.name} failed', exc_info=True)
+
+                group.errors.append(e)
+
+            group.pending -= 1
+
+            self._finish_if_done(group)
+
+        self._start_resolved(done)
+
+    def _finish_if_done(self, group: UploadGroup):
+        """
+        Call the group completion callback if the group is closed and has no pending tasks
+        """
+        if not group.closed or group.pending > 0 or group.finished:
+            return
+
+        group.finished = True
+
+        if group.on_complete:
+            group.on_complete(group)
@@ -0,0 +1,296 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+from logging import getLogger
+from pathlib import Path
+from typing import Iterator, Optional, Union
+
+from omni.utils.fileutil import PathFilter, walk_files
+
+logger = getLogger(__name__)
+
+DEFAULT_DEBOUNCE = 2.0
+
+DEFAULT_POLL_INTERVAL = 5.0
+
+# From <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+_WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE | IN_MOVED_FROM | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+class InotifyWatcher:
+    """
+    Watches a directory tree with Linux inotify, through ctypes so no extra dependency is needed.
+    Ignored directories aren't watched, and new directories are watched as they appear.
+    """
+    def __init__(self, path_filter: PathFilter):
+        self.path_filter = path_filter
+
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), f'inotify_init1 failed: {os.strerror(ctypes.get_errno())}')
+
+        self._directories = {}
+
+        try:
+            self._add_tree(path_filter.root)
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: Path):
+        watch_descriptor = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+
+        if watch_descriptor < 0:
+            error = ctypes.get_errno()
+
+            raise OSError(error, f'Unable to watch {directory}: {os.strerror(error)}')
+
+        self._directories[watch_descriptor] = directory
+
+    def _add_tree(self, directory: Path) -> list[Path]:
+        """
+        Watch a directory and the ones below it, returns the files found in them
+        """
+        found = []
+
+        pending = [directory]
+
+        while pending:
+            current = pending.pop()
+
+            self._add_watch(current)
+
+            if not self.path_filter.recursive and current != self.path_filter.root:
+                continue
+
+            try:
+                with os.scandir(current) as scanned:
+                    for entry in scanned:
+                        if entry.is_dir(follow_symlinks=False):
+                            if self.path_filter.recursive and self.path_filter.includes(entry.path, is_directory=True):
+                                pending.append(Path(entry.path))
+                        elif entry.is_file():
+                            found.append(Path(entry.path))
+            except OSError as e:
+                logger.warning(f'Unable to list {current}: {e}')
+
+        return found
+
+    def read(self, timeout: Optional[float]) -> tuple[set[Path], bool]:
+        """
+        Wait up to timeout seconds for events, returns the paths changed and whether events were lost
+
+        Keyword arguments:
+        timeout -- the maximum number of seconds to wait, None waits until an event arrives
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+
+        if not readable:
+            return set(), False
+
+        try:
+            buffer = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set(), False
+
+        changed = set()
+
+        overflow = False
+
+        offset = 0
+
+        while offset < len(buffer):
+            watch_descriptor, mask, _, name_length = _EVENT_HEADER.unpack_from(buffer, offset)
+
+            name = buffer[offset + _EVENT_HEADER.size:offset + _EVENT_HEADER.size + name_length].rstrip(b'\0')
+
+            offset += _EVENT_HEADER.size + name_length
+
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+
+            if mask & IN_IGNORED:
+                self._directories.pop(watch_descriptor, None)
+                continue
+
+            directory = self._directories.get(watch_descriptor)
+
+            if directory is None or not name:
+                continue
+
+            path = directory / os.fsdecode(name)
+
+            if mask & IN_ISDIR:
+                # Files written before the watch was added would be missed otherwise
+                if mask & (IN_CREATE | IN_MOVED_TO) and self.path_filter.recursive and self.path_filter.includes(path, is_directory=True):
+                    try:
+                        changed.update(self._add_tree(path))
+                    except OSError as e:
+                        logger.warning(f'Unable to watch {path}: {e}')
+                continue
+
+            changed.add(path)
+
+        return changed, overflow
+
+    def close(self):
+        os.close(self._fd)
+
+class PollingWatcher:
+    """
+    Watches a directory tree by walking it at an interval and comparing the size and modification time of the files
+    """
+    def __init__(self, path_filter: PathFilter, ignore_patterns: list[str], interval: float = DEFAULT_POLL_INTERVAL):
+        self.path_filter = path_filter
+
+        self.ignore_patterns = ignore_patterns
+
+        self.interval = interval
+
+        self._snapshot = self._scan()
+
+        self._next_scan = time.monotonic() + interval
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot = {}
+
+        for path in walk_files(self.path_filter.root, ignore_patterns=self.ignore_patterns,
+                               recursive=self.path_filter.recursive, use_gitignore=self.path_filter.use_gitignore):
+            try:
+                file_stat = path.stat()
+            except OSError:
+                continue
+
+            snapshot[path] = (file_stat.st_size, file_stat.st_mtime_ns)
+
+        return snapshot
+
+    def read(self, timeout: Optional[float]) -> tuple[set[Path], bool]:
+        """
+        Wait until the next scan, or up to timeout seconds, returns the paths changed and whether events were lost
+
+        Keyword arguments:
+        timeout -- the maximum number of seconds to wait, None waits until the next scan
+        """
+        wait = max(0.0, self._next_scan - time.monotonic())
+
+        if timeout is not None and timeout < wait:
+            time.sleep(timeout)
+            return set(), False
+
+        time.sleep(wait)
+
+        snapshot = self._scan()
+
+        self._next_scan = time.monotonic() + self.interval
+
+        changed = {path for path, signature in snapshot.items() if self._snapshot.get(path) != signature}
+
+        self._snapshot = snapshot
+
+        return changed, False
+
+    def close(self):
+        pass
+
+def watch(directory: Union[str, Path], ignore_patterns: list[str] = [], recursive: bool = True,
+          use_gitignore: bool = True, debounce: float = DEFAULT_DEBOUNCE, poll: bool = False,
+          poll_interval: float = DEFAULT_POLL_INTERVAL) -> Iterator[list[Path]]:
+    """
+    Watch a directory and yield the files changed, in batches once changes stop for the debounce period.
+    Uses inotify on Linux, and falls back to polling elsewhere or when inotify is unavailable.
+    Changes that keep coming are still flushed after ten debounce periods.
+
+    Keyword arguments:
+    directory -- the directory to watch
+    ignore_patterns -- a list of patterns to ignore (fnmatch-style, against the relative path)
+    recursive -- whether to watch subdirectories or not (default True)
+    use_gitignore -- whether to honour .gitignore files found in the tree (default True)
+    debounce -- the seconds without changes before a batch is yielded (default 2)
+    poll -- always poll instead of using inotify (default False)
+    poll_interval -- the seconds between scans when polling (default 5)
+    """
+    path_filter = PathFilter(directory, ignore_patterns=ignore_patterns, recursive=recursive, use_gitignore=use_gitignore)
+
+    watcher = None
+
+    if not poll and sys.platform.startswith('linux'):
+        try:
+            watcher = InotifyWatcher(path_filter)
+        except (OSError, AttributeError) as e:
+            # Usually the limit of inotify watches is reached, see fs.inotify.max_user_watches
+            logger.warning(f'Unable to use inotify, polling every {poll_interval}s instead: {e}')
+
+    if watcher is None:
+        watcher = PollingWatcher(path_filter, ignore_patterns, interval=poll_interval)
+
+    pending = set()
+
+    first_change = last_change = 0.0
+
+    try:
+        while True:
+            timeout = None
+
+            if pending:
+                now = time.monotonic()
+
+                timeout = max(0.0, min(last_change + debounce, first_change + debounce * 10) - now)
+
+            changed, overflow = watcher.read(timeout)
+
+            if overflow:
+                logger.warning('File system events were lost, rescanning the directory')
+
+                changed.update(walk_files(path_filter.root, ignore_patterns=ignore_patterns, recursive=recursive,
+                                          use_gitignore=use_gitignore))
+
+            for path in changed:
+                if path.name == '.gitignore':
+                    relative_directory = path.parent.relative_to(path_filter.root).as_posix()
+
+                    path_filter.forget('' if relative_directory == '.' else relative_directory)
+
+            changed = {path for path in changed if path_filter.includes(path)}
+
+            now = time.monotonic()
+
+            if changed:
+                if not pending:
+                    first_change = now
+
+                pending.update(changed)
+
+                last_change = now
+
+            if pending and (now >= last_change + debounce or now >= first_change + debounce * 10):
+                # Deleted files are left out, only files that still exist are indexed
+                batch = sorted(path for path in pending if path.is_file())
+
+                pending = set()
+
+                if batch:
+                    yield batch
+    finally:
+        watcher.close()
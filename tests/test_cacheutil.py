@@ -0,0 +1,74 @@
+import json
+import os
+
+import pytest
+
+import omni.utils.cacheutil as cacheutil
+
+class _Request:
+    def __init__(self, **attributes):
+        self.attributes = attributes
+
+    def to_dict(self) -> dict:
+        return self.attributes
+
+@pytest.fixture
+def cache(tmp_path) -> cacheutil.ResponseCache:
+    return cacheutil.ResponseCache(directory=tmp_path / 'answers', ttl=60, max_entries=2)
+
+def test_request_key_depends_on_the_request_and_scope():
+    key = cacheutil.request_key(_Request(question='why', archives=['docs']), app_name='lake')
+
+    assert key == cacheutil.request_key(_Request(archives=['docs'], question='why'), app_name='lake')
+
+    assert key != cacheutil.request_key(_Request(question='how', archives=['docs']), app_name='lake')
+    assert key != cacheutil.request_key(_Request(question='why', archives=['docs']), app_name='other')
+
+def test_get_returns_the_stored_value(cache):
+    assert cache.get('key') is None
+
+    cache.put('key', {'answer': 42})
+
+    assert cache.get('key') == {'answer': 42}
+
+def test_entries_expire_after_the_ttl(cache, monkeypatch):
+    cache.put('key', {'answer': 42})
+
+    now = cacheutil.time.time()
+
+    monkeypatch.setattr(cacheutil.time, 'time', lambda: now + 61)
+
+    assert cache.get('key') is None
+
+    assert not cache._entry_path('key').exists()
+
+def test_least_recently_used_entries_are_evicted(cache):
+    cache.put('first', {'answer': 1})
+    cache.put('second', {'answer': 2})
+
+    # Eviction goes by modification time, which reading refreshes
+    os.utime(cache._entry_path('first'), (0, 0))
+    os.utime(cache._entry_path('second'), (1, 1))
+
+    assert cache.get('first') == {'answer': 1}
+
+    cache.put('third', {'answer': 3})
+
+    assert cache.get('second') is None
+
+    assert cache.get('first') == {'answer': 1}
+    assert cache.get('third') == {'answer': 3}
+
+@pytest.mark.parametrize('contents', [
+    'not json',
+    json.dumps({'value': {'answer': 42}}),
+    json.dumps({'created': 'yesterday', 'value': {'answer': 42}}),
+    json.dumps({'created': 0}),
+    json.dumps(['created', 'value']),
+])
+def test_malformed_entries_are_misses(cache, contents):
+    cache.directory.mkdir(parents=True)
+
+    cache._entry_path('key').write_text(contents)
+
+    assert cache.get('key') is None
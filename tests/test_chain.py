@@ -0,0 +1,52 @@
+from argparse import Namespace
+
+import pytest
+
+import omni.commands.chain as chain
+
+def _render(value, **params):
+    return chain.ChainCommand()._render(value, params, 'params.jsonl line 1')
+
+def test_render_substitutes_the_strings_of_the_definition():
+    definition = [{
+        'name': 'summary',
+        'request': {'query_string': 'What changed in $service since ${release}?', 'max_entries': 10},
+    }]
+
+    assert _render(definition, service='billing', release='v2') == [{
+        'name': 'summary',
+        'request': {'query_string': 'What changed in billing since v2?', 'max_entries': 10},
+    }]
+
+@pytest.mark.parametrize('value', ['$archives', '${archives}'])
+def test_render_keeps_the_type_of_a_single_variable(value):
+    assert _render({'archive_ids': value}, archives=['docs', 'runbooks']) == {'archive_ids': ['docs', 'runbooks']}
+
+def test_render_writes_non_string_values_as_json():
+    assert _render('Top $count of $archives', count=3, archives=['docs']) == 'Top 3 of ["docs"]'
+
+def test_render_leaves_other_dollar_signs_alone():
+    assert _render('Costs over $5 for $team', team='billing') == 'Costs over $5 for billing'
+
+    assert _render('Costs over $5') == 'Costs over $5'
+
+def test_render_missing_variables():
+    with pytest.raises(ValueError, match='Missing variable\\(s\\) team in params.jsonl line 1'):
+        _render({'query_string': 'Who is on $team?'})
+
+def test_load_params(tmp_path):
+    params_path = tmp_path / 'params.jsonl'
+
+    params_path.write_text('{"id": "a", "team": "billing"}\n\n{"team": "search"}\n')
+
+    runs = chain.ChainCommand()._load_params(Namespace(params=str(params_path)))
+
+    assert runs == [Namespace(line=1, id='a', params={'team': 'billing'}), Namespace(line=3, id=None, params={'team': 'search'})]
+
+def test_load_params_rejects_lines_that_are_not_objects(tmp_path):
+    params_path = tmp_path / 'params.jsonl'
+
+    params_path.write_text('["billing"]\n')
+
+    with pytest.raises(ValueError, match='line 1'):
+        chain.ChainCommand()._load_params(Namespace(params=str(params_path)))
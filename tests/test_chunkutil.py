@@ -0,0 +1,115 @@
+import mmap
+
+import pytest
+
+import omni.utils.chunkutil as chunkutil
+
+def _chunks(tmp_path, contents: bytes, chunker, *args) -> list[str]:
+    path = tmp_path / 'chunked.txt'
+
+    path.write_bytes(contents)
+
+    with open(path, 'rb') as chunked_file, mmap.mmap(chunked_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        return list(chunker(mapped, *args))
+
+def test_size_chunks_cut_at_line_breaks(tmp_path):
+    chunks = _chunks(tmp_path, b'aaa\nbbb\nccc\n', chunkutil._size_chunks, 9, 0)
+
+    assert chunks == ['aaa\nbbb\n', 'ccc\n']
+
+def test_size_chunks_without_line_breaks(tmp_path):
+    chunks = _chunks(tmp_path, b'abcdefghij', chunkutil._size_chunks, 4, 0)
+
+    assert chunks == ['abcd', 'efgh', 'ij']
+
+@pytest.mark.parametrize('max_bytes', [1, 2, 3, 4, 5, 7])
+def test_size_chunks_never_split_characters(tmp_path, max_bytes):
+    text = 'é☃😀a' * 5
+
+    chunks = _chunks(tmp_path, text.encode('utf-8'), chunkutil._size_chunks, max_bytes, 0)
+
+    assert ''.join(chunks) == text
+
+    # A character larger than the chunk size is kept whole in a chunk of its own
+    assert all(len(chunk.encode('utf-8')) <= max_bytes or len(chunk) == 1 for chunk in chunks)
+
+def test_size_chunks_overlap_starts_at_a_line(tmp_path):
+    chunks = _chunks(tmp_path, b'aaa\nbbb\nccc\nddd\n', chunkutil._size_chunks, 8, 5)
+
+    assert chunks == ['aaa\nbbb\n', 'bbb\nccc\n', 'ccc\nddd\n']
+
+def test_size_chunks_overlap_always_moves_forward(tmp_path):
+    chunks = _chunks(tmp_path, b'abcdef', chunkutil._size_chunks, 3, 2)
+
+    assert chunks == ['abc', 'bcd', 'cde', 'def']
+
+@pytest.mark.parametrize('max_bytes, overlap', [(4, 1), (5, 2), (8, 3), (9, 7)])
+def test_size_chunks_overlap_never_splits_characters(tmp_path, max_bytes, overlap):
+    text = 'é☃😀a' * 5
+
+    chunks = _chunks(tmp_path, text.encode('utf-8'), chunkutil._size_chunks, max_bytes, overlap)
+
+    # Every chunk decodes whole and starts where the text has one of its characters
+    assert all(chunk and text.find(chunk) != -1 for chunk in chunks)
+
+    assert chunks[0] == text[:len(chunks[0])]
+    assert text.endswith(chunks[-1])
+
+def test_line_chunks(tmp_path):
+    chunks = _chunks(tmp_path, b'1\n2\n3\n4\n5\n', chunkutil._line_chunks, 2, 0)
+
+    assert chunks == ['1\n2\n', '3\n4\n', '5\n']
+
+def test_line_chunks_without_a_final_line_break(tmp_path):
+    chunks = _chunks(tmp_path, b'1\n2\n3', chunkutil._line_chunks, 2, 0)
+
+    assert chunks == ['1\n2\n', '3']
+
+def test_line_chunks_overlap(tmp_path):
+    chunks = _chunks(tmp_path, b'1\n2\n3\n4\n5\n', chunkutil._line_chunks, 3, 1)
+
+    assert chunks == ['1\n2\n3\n', '3\n4\n5\n']
+
+def test_line_chunks_no_chunk_of_overlap_only(tmp_path):
+    chunks = _chunks(tmp_path, b'1\n2\n3\n4\n', chunkutil._line_chunks, 2, 1)
+
+    assert chunks == ['1\n2\n', '2\n3\n', '3\n4\n']
+
+def test_iter_chunks_prefers_lines(tmp_path):
+    path = tmp_path / 'chunked.txt'
+
+    path.write_bytes(b'1\n2\n3\n')
+
+    assert list(chunkutil.iter_chunks(path, max_bytes=1, max_lines=2)) == ['1\n2\n', '3\n']
+
+    assert list(chunkutil.iter_chunks(path, max_bytes=4)) == ['1\n2\n', '3\n']
+
+def test_iter_chunks_requires_a_limit(tmp_path):
+    path = tmp_path / 'chunked.txt'
+
+    path.write_bytes(b'text')
+
+    with pytest.raises(ValueError):
+        list(chunkutil.iter_chunks(path, max_bytes=0))
+
+@pytest.mark.parametrize('options', [
+    {'max_bytes': 0},
+    {'max_bytes': None},
+    {'max_bytes': 10, 'overlap': 9},
+    {'max_lines': 1},
+    {'max_bytes': 0, 'max_lines': 5, 'overlap': 4},
+])
+def test_check_options_valid(options):
+    chunkutil.check_options(**options)
+
+@pytest.mark.parametrize('options', [
+    {'max_lines': 0},
+    {'max_bytes': -1},
+    {'overlap': -1},
+    {'max_bytes': 0, 'overlap': 1},
+    {'max_bytes': 10, 'overlap': 10},
+    {'max_lines': 3, 'overlap': 3},
+])
+def test_check_options_invalid(options):
+    with pytest.raises(ValueError):
+        chunkutil.check_options(**options)
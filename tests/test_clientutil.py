@@ -0,0 +1,114 @@
+import json
+import threading
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import omni.utils.clientutil as clientutil
+
+class _Handler(BaseHTTPRequestHandler):
+    # Keeps connections alive between requests
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.dumps({'path': self.path}).encode('utf-8')
+
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+
+    server.shutdown()
+    server.server_close()
+
+class _RequestsClient:
+    """
+    Sends its requests with the functions of the requests module, like the OmniLake client
+    """
+    def __init__(self, url: str, app_name=None, deployment_id=None):
+        self.url = url
+
+    def request(self, request):
+        response = requests.post(f'{self.url}/{type(request).__name__}', json={})
+
+        return SimpleNamespace(response_body=response.json())
+
+class DescribeJob:
+    pass
+
+@pytest.fixture
+def session(monkeypatch):
+    # Restored after the test, the session routes the functions of the requests module once created
+    monkeypatch.setattr(clientutil.requests.api, 'request', clientutil.requests.api.request)
+    monkeypatch.setattr(clientutil, '_session', None)
+
+    yield
+
+    clientutil.set_client_factory()
+
+def test_requests_reuse_the_connections_of_the_session(server, session):
+    clientutil.set_client_factory(lambda **kwargs: _RequestsClient(server, **kwargs))
+
+    client = clientutil.get_client('app', 'dev')
+
+    for _ in range(5):
+        assert client.request(DescribeJob()).response_body == {'path': '/DescribeJob'}
+
+    assert clientutil.connection_stats() == {'requests': 5, 'connections': 1}
+
+def test_requests_outside_of_a_client_are_left_alone(server, session):
+    clientutil.set_client_factory(lambda **kwargs: _RequestsClient(server, **kwargs))
+
+    clientutil.get_client('app', 'dev').request(DescribeJob())
+
+    requests.post(f'{server}/other', json={})
+
+    assert clientutil.connection_stats()['requests'] == 1
+
+def test_session_sets_default_timeouts(monkeypatch):
+    sent = []
+
+    monkeypatch.setattr(requests.Session, 'request', lambda self, method, url, **kwargs: sent.append(kwargs['timeout']))
+
+    pooled_session = clientutil.PooledSession(pool_size=4, connect_timeout=1, read_timeout=2)
+
+    pooled_session.request('post', 'http://lake')
+    pooled_session.request('post', 'http://lake', timeout=5)
+
+    assert sent == [(1, 2), 5]
+
+    assert pooled_session.adapter._pool_maxsize == 4
+
+def test_session_from_the_environment(monkeypatch, session):
+    monkeypatch.setenv('OMNI_MAX_IN_FLIGHT', '7')
+    monkeypatch.setenv('OMNI_CONNECT_TIMEOUT', '3')
+    monkeypatch.setenv('OMNI_READ_TIMEOUT', '30')
+
+    clientutil.set_client_factory(lambda **kwargs: SimpleNamespace(request=lambda request: None))
+
+    clientutil.get_client('app', 'dev')
+
+    assert clientutil._session.timeout == (3.0, 30.0)
+    assert clientutil._session.adapter._pool_maxsize == 7
+
+def test_no_connection_stats_without_a_client(session):
+    assert clientutil.connection_stats() is None
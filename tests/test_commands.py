@@ -0,0 +1,13 @@
+import pytest
+
+import omni.commands as commands
+
+@pytest.mark.parametrize('command_name', sorted(commands.__all__))
+def test_registry_matches_the_command_classes(command_name):
+    lazy_command = commands.__all__[command_name]
+
+    command_class = lazy_command.load()
+
+    # The registry repeats the name and description so the help is shown without importing the commands
+    assert command_class.command_name == lazy_command.command_name
+    assert command_class.description == lazy_command.description
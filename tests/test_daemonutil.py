@@ -0,0 +1,80 @@
+import io
+import os
+import threading
+
+from types import SimpleNamespace
+
+import pytest
+
+import omni.utils.daemonutil as daemonutil
+
+@pytest.fixture
+def daemon(tmp_path):
+    socket_path = tmp_path / 'daemon.sock'
+
+    seen = []
+
+    def run(argv: list[str]):
+        seen.append((argv, os.getcwd(), os.getenv('DEPLOYMENT_ID')))
+
+        # Like a .env file loaded by the command
+        os.environ['LOADED_BY_COMMAND'] = 'yes'
+
+        print(f'ran {" ".join(argv)}')
+
+        if argv == ['fail']:
+            raise SystemExit(2)
+
+    thread = threading.Thread(target=daemonutil.serve, args=(run, socket_path), daemon=True)
+    thread.start()
+
+    while not daemonutil.is_running(socket_path):
+        thread.join(0.01)
+
+    yield socket_path, seen
+
+    daemonutil.stop(socket_path)
+
+    thread.join(5)
+
+def test_forward_streams_the_output_and_exit_code(daemon, monkeypatch):
+    socket_path, seen = daemon
+
+    # The daemon redirects the output of this process while a command runs, the client writes elsewhere
+    client_output = SimpleNamespace(stdout=io.StringIO(), stderr=io.StringIO())
+
+    monkeypatch.setattr(daemonutil, 'sys', client_output)
+
+    assert daemonutil.forward(['question', 'why'], socket_path) == 0
+    assert daemonutil.forward(['fail'], socket_path) == 2
+
+    assert client_output.stdout.getvalue() == 'ran question why\nran fail\n'
+
+def test_commands_run_with_the_environment_of_the_client(daemon, tmp_path, monkeypatch):
+    socket_path, seen = daemon
+
+    monkeypatch.chdir(tmp_path)
+
+    monkeypatch.setenv('DEPLOYMENT_ID', 'prod')
+
+    daemonutil.forward(['index'], socket_path)
+
+    monkeypatch.setenv('DEPLOYMENT_ID', 'dev')
+
+    daemonutil.forward(['index'], socket_path)
+
+    assert seen == [(['index'], str(tmp_path), 'prod'), (['index'], str(tmp_path), 'dev')]
+
+def test_environment_is_restored_after_each_command(daemon, monkeypatch):
+    socket_path, _ = daemon
+
+    monkeypatch.setenv('DEPLOYMENT_ID', 'prod')
+
+    daemonutil.forward(['index'], socket_path)
+
+    # The daemon runs in this process, so its environment is the one of the test
+    assert 'LOADED_BY_COMMAND' not in os.environ
+    assert os.environ['DEPLOYMENT_ID'] == 'prod'
+
+def test_no_daemon(tmp_path):
+    assert daemonutil.forward(['index'], tmp_path / 'missing.sock') is None
@@ -0,0 +1,175 @@
+import re
+
+import pytest
+
+import omni.utils.fileutil as fileutil
+
+@pytest.mark.parametrize('pattern, path, matches', [
+    ('*.log', 'debug.log', True),
+    ('*.log', 'logs/debug.log', False),
+    ('debug?.log', 'debug1.log', True),
+    ('debug?.log', 'debug/.log', False),
+    ('**/build', 'build', True),
+    ('**/build', 'a/b/build', True),
+    ('logs/**', 'logs/a/b.log', True),
+    ('a/**/b', 'a/x/y/b', True),
+    ('a/**/b', 'a/b', True),
+    ('file[0-9].txt', 'file7.txt', True),
+    ('file[!0-9].txt', 'file7.txt', False),
+    ('file[!0-9].txt', 'filex.txt', True),
+    ('[abc', '[abc', True),
+    ('\\*.txt', '*.txt', True),
+    ('\\*.txt', 'a.txt', False),
+    ('a+b.txt', 'a+b.txt', True),
+])
+def test_translate_gitignore_glob(pattern, path, matches):
+    assert bool(re.fullmatch(fileutil._translate_gitignore_glob(pattern), path)) == matches
+
+def test_gitignore_rules_skip_comments_and_blank_lines():
+    rules = fileutil.GitIgnoreRules(['# comment\n', '\n', '   \n', '/\n'])
+
+    assert rules.rules == []
+
+def test_gitignore_rules_match_at_any_depth_without_a_slash():
+    rules = fileutil.GitIgnoreRules(['*.pyc\n'])
+
+    assert rules.match('module.pyc', False)
+    assert rules.match('package/module.pyc', False)
+    assert rules.match('package/module.py', False) is None
+
+def test_gitignore_rules_are_anchored_with_a_slash():
+    rules = fileutil.GitIgnoreRules(['/build\n', 'docs/out\n'])
+
+    assert rules.match('build', True)
+    assert rules.match('src/build', True) is None
+    assert rules.match('docs/out', True)
+    assert rules.match('src/docs/out', True) is None
+
+def test_gitignore_rules_directory_only():
+    rules = fileutil.GitIgnoreRules(['cache/\n'])
+
+    assert rules.match('cache', True)
+    assert rules.match('cache', False) is None
+
+def test_gitignore_rules_negation_last_rule_wins():
+    rules = fileutil.GitIgnoreRules(['*.log\n', '!keep.log\n'])
+
+    assert rules.match('debug.log', False) is True
+    assert rules.match('keep.log', False) is False
+
+    rules = fileutil.GitIgnoreRules(['!keep.log\n', '*.log\n'])
+
+    assert rules.match('keep.log', False) is True
+
+def test_gitignore_rules_relative_to_their_directory():
+    rules = fileutil.GitIgnoreRules(['/out\n', '*.tmp\n'], base='sub')
+
+    assert rules.match('sub/out', True)
+    assert rules.match('out', True) is None
+    assert rules.match('sub/deep/a.tmp', False)
+    assert rules.match('a.tmp', False) is None
+
+def test_ignore_matcher_files():
+    matcher = fileutil.IgnoreMatcher(['*.pyc', 'docs/*.md'])
+
+    assert matcher.ignores_file('module.pyc')
+    assert matcher.ignores_file('package/module.pyc')
+    assert matcher.ignores_file('docs/index.md')
+    assert not matcher.ignores_file('README.md')
+
+def test_ignore_matcher_directories():
+    matcher = fileutil.IgnoreMatcher(['.git*', 'node_modules'])
+
+    assert matcher.ignores_directory('.git')
+    assert matcher.ignores_directory('node_modules')
+    assert not matcher.ignores_directory('src')
+
+    # Only patterns ending in "*" reach below the directory they name
+    assert not fileutil.IgnoreMatcher(['build']).ignores_directory('src')
+
+def test_ignore_matcher_without_patterns():
+    matcher = fileutil.IgnoreMatcher([])
+
+    assert not matcher.ignores_file('anything')
+    assert not matcher.ignores_directory('anything')
+
+def _tree(root, files):
+    for relative_path, contents in files.items():
+        path = root / relative_path
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+
+def _walked(root, **kwargs):
+    return [path.relative_to(root).as_posix() for path in fileutil.walk_files(root, **kwargs)]
+
+def test_walk_files_in_name_order(tmp_path):
+    _tree(tmp_path, {'b.txt': 'b', 'a/z.txt': 'z', 'a/y.txt': 'y', 'c/x.txt': 'x'})
+
+    assert _walked(tmp_path) == ['b.txt', 'a/y.txt', 'a/z.txt', 'c/x.txt']
+
+    assert _walked(tmp_path, recursive=False) == ['b.txt']
+
+def test_walk_files_honours_gitignore_files(tmp_path):
+    _tree(tmp_path, {
+        '.gitignore': '*.log\nbuild/\n',
+        'keep.txt': 'keep',
+        'debug.log': 'log',
+        'build/out.txt': 'out',
+        'sub/.gitignore': '!important.log\n/local.txt\n',
+        'sub/important.log': 'log',
+        'sub/other.log': 'log',
+        'sub/local.txt': 'local',
+        'sub/deep/local.txt': 'local',
+    })
+
+    assert _walked(tmp_path) == ['.gitignore', 'keep.txt', 'sub/.gitignore', 'sub/important.log', 'sub/deep/local.txt']
+
+    assert 'debug.log' in _walked(tmp_path, use_gitignore=False)
+
+def test_walk_files_prunes_ignored_directories(tmp_path, monkeypatch):
+    _tree(tmp_path, {'src/a.py': 'a', '.git/objects/x': 'x', 'node_modules/pkg/index.js': 'js'})
+
+    scanned = []
+
+    scandir = fileutil.os.scandir
+
+    def recording_scandir(path):
+        scanned.append(path)
+
+        return scandir(path)
+
+    monkeypatch.setattr(fileutil.os, 'scandir', recording_scandir)
+
+    assert _walked(tmp_path, ignore_patterns=['.git*', 'node_modules']) == ['src/a.py']
+
+    assert sorted(scanned) == sorted([tmp_path, tmp_path / 'src'])
+
+def test_path_filter_agrees_with_walk_files(tmp_path):
+    _tree(tmp_path, {'.gitignore': 'build/\n', 'a.txt': 'a', 'build/b.txt': 'b', 'src/c.pyc': 'c', 'src/d.py': 'd'})
+
+    path_filter = fileutil.PathFilter(tmp_path, ignore_patterns=['*.pyc'])
+
+    walked = set(_walked(tmp_path, ignore_patterns=['*.pyc']))
+
+    for relative_path in ['a.txt', 'build/b.txt', 'src/c.pyc', 'src/d.py']:
+        assert path_filter.includes(tmp_path / relative_path) == (relative_path in walked)
+
+    assert not path_filter.includes(tmp_path / 'build', is_directory=True)
+    assert not path_filter.includes('/elsewhere/a.txt')
+
+@pytest.mark.parametrize('contents, binary', [
+    (b'', False),
+    (b'plain text\n', False),
+    ('café ☃\n'.encode('utf-8'), False),
+    (b'a\x00b', True),
+    (bytes(range(1, 32)) * 10, True),
+    # A character cut at the end of the sample is still UTF-8
+    (b'a' * 10 + '☃'.encode('utf-8')[:2], False),
+])
+def test_is_binary(tmp_path, contents, binary):
+    path = tmp_path / 'sample'
+
+    path.write_bytes(contents)
+
+    assert fileutil.is_binary(path) == binary
@@ -0,0 +1,433 @@
+import json
+import threading
+
+from argparse import ArgumentParser
+from types import SimpleNamespace
+
+import pytest
+
+import omni.commands.index as index
+import omni.utils.clientutil as clientutil
+import omni.utils.fileutil as fileutil
+import omni.utils.manifestutil as manifestutil
+import omni.utils.provisionutil as provisionutil
+
+class _RecordingLake:
+    """
+    Records the requests sent and the sources and entries added, in place of the OmniLake client
+    """
+    def __init__(self):
+        self.requests = []
+
+        self.sources = {}
+
+        self.entries = []
+
+        self.entry_added = threading.Event()
+
+        self._lock = threading.Lock()
+
+    def request(self, request):
+        request_type = type(request).__name__
+
+        with self._lock:
+            self.requests.append(request_type)
+
+            if request_type == 'CreateArchive':
+                return SimpleNamespace(response_body={'job_id': 'job', 'job_type': 'CREATE_ARCHIVE'})
+
+            if request_type == 'DescribeJob':
+                return SimpleNamespace(response_body={'status': 'COMPLETED'})
+
+            if request_type == 'CreateSourceType':
+                return SimpleNamespace(response_body={})
+
+            if request_type == 'AddSource':
+                resource_name = f'source-{len(self.sources)}'
+
+                self.sources[resource_name] = request.attributes
+
+                return SimpleNamespace(response_body={'resource_name': resource_name})
+
+            if request_type == 'AddEntry':
+                self.entries.append(request.attributes)
+
+                self.entry_added.set()
+
+                return SimpleNamespace(response_body={'entry_id': f'entry-{len(self.entries)}'})
+
+        raise NotImplementedError(request_type)
+
+    def entry_paths(self) -> list[list[str]]:
+        """
+        Return the file paths of the sources of each entry
+        """
+        return sorted(sorted(self.sources[source_rn]['source_arguments']['full_file_path'] for source_rn in entry['sources'])
+                      for entry in self.entries)
+
+@pytest.fixture
+def lake(tmp_path, monkeypatch):
+    monkeypatch.setenv('OMNI_HOME', str(tmp_path / 'home'))
+
+    lake = _RecordingLake()
+
+    clientutil.set_client_factory(lambda **kwargs: lake)
+
+    yield lake
+
+    clientutil.set_client_factory()
+
+def _tree(root, files):
+    for relative_path, contents in files.items():
+        path = root / relative_path
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(contents)
+
+    return root
+
+def _index(directory, file_list=None, **options) -> tuple[dict[str, int], manifestutil.Manifest]:
+    manifest = manifestutil.Manifest(directory.parent / 'manifest.json')
+
+    counts = index.RefreshIndexCommand()._process_file_list('archive', directory, file_list or fileutil.walk_files(directory),
+                                                            manifest, workers=2, **options)
+
+    return counts, manifest
+
+def _dry_run(directory, **options) -> dict[str, int]:
+    manifest = manifestutil.Manifest(directory.parent / 'manifest.json')
+
+    return index.RefreshIndexCommand()._dry_run_file_list(directory, fileutil.walk_files(directory), manifest, **options)
+
+def _plan(directory, **options) -> tuple[list[index._PlannedFile], dict]:
+    manifest = manifestutil.Manifest(directory.parent / 'manifest.json')
+
+    counts = {outcome: 0 for outcome in index.OUTCOMES}
+
+    text_bodies = {}
+
+    planned_files = list(index.RefreshIndexCommand()._plan_file_list(directory, fileutil.walk_files(directory), manifest,
+                                                                      counts=counts, text_bodies=text_bodies, **options))
+
+    return planned_files, text_bodies
+
+def test_planned_file_bodies(tmp_path):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'same', 'b.txt': 'same', 'c.txt': 'other'})
+
+    (a, b, c), text_bodies = _plan(directory)
+
+    assert a.bodies == b.bodies != c.bodies
+
+    assert text_bodies[a.bodies[0]] == [(a, 0), (b, 0)]
+
+    assert a.owns_any(text_bodies)
+    assert not b.owns_any(text_bodies)
+
+    taken = a.take_bodies(text_bodies)
+
+    assert taken == {a.bodies[0]: [(a, 0), (b, 0)]}
+    assert list(text_bodies) == c.bodies
+
+    # Bodies already taken by another holder are left alone
+    assert b.take_bodies(text_bodies) == {}
+
+def test_chunks_are_registered_once_per_body(tmp_path):
+    directory = _tree(tmp_path / 'files', {'big.txt': 'line\n' * 10})
+
+    (big,), text_bodies = _plan(directory, chunk_lines=2)
+
+    assert big.chunked
+
+    assert len(big.bodies) == 5
+    assert text_bodies == {big.bodies[0]: [(big, slot) for slot in range(5)]}
+
+def test_identical_files_uploaded_apart_by_default(tmp_path, lake):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'same', 'sub/b.txt': 'same'})
+
+    counts, manifest = _index(directory)
+
+    assert counts[manifestutil.ADDED] == 2
+    assert counts['deduplicated'] == 0
+
+    assert lake.entry_paths() == [['a.txt'], ['sub/b.txt']]
+
+def test_identical_chunks_of_a_file_uploaded_once_by_default(tmp_path, lake):
+    directory = _tree(tmp_path / 'files', {'big.txt': 'line\n' * 10})
+
+    counts, manifest = _index(directory, chunk_lines=2)
+
+    assert counts['deduplicated'] == 4
+
+    assert len(lake.entries) == 1
+    assert len(lake.sources) == 5
+
+    assert len(manifest.entries['big.txt']['source_resource_names']) == 5
+
+def test_identical_files_uploaded_once_with_dedup(tmp_path, lake):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'same', 'sub/b.txt': 'same', 'c.txt': 'other'})
+
+    counts, manifest = _index(directory, dedup=True)
+
+    assert counts[manifestutil.ADDED] == 3
+    assert counts['deduplicated'] == 1
+
+    assert lake.entry_paths() == [['a.txt', 'sub/b.txt'], ['c.txt']]
+
+    # The first holder is the original of the entry
+    shared_entry = next(entry for entry in lake.entries if len(entry['sources']) == 2)
+
+    assert shared_entry['original_of_source'] == manifest.entries['a.txt']['source_resource_names'][0]
+
+    assert manifest.entries['sub/b.txt']['source_resource_names'] == [shared_entry['sources'][1]]
+
+def test_uploads_start_while_files_are_found(tmp_path, lake):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'a', 'b.txt': 'b'})
+
+    uploaded_while_walking = []
+
+    def file_list():
+        walked = fileutil.walk_files(directory)
+
+        yield next(walked)
+
+        uploaded_while_walking.append(lake.entry_added.wait(timeout=10))
+
+        yield from walked
+
+    counts, _ = _index(directory, file_list=file_list())
+
+    assert uploaded_while_walking == [True]
+
+    assert counts[manifestutil.ADDED] == 2
+
+def test_dedup_walks_every_file_first(tmp_path, lake):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'a', 'b.txt': 'b'})
+
+    uploaded_while_walking = []
+
+    def file_list():
+        for path in fileutil.walk_files(directory):
+            uploaded_while_walking.append(lake.entry_added.is_set())
+
+            yield path
+
+    _index(directory, file_list=file_list(), dedup=True)
+
+    assert uploaded_while_walking == [False, False]
+
+@pytest.mark.parametrize('chunk_lines', [None, 2])
+def test_unreadable_files_fail_alone(tmp_path, lake, capsys, chunk_lines):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'a\n' * 4})
+
+    # Found, then deleted before it was read
+    file_list = [directory / 'a.txt', directory / 'gone.txt']
+
+    counts, manifest = _index(directory, file_list=file_list, chunk_lines=chunk_lines)
+
+    assert counts[manifestutil.ADDED] == 1
+    assert counts['failed'] == 1
+
+    assert 'Failed gone.txt: ' in capsys.readouterr().out
+
+    assert list(manifest.entries) == ['a.txt']
+
+@pytest.mark.parametrize('dedup', [False, True])
+def test_dry_run_counts_the_requests_of_a_run(tmp_path, lake, dedup):
+    directory = _tree(tmp_path / 'files', {
+        'a.txt': 'same',
+        'sub/b.txt': 'same',
+        'big.txt': 'line\n' * 6 + 'last\n',
+        'empty.txt': '',
+    })
+
+    counts = _dry_run(directory, chunk_lines=2, dedup=dedup)
+
+    _index(directory, chunk_lines=2, dedup=dedup)
+
+    assert counts['sources'] == len(lake.sources)
+    assert counts['entries'] == len(lake.entries)
+
+    assert counts['chunks'] == 6
+    assert counts[index.SKIPPED_EMPTY] == 1
+
+def test_bundle_file_closes_the_bundle_that_is_full(tmp_path):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'a' * 10, 'b.txt': 'b' * 10, 'c.txt': 'c' * 10, 'sub/d.txt': 'd'})
+
+    command = index.RefreshIndexCommand()
+
+    (a, b, c, d), _ = _plan(directory)
+
+    bundle_size = command._bundled_size(a) + command._bundled_size(b)
+
+    open_bundles = {}
+
+    assert command._bundle_file(open_bundles, a, bundle_size) is None
+    assert command._bundle_file(open_bundles, b, bundle_size) is None
+    assert command._bundle_file(open_bundles, d, bundle_size) is None
+
+    assert command._bundle_file(open_bundles, c, bundle_size) == ('.', [a, b])
+
+    assert open_bundles == {'.': (command._bundled_size(c), [c]), 'sub': (command._bundled_size(d), [d])}
+
+def test_bundleable(tmp_path):
+    directory = _tree(tmp_path / 'files', {'big.txt': 'line\n' * 100, 'same1.txt': 'same', 'same2.txt': 'same', 'small.txt': 'small'})
+
+    command = index.RefreshIndexCommand()
+
+    (big, same1, same2, small), text_bodies = _plan(directory, chunk_size=100)
+
+    assert not command._bundleable(big, 1000)
+
+    assert command._bundleable(small, 1000)
+    assert not command._bundleable(small, command._bundled_size(small) - 1)
+
+    # Files whose body is held by several paths are left to deduplication when duplicates are known
+    assert command._bundleable(same1, 1000)
+    assert not command._bundleable(same1, 1000, text_bodies)
+
+def test_plan_bundles_leaves_single_files_alone(tmp_path):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'a', 'b.txt': 'b', 'sub/c.txt': 'c', 'big.txt': 'big' * 100})
+
+    (a, b, big, c), _ = _plan(directory)
+
+    bundles = index.RefreshIndexCommand()._plan_bundles([a, b, big, c], None, 100)
+
+    assert bundles == [('.', [a, b])]
+
+    assert [planned_file.bundled for planned_file in (a, b, big, c)] == [True, True, False, False]
+
+def test_small_files_uploaded_in_bundles(tmp_path, lake):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'a', 'b.txt': 'b', 'sub/c.txt': 'c', 'big.txt': 'big' * 100})
+
+    counts, manifest = _index(directory, bundle_size=100)
+
+    assert counts[manifestutil.ADDED] == 4
+    assert counts['bundled'] == 2
+    assert counts['bundles'] == 1
+
+    assert len(lake.entries) == 3
+
+    bundle_source_rn, bundle_source = next((source_rn, source) for source_rn, source in lake.sources.items()
+                                           if source['source_type'] == index.BUNDLE_SOURCE_TYPE)
+
+    assert bundle_source['source_arguments']['full_file_paths'] == '["a.txt", "b.txt"]'
+
+    bundle_entry = next(entry for entry in lake.entries if entry['sources'] == [bundle_source_rn])
+
+    assert bundle_entry['content'] == '==> a.txt <==\na\n==> b.txt <==\nb'
+
+    assert manifest.entries['a.txt']['source_resource_names'] == manifest.entries['b.txt']['source_resource_names'] == [bundle_source_rn]
+
+@pytest.mark.parametrize('dedup', [False, True])
+def test_dry_run_counts_the_bundles_of_a_run(tmp_path, lake, dedup):
+    directory = _tree(tmp_path / 'files', {
+        'a.txt': 'a' * 40,
+        'b.txt': 'b' * 40,
+        'c.txt': 'c' * 40,
+        'same.txt': 'same',
+        'sub/same.txt': 'same',
+        'sub/alone.txt': 'alone',
+    })
+
+    counts = _dry_run(directory, bundle_size=120, dedup=dedup)
+
+    run_counts, _ = _index(directory, bundle_size=120, dedup=dedup)
+
+    assert counts['sources'] == len(lake.sources)
+    assert counts['entries'] == len(lake.entries)
+
+    assert counts['bundles'] == run_counts['bundles']
+    assert counts['bundled'] == run_counts['bundled']
+
+    assert counts['bundles'] >= 1
+
+def _targets(tmp_path, targets) -> list:
+    config_path = tmp_path / 'targets.json'
+
+    config_path.write_text(json.dumps({'targets': targets}))
+
+    parser = ArgumentParser()
+
+    index.RefreshIndexCommand.configure_parser(parser)
+
+    return index.RefreshIndexCommand()._load_targets(parser.parse_args(['--config', str(config_path)]))
+
+def test_targets_take_boolean_options(tmp_path):
+    (target,) = _targets(tmp_path, [{'directory': 'docs', 'shallow': True, 'no_gitignore': False}])
+
+    assert target.directory == str(tmp_path / 'docs')
+
+    assert target.shallow is True
+    assert target.no_gitignore is False
+
+@pytest.mark.parametrize('value', ['false', 0, None])
+def test_targets_reject_non_boolean_options(tmp_path, value):
+    with pytest.raises(ValueError, match='"shallow" in target 1 .* must be true or false'):
+        _targets(tmp_path, [{'directory': 'docs', 'shallow': value}])
+
+@pytest.mark.parametrize('options', [
+    dict(chunk_lines=2),
+    dict(chunk_size=4),
+    dict(chunk_lines=2, chunk_overlap=1),
+    dict(bundle_size=100),
+])
+def test_text_files_changed_with_other_upload_options(tmp_path, lake, options):
+    directory = _tree(tmp_path / 'files', {'a.txt': 'line\n' * 4, 'b.txt': 'b'})
+
+    def index_saved(**options) -> dict[str, int]:
+        counts, manifest = _index(directory, **options)
+
+        manifest.save()
+
+        return counts
+
+    index_saved()
+
+    assert index_saved()[manifestutil.UNCHANGED] == 2
+
+    assert index_saved(**options)[manifestutil.CHANGED] == 2
+
+    assert index_saved(**options)[manifestutil.UNCHANGED] == 2
+
+@pytest.mark.parametrize('argv', [
+    ['--workers', '0'],
+    ['--pdf-workers', '0'],
+    ['--chunk-lines', '2', '--chunk-overlap', '2'],
+])
+def test_invalid_options_rejected_before_running(argv):
+    parser = ArgumentParser()
+
+    index.RefreshIndexCommand.configure_parser(parser)
+
+    with pytest.raises(SystemExit):
+        index.RefreshIndexCommand.check_arguments(parser, parser.parse_args(argv))
+
+def test_provisioned_archives_and_source_types_are_skipped(tmp_path, lake):
+    archives = {'docs': tmp_path / 'docs', 'notes': tmp_path / 'notes'}
+
+    def provision(reprovision: bool = False) -> list[str]:
+        # A new record each time, read from disk like a new run
+        provision_record = provisionutil.ProvisionRecord.for_deployment('app', 'dev')
+
+        lake.requests.clear()
+
+        index.RefreshIndexCommand()._provision(archives, [index.FILE_SOURCE_TYPE], provision_record, reprovision=reprovision)
+
+        return lake.requests
+
+    assert provision() == ['CreateArchive', 'CreateArchive', 'DescribeJob', 'DescribeJob', 'CreateSourceType']
+
+    assert provision() == []
+
+    assert provision(reprovision=True).count('CreateArchive') == 2
+    assert lake.requests.count('CreateSourceType') == 1
+
+def test_failed_archives_are_not_recorded(tmp_path, lake, monkeypatch):
+    monkeypatch.setattr(index.archiveutil, 'create_archive_and_wait', lambda omnilake, archive: False)
+
+    provision_record = provisionutil.ProvisionRecord.for_deployment('app', 'dev')
+
+    with pytest.raises(ValueError, match='Unable to provision archive'):
+        index.RefreshIndexCommand()._provision({'docs': tmp_path}, [index.FILE_SOURCE_TYPE], provision_record)
+
+    assert not provisionutil.ProvisionRecord.for_deployment('app', 'dev').has_archive('docs')
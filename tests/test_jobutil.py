@@ -0,0 +1,158 @@
+import threading
+
+from types import SimpleNamespace
+
+import pytest
+
+import omni.utils.jobutil as jobutil
+
+# No jitter, so the polls happen at known times
+POLICY = jobutil.PollingPolicy(initial_interval=1.0, multiplier=2.0, max_interval=3.0, jitter=0.0)
+
+class _Clock:
+    """
+    Stands in for the time module, sleeping only moves the clock forward
+    """
+    def __init__(self):
+        self.now = 0.0
+
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+
+        self.now += seconds
+
+class _JobLake:
+    """
+    Describes each job with the next of its statuses, the last one repeating. Exceptions are raised.
+    """
+    def __init__(self, statuses: dict[str, list]):
+        self.statuses = statuses
+
+        self.polls = {job_id: 0 for job_id in statuses}
+
+        self._lock = threading.Lock()
+
+    def request(self, request):
+        job_id = request.attributes['job_id']
+
+        with self._lock:
+            job_statuses = self.statuses[job_id]
+
+            status = job_statuses[min(self.polls[job_id], len(job_statuses) - 1)]
+
+            self.polls[job_id] += 1
+
+        if isinstance(status, Exception):
+            raise status
+
+        return SimpleNamespace(response_body={'status': status, 'status_message': f'{job_id} {status.lower()}'})
+
+@pytest.fixture
+def clock(monkeypatch) -> _Clock:
+    clock = _Clock()
+
+    monkeypatch.setattr(jobutil, 'time', clock)
+
+    return clock
+
+def test_polling_policy_backs_off_up_to_the_cap():
+    assert [POLICY.interval(poll_count) for poll_count in range(1, 5)] == [1.0, 2.0, 3.0, 3.0]
+
+    jittered = jobutil.PollingPolicy(initial_interval=1.0, jitter=0.2)
+
+    assert all(0.8 <= jittered.interval(1) <= 1.0 for _ in range(100))
+
+def test_wait_for_completion(clock):
+    lake = _JobLake({'job': ['PENDING', 'RUNNING', 'RUNNING', 'COMPLETED']})
+
+    status_changes = []
+    polls = []
+
+    result = jobutil.wait_for_completion(lake, 'job', 'LAKE_REQUEST', policy=POLICY,
+                                         on_status_change=lambda job_id, status, _: status_changes.append(status),
+                                         on_poll=lambda job_id, description: polls.append(description['status']))
+
+    assert result
+    assert result.status_message == 'job completed'
+    assert result.poll_count == 4
+
+    assert status_changes == ['PENDING', 'RUNNING', 'COMPLETED']
+    assert polls == ['PENDING', 'RUNNING', 'RUNNING', 'COMPLETED']
+
+    assert clock.sleeps == [1.0, 2.0, 3.0]
+    assert result.waited == 6.0
+
+def test_wait_for_completion_failed(clock):
+    result = jobutil.wait_for_completion(_JobLake({'job': ['RUNNING', 'FAILED']}), 'job', 'LAKE_REQUEST', policy=POLICY)
+
+    assert not result
+    assert result.status == 'FAILED'
+    assert not result.timed_out
+
+def test_wait_for_completion_timeout(clock):
+    result = jobutil.wait_for_completion(_JobLake({'job': ['RUNNING']}), 'job', 'LAKE_REQUEST', timeout=2.5, policy=POLICY)
+
+    assert not result
+    assert result.timed_out
+    assert result.status == 'RUNNING'
+
+    # The last sleep is cut short by the timeout
+    assert clock.sleeps == [1.0, 1.5]
+    assert result.poll_count == 3
+
+def test_as_completed_yields_jobs_as_they_finish(clock):
+    lake = _JobLake({
+        'slow': ['RUNNING', 'RUNNING', 'RUNNING', 'COMPLETED'],
+        'failing': ['FAILED'],
+        'quick': ['RUNNING', 'COMPLETED'],
+    })
+
+    status_changes = []
+
+    results = list(jobutil.as_completed(lake, [('slow', 'LAKE_REQUEST'), ('failing', 'LAKE_REQUEST'), ('quick', 'LAKE_REQUEST')],
+                                        policy=POLICY, on_status_change=lambda job_id, status, _: status_changes.append((job_id, status))))
+
+    assert [(result.job_id, result.status) for result in results] == [('failing', 'FAILED'), ('quick', 'COMPLETED'), ('slow', 'COMPLETED')]
+
+    assert [result.poll_count for result in results] == [1, 2, 4]
+
+    # Called once per status, not once per poll
+    assert status_changes.count(('slow', 'RUNNING')) == 1
+
+def test_as_completed_timeout(clock):
+    lake = _JobLake({'done': ['COMPLETED'], 'stuck': ['RUNNING']})
+
+    results = list(jobutil.as_completed(lake, [('done', 'LAKE_REQUEST'), ('stuck', 'LAKE_REQUEST')], timeout=2.5, policy=POLICY))
+
+    assert [(result.job_id, result.timed_out) for result in results] == [('done', False), ('stuck', True)]
+
+    assert results[1].status == 'RUNNING'
+    assert results[1].waited == 2.5
+
+def test_as_completed_gives_up_after_repeated_describe_errors(clock):
+    lake = _JobLake({'flaky': [ConnectionError('reset'), 'RUNNING', ConnectionError('reset'), 'COMPLETED'],
+                     'broken': [ConnectionError('refused')]})
+
+    results = list(jobutil.as_completed(lake, [('flaky', 'LAKE_REQUEST'), ('broken', 'LAKE_REQUEST')], policy=POLICY))
+
+    assert [(result.job_id, result.status) for result in results] == [('broken', 'FAILED'), ('flaky', 'COMPLETED')]
+
+    assert results[0].status_message == 'Unable to describe job: refused'
+    assert lake.polls['broken'] == jobutil.MAX_DESCRIBE_ERRORS
+
+def test_wait_for_all_keeps_the_order_given(clock):
+    lake = _JobLake({'first': ['RUNNING', 'COMPLETED'], 'second': ['COMPLETED']})
+
+    results = jobutil.wait_for_all(lake, [('first', 'LAKE_REQUEST'), ('second', 'LAKE_REQUEST')], policy=POLICY)
+
+    assert [result.job_id for result in results] == ['first', 'second']
+
+    assert all(results)
+
+def test_as_completed_without_jobs(clock):
+    assert list(jobutil.as_completed(_JobLake({}), [])) == []
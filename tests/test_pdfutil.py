@@ -0,0 +1,67 @@
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import omni.utils.pdfutil as pdfutil
+
+@pytest.fixture
+def pdf(tmp_path, monkeypatch):
+    """
+    An extractor running on threads, whose pages are only extracted once released
+    """
+    extracted = []
+
+    release = threading.Event()
+
+    def extract_page(path: str, page_number: int) -> tuple[int, str]:
+        release.wait(timeout=10)
+
+        extracted.append(page_number)
+
+        return page_number, f'page {page_number}'
+
+    monkeypatch.setattr(pdfutil, '_extract_page', extract_page)
+    monkeypatch.setattr(pdfutil, 'count_pages', lambda path: 3)
+
+    extractor = pdfutil.PdfExtractor(cache_dir=tmp_path / 'cache')
+
+    monkeypatch.setattr(extractor, '_get_executor', lambda: executor)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        yield SimpleNamespace(extractor=extractor, extracted=extracted, release=release, executor=executor)
+
+def test_identical_pdfs_share_an_extraction(pdf):
+    extractor, extracted, release = pdf.extractor, pdf.extracted, pdf.release
+
+    futures = extractor.submit('a.pdf', 'hash')
+
+    assert extractor.submit('copy.pdf', 'hash') is futures
+
+    release.set()
+
+    assert extractor.pages('a.pdf', 'hash') == ['page 0', 'page 1', 'page 2']
+
+    assert sorted(extracted) == [0, 1, 2]
+
+def test_pages_are_cached_before_the_extraction_is_forgotten(pdf):
+    extractor, extracted, release = pdf.extractor, pdf.extracted, pdf.release
+
+    extractor.submit('a.pdf', 'hash')
+
+    release.set()
+
+    # Read as soon as the futures resolve, possibly before their callbacks ran
+    assert extractor.pages('a.pdf', 'hash') == ['page 0', 'page 1', 'page 2']
+
+    # Waits for the callbacks of the extraction
+    pdf.executor.shutdown(wait=True)
+
+    assert extractor._in_flight == {}
+    assert extractor.cached_pages('hash') == ['page 0', 'page 1', 'page 2']
+
+    assert extractor.pages('a.pdf', 'hash') == ['page 0', 'page 1', 'page 2']
+
+    assert sorted(extracted) == [0, 1, 2]
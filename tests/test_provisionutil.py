@@ -0,0 +1,25 @@
+import json
+
+import omni.utils.provisionutil as provisionutil
+
+def test_record_round_trip(tmp_path):
+    record = provisionutil.ProvisionRecord(tmp_path / 'dev.json')
+
+    record.add_archive('docs')
+    record.add_source_type('local_file')
+
+    record.save()
+
+    loaded = provisionutil.ProvisionRecord(tmp_path / 'dev.json')
+
+    assert loaded.has_archive('docs')
+    assert loaded.has_source_type('local_file')
+
+    assert not loaded.has_archive('notes')
+
+def test_unreadable_records_start_over(tmp_path):
+    (tmp_path / 'broken.json').write_text('not json')
+    (tmp_path / 'old.json').write_text(json.dumps({'version': 0, 'archives': ['docs']}))
+
+    assert provisionutil.ProvisionRecord(tmp_path / 'broken.json').archives == set()
+    assert provisionutil.ProvisionRecord(tmp_path / 'old.json').archives == set()
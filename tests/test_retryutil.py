@@ -0,0 +1,158 @@
+import pytest
+import requests
+import urllib3
+
+from botocore.exceptions import ClientError, EndpointConnectionError, ReadTimeoutError
+
+import omni.utils.retryutil as retryutil
+
+def _client_error(code: str, status_code: int = 400) -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': code}, 'ResponseMetadata': {'HTTPStatusCode': status_code}}, 'Request')
+
+def _http_error(status_code: int) -> requests.exceptions.HTTPError:
+    response = requests.Response()
+
+    response.status_code = status_code
+
+    return requests.exceptions.HTTPError(f'{status_code} Error', response=response)
+
+def _dropped_connection() -> requests.exceptions.ConnectionError:
+    return requests.exceptions.ConnectionError(urllib3.exceptions.ProtocolError('Connection aborted.', ConnectionResetError(104)))
+
+def _refused_connection() -> requests.exceptions.ConnectionError:
+    return requests.exceptions.ConnectionError(urllib3.exceptions.MaxRetryError(None, '/', urllib3.exceptions.NewConnectionError(None, 'refused')))
+
+@pytest.mark.parametrize('error', [
+    _client_error('ThrottlingException'),
+    _client_error('SlowDown', status_code=503),
+    _client_error('Anything', status_code=429),
+    _http_error(429),
+    Exception('Rate exceeded'),
+])
+def test_throttling(error):
+    assert retryutil.is_throttling(error)
+
+    assert retryutil.is_retryable(error, 'AddEntry')
+
+@pytest.mark.parametrize('error', [
+    _client_error('ValidationException'),
+    _http_error(400),
+    _http_error(503),
+    ValueError('Archive already exists: notes'),
+])
+def test_not_throttling(error):
+    assert not retryutil.is_throttling(error)
+
+@pytest.mark.parametrize('error', [
+    _client_error('ServiceUnavailable', status_code=503),
+    _client_error('Unknown', status_code=503),
+    _http_error(503),
+    EndpointConnectionError(endpoint_url='https://lake'),
+    requests.exceptions.ConnectTimeout(),
+    _refused_connection(),
+])
+@pytest.mark.parametrize('request_type', ['AddEntry', 'DescribeJob'])
+def test_retryable_for_every_request(error, request_type):
+    assert retryutil.is_retryable(error, request_type)
+
+@pytest.mark.parametrize('error', [
+    _client_error('InternalServerError', status_code=500),
+    _client_error('Unknown', status_code=502),
+    _client_error('RequestTimeout', status_code=400),
+    _http_error(500),
+    _http_error(502),
+    _http_error(504),
+    ReadTimeoutError(endpoint_url='https://lake'),
+    requests.exceptions.ReadTimeout(),
+    requests.exceptions.ChunkedEncodingError(),
+    _dropped_connection(),
+    ConnectionResetError(104, 'Connection reset by peer'),
+])
+def test_ambiguous_only_retryable_when_idempotent(error):
+    assert retryutil.is_retryable(error, 'DescribeJob')
+    assert retryutil.is_retryable(error, 'GetEntry')
+    assert retryutil.is_retryable(error, 'ListArchives')
+
+    assert not retryutil.is_retryable(error, 'AddEntry')
+    assert not retryutil.is_retryable(error)
+
+@pytest.mark.parametrize('error', [
+    _client_error('ValidationException'),
+    _client_error('ResourceNotFoundException', status_code=404),
+    _http_error(400),
+    _http_error(404),
+    ValueError('Archive already exists: notes'),
+    KeyError('job_id'),
+])
+def test_fatal(error):
+    assert not retryutil.is_retryable(error, 'DescribeJob')
+
+def test_policy_delay_stays_under_the_cap():
+    policy = retryutil.RetryPolicy(base_delay=1.0, multiplier=2.0, max_delay=3.0)
+
+    for attempt in range(1, 10):
+        assert 0 <= policy.delay(attempt) <= min(3.0, 2.0 ** (attempt - 1))
+
+class _FlakyClient:
+    def __init__(self, errors: list[Exception]):
+        self.errors = errors
+
+        self.calls = 0
+
+    def request(self, request):
+        self.calls += 1
+
+        if self.errors:
+            raise self.errors.pop(0)
+
+        return 'response'
+
+class DescribeJob:
+    pass
+
+class AddEntry:
+    pass
+
+def test_client_retries_retryable_errors(monkeypatch):
+    monkeypatch.setattr(retryutil.time, 'sleep', lambda seconds: None)
+
+    client = _FlakyClient([requests.exceptions.ConnectTimeout(), _http_error(503)])
+
+    assert retryutil.RetryingClient(client).request(AddEntry()) == 'response'
+
+    assert client.calls == 3
+
+def test_client_raises_fatal_errors_right_away(monkeypatch):
+    monkeypatch.setattr(retryutil.time, 'sleep', lambda seconds: None)
+
+    client = _FlakyClient([requests.exceptions.ReadTimeout()])
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        retryutil.RetryingClient(client).request(AddEntry())
+
+    assert client.calls == 1
+
+def test_client_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(retryutil.time, 'sleep', lambda seconds: None)
+
+    client = _FlakyClient([_http_error(429)] * 5)
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        retryutil.RetryingClient(client, policy=retryutil.RetryPolicy(max_attempts=3)).request(DescribeJob())
+
+    assert client.calls == 3
+
+def test_limiter_halves_on_throttling_and_recovers():
+    limiter = retryutil.AdaptiveLimiter(max_limit=8, cooldown=0, min_rate=10000)
+
+    limiter.acquire()
+    limiter.release(throttled=True)
+
+    assert limiter.limit == 4
+    assert limiter.rate is not None
+
+    for _ in range(100):
+        limiter.acquire()
+        limiter.release(succeeded=True)
+
+    assert limiter.limit == 8
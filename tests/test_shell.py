@@ -0,0 +1,39 @@
+import sys
+
+import pytest
+
+import omni.shell as shell
+import omni.utils.daemonutil as daemonutil
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+
+    monkeypatch.setenv('OMNI_DAEMON_SOCKET', '/tmp/omni-test.sock')
+
+    monkeypatch.setattr(daemonutil, 'forward', lambda argv, socket_path: calls.append(('forward', argv)) or 0)
+    monkeypatch.setattr(shell.Shell, 'run', lambda self, argv=None: calls.append(('local', sys.argv[1:])))
+
+    return calls
+
+@pytest.mark.parametrize('argv', [
+    ['index', '--watch', '-D', '.'],
+    ['repl'],
+    ['daemon', 'stop'],
+])
+def test_runs_locally(monkeypatch, calls, argv):
+    monkeypatch.setattr(sys, 'argv', ['omni', *argv])
+
+    shell.main()
+
+    assert calls == [('local', argv)]
+
+def test_forwards_to_the_daemon(monkeypatch, calls):
+    monkeypatch.setattr(sys, 'argv', ['omni', 'index', '-D', '.'])
+
+    with pytest.raises(SystemExit) as exit:
+        shell.main()
+
+    assert exit.value.code == 0
+
+    assert calls == [('forward', ['index', '-D', '.'])]
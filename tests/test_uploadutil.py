@@ -0,0 +1,88 @@
+import threading
+
+from concurrent.futures import Future
+
+import omni.utils.uploadutil as uploadutil
+
+def test_waiting_tasks_leave_the_workers_free():
+    completed = []
+
+    with uploadutil.UploadPipeline(workers=1) as pipeline:
+        page = Future()
+
+        page_group = pipeline.group('page', on_complete=completed.append)
+
+        pipeline.submit_when_done(page, page_group, lambda text, suffix: text + suffix, suffix='!')
+        pipeline.close(page_group)
+
+        other_ran = threading.Event()
+
+        other_group = pipeline.group('other')
+
+        pipeline.submit(other_group, other_ran.set)
+        pipeline.close(other_group)
+
+        # The only worker runs the other task while the page is still being extracted
+        assert other_ran.wait(timeout=10)
+
+        assert completed == []
+
+        page.set_result('text')
+
+    assert page_group.results == ['text!']
+
+    assert completed == [page_group]
+
+def test_waiting_tasks_fail_with_their_future():
+    completed = []
+
+    with uploadutil.UploadPipeline(workers=1) as pipeline:
+        page = Future()
+
+        group = pipeline.group('page', on_complete=completed.append)
+
+        pipeline.submit_when_done(page, group, lambda text: text)
+        pipeline.submit(group, lambda: 'other')
+        pipeline.close(group)
+
+        error = ValueError('unreadable page')
+
+        page.set_exception(error)
+
+    assert group.errors == [error]
+    assert group.results == [None, 'other']
+
+    assert completed == [group]
+
+def test_resolved_tasks_respect_the_in_flight_limit():
+    running = []
+
+    release = threading.Event()
+
+    def task(number):
+        running.append(number)
+
+        release.wait(timeout=10)
+
+        return number
+
+    with uploadutil.UploadPipeline(workers=4, max_in_flight=2) as pipeline:
+        group = pipeline.group('pages')
+
+        pages = [Future() for _ in range(4)]
+
+        for page in pages:
+            pipeline.submit_when_done(page, group, task)
+
+        pipeline.close(group)
+
+        for page_number, page in enumerate(pages):
+            page.set_result(page_number)
+
+        pipeline._start_resolved()
+
+        assert len(pipeline._in_flight) == 2
+
+        release.set()
+
+    assert group.results == [0, 1, 2, 3]
@@ -0,0 +1,79 @@
+from types import SimpleNamespace
+
+import pytest
+
+import omni.utils.watchutil as watchutil
+
+class _ScriptedWatcher:
+    """
+    Stands in for the polling watcher, reporting the changes of a script at their time on a fake clock
+    """
+    script = []
+
+    def __init__(self, path_filter, ignore_patterns, interval):
+        self.clock = watchutil.time
+
+        self.events = list(self.script)
+
+    def read(self, timeout):
+        if self.events and (timeout is None or self.events[0][0] <= self.clock.now + timeout):
+            self.clock.now, changed = self.events.pop(0)
+
+            return set(changed), False
+
+        if timeout is None:
+            raise AssertionError('Waiting forever for changes')
+
+        self.clock.now += timeout
+
+        return set(), False
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def watch(tmp_path, monkeypatch):
+    """
+    Returns a function watching tmp_path with the given script of (time, changed paths)
+    """
+    clock = SimpleNamespace(now=0.0)
+
+    clock.monotonic = lambda: clock.now
+
+    monkeypatch.setattr(watchutil, 'time', clock)
+    monkeypatch.setattr(watchutil, 'PollingWatcher', _ScriptedWatcher)
+
+    def watch(script, **options):
+        monkeypatch.setattr(_ScriptedWatcher, 'script', [(at, [tmp_path / name for name in names]) for at, names in script])
+
+        return watchutil.watch(tmp_path, poll=True, use_gitignore=False, **options), clock
+
+    for name in ('a.txt', 'b.txt', 'c.txt', 'ignored.log'):
+        (tmp_path / name).write_text(name)
+
+    return watch
+
+def test_changes_are_batched_once_they_stop(watch, tmp_path):
+    batches, clock = watch([(0, ['a.txt']), (1, ['b.txt', 'a.txt']), (10, ['c.txt'])], debounce=2)
+
+    assert next(batches) == [tmp_path / 'a.txt', tmp_path / 'b.txt']
+    assert clock.now == 3
+
+    assert next(batches) == [tmp_path / 'c.txt']
+    assert clock.now == 12
+
+def test_steady_changes_are_flushed_after_ten_debounce_periods(watch, tmp_path):
+    batches, clock = watch([(second, ['a.txt' if second % 2 else 'b.txt']) for second in range(30)], debounce=2)
+
+    assert next(batches) == [tmp_path / 'a.txt', tmp_path / 'b.txt']
+    assert clock.now == 20
+
+def test_deleted_and_ignored_files_are_left_out(watch, tmp_path):
+    batches, clock = watch([(0, ['a.txt', 'gone.txt', 'ignored.log']), (5, ['gone.txt']), (10, ['b.txt'])],
+                           debounce=2, ignore_patterns=['*.log'])
+
+    assert next(batches) == [tmp_path / 'a.txt']
+
+    # A batch of deleted files only is not yielded
+    assert next(batches) == [tmp_path / 'b.txt']
+    assert clock.now == 12